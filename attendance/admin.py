@@ -1,8 +1,23 @@
 ﻿from django.contrib import admin
 
-from .models import AttendanceRecord, Lecture, Subject, UserSetting
+from .models import (
+    ArchivedAttendanceRecord,
+    AttendanceRecord,
+    AttendanceRollup,
+    ChangeLogEntry,
+    Job,
+    Lecture,
+    Subject,
+    SubjectAttendanceSummary,
+    UserSetting,
+)
 
 admin.site.register(Subject)
 admin.site.register(Lecture)
 admin.site.register(AttendanceRecord)
 admin.site.register(UserSetting)
+admin.site.register(SubjectAttendanceSummary)
+admin.site.register(ChangeLogEntry)
+admin.site.register(AttendanceRollup)
+admin.site.register(ArchivedAttendanceRecord)
+admin.site.register(Job)
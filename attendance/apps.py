@@ -4,3 +4,6 @@
 class AttendanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'attendance'
+
+    def ready(self):
+        from . import usercache  # noqa: F401  (connects the cache invalidation signals)
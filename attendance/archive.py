@@ -0,0 +1,173 @@
+"""Archival of old attendance into a cold table plus monthly rollups.
+
+``archive_before`` moves every AttendanceRecord dated before a cutoff into
+ArchivedAttendanceRecord and adds its per-subject, per-month totals to
+AttendanceRollup, one batch of users per transaction. The live table then
+only holds the current term, so its indexes stay small enough to be cached.
+
+The counters are left alone: they keep counting archived months through the
+rollups (see ``counters.count_history``). The windowed dashboard reads
+rollups for the whole months inside the window and the archive table only
+for the partly covered months at its edges; exports merge archived rows
+with live ones. Rollups are additive, so records marked later for an
+already archived month are folded in by the next run; a lecture that is
+itself archived can no longer be marked (see ``archived_keys``).
+"""
+import logging
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from . import changelog
+from .counters import STATUSES
+from .models import ArchivedAttendanceRecord, AttendanceRecord, AttendanceRollup
+from .partitions import add_months
+from .versioning import lock_versions
+
+logger = logging.getLogger('attendance.archive')
+
+ARCHIVE_COLUMNS = ('id', 'user_id', 'subject_id', 'date', 'lecture_time', 'status')
+ARCHIVE_USERS_PER_BATCH = 500
+
+
+def full_months(date_from=None, date_to=None):
+    """Return ``(first, end)`` such that the months entirely inside the window are ``first <= month < end``.
+
+    Either bound is None when the window is open on that side.
+    """
+    first = end = None
+    if date_from:
+        first = date_from if date_from.day == 1 else add_months(date_from, 1)
+    if date_to:
+        end = (date_to + timedelta(days=1)).replace(day=1)
+    return first, end
+
+
+def archived_dashboard_rows(user, date_from=None, date_to=None):
+    """Querysets shaped like the windowed dashboard rows, covering the user's archive in the window."""
+    first, end = full_months(date_from, date_to)
+    rollups = AttendanceRollup.objects.filter(user=user)
+    archived = ArchivedAttendanceRecord.objects.filter(user=user)
+    inside = Q()
+    if first:
+        rollups = rollups.filter(month__gte=first)
+        inside &= Q(date__gte=first)
+    if end:
+        rollups = rollups.filter(month__lt=end)
+        inside &= Q(date__lt=end)
+    if date_from:
+        archived = archived.filter(date__gte=date_from)
+    if date_to:
+        archived = archived.filter(date__lte=date_to)
+    if inside:
+        # Whole months come from the rollups; only the edges need rows.
+        archived = archived.exclude(inside)
+    return [
+        rollups.values('subject_id', 'subject__name').annotate(
+            archived_present=Sum('present'), archived_absent=Sum('absent')
+        ).order_by(),
+        archived.values('subject_id', 'subject__name').annotate(
+            present=Count('id', filter=Q(status='present')),
+            absent=Count('id', filter=Q(status='absent')),
+        ).order_by(),
+    ]
+
+
+def archived_keys(user_ids, keys):
+    """The ``(user_id, subject_id, date, lecture_time)`` keys among ``keys`` that are already archived.
+
+    Archived lectures are read-only: writing them again would count them
+    twice, once live and once in the rollups. One query for any number of keys.
+    """
+    keys = set(keys)
+    if not keys:
+        return set()
+    archived = ArchivedAttendanceRecord.objects.filter(
+        user_id__in=user_ids, subject_id__in={key[1] for key in keys}, date__in={key[2] for key in keys}
+    ).values_list('user_id', 'subject_id', 'date', 'lecture_time')
+    return keys & set(archived)
+
+
+def _already_archived():
+    """Condition on live records whose lecture is already in the archive."""
+    twins = ArchivedAttendanceRecord.objects.filter(
+        user=OuterRef('user'), subject=OuterRef('subject'), date=OuterRef('date')
+    )
+    return Exists(twins.filter(lecture_time=OuterRef('lecture_time'))) | (
+        Q(lecture_time__isnull=True) & Exists(twins.filter(lecture_time__isnull=True))
+    )
+
+
+def merge_rollups(user_ids, rows):
+    """Add ``(user_id, subject_id, month, counts)`` totals to the users' existing rollups."""
+    existing = {
+        (rollup.subject_id, rollup.month): rollup
+        for rollup in AttendanceRollup.objects.filter(user_id__in=user_ids, month__in={row[2] for row in rows})
+    }
+    merged = []
+    for user_id, subject_id, month, counts in rows:
+        rollup = existing.get((subject_id, month)) or AttendanceRollup(user_id=user_id, subject_id=subject_id, month=month)
+        for status in STATUSES:
+            setattr(rollup, status, getattr(rollup, status) + counts[status])
+        merged.append(rollup)
+    AttendanceRollup.objects.bulk_create(
+        merged, update_conflicts=True, unique_fields=['subject', 'month'], update_fields=list(STATUSES)
+    )
+
+
+def archive_batch(user_ids, before):
+    """Archive the records of ``user_ids`` dated before ``before``; returns the rows moved.
+
+    Call inside a transaction.
+    """
+    # Every record writer takes these locks before any record row, so no
+    # write for these users can commit between the copy and the delete, and
+    # none can hold a record lock this batch is waiting for.
+    lock_versions(user_ids)
+    candidates = AttendanceRecord.objects.filter(user_id__in=user_ids, date__lt=before).order_by()
+    # A lecture is never archived twice: a live row for an archived lecture
+    # (written before the write paths refused them) stays live and is logged.
+    duplicates = candidates.filter(_already_archived()).count()
+    if duplicates:
+        logger.warning('Kept %d live records of already archived lectures for users %s', duplicates, sorted(user_ids))
+    old = candidates.exclude(_already_archived())
+
+    totals = (
+        old.annotate(month=TruncMonth('date'))
+        .values('user_id', 'subject_id', 'month')
+        .annotate(**{status: Count('id', filter=Q(status=status)) for status in STATUSES})
+    )
+    rows = [(row['user_id'], row['subject_id'], row['month'], row) for row in totals]
+    if not rows:
+        return 0
+    merge_rollups(user_ids, rows)
+
+    sql, params = old.values_list(*ARCHIVE_COLUMNS).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {ArchivedAttendanceRecord._meta.db_table} ({", ".join(ARCHIVE_COLUMNS)}) {sql}', params
+        )
+    # Matched by id: ``old`` itself would now exclude every row just copied.
+    copied = ArchivedAttendanceRecord.objects.filter(user_id__in=user_ids, date__lt=before).values('id')
+    moved, _ = candidates.filter(id__in=copied).delete()
+
+    # The rows are gone from the live record list: have clients reload.
+    changelog.log_resync({row[0] for row in rows})
+    return moved
+
+
+def archive_before(before, users_per_batch=ARCHIVE_USERS_PER_BATCH):
+    """Archive every record dated before ``before``; returns ``(users, records)`` archived."""
+    user_ids = list(
+        AttendanceRecord.objects.filter(date__lt=before).order_by('user_id').values_list('user_id', flat=True).distinct()
+    )
+    users = records = 0
+    for start in range(0, len(user_ids), users_per_batch):
+        batch = user_ids[start : start + users_per_batch]
+        with transaction.atomic():
+            moved = archive_batch(batch, before)
+        users += len(batch)
+        records += moved
+    return users, records
@@ -0,0 +1,101 @@
+"""Async variants of the read endpoints, routed instead of the sync views under ASGI.
+
+Reads use the async ORM, so a single ASGI worker can keep many slow clients
+in flight while their queries run. Writes on the shared routes are handed
+to the synchronous views in ``views.py`` through ``sync_to_async``, which
+keeps their transactions on one thread. Responses are identical to the
+sync views.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from . import views
+from .models import Lecture, Subject
+from .serializers import (
+    FastJsonResponse,
+    lecture_rows,
+    record_rows,
+    serialize_lecture_rows,
+    serialize_record_rows,
+    subject_rows,
+)
+from .usercache import aget_setting
+from .views import (
+    dashboard_rows,
+    dashboard_summary,
+    login_required_api,
+    parse_date_range,
+    records_page,
+    records_query,
+    versioned_api,
+)
+
+
+@require_http_methods(['GET'])
+@login_required_api
+async def me_view(request):
+    setting = await aget_setting(request.user)
+    return JsonResponse(
+        {
+            'user': {'name': request.user.first_name, 'email': request.user.email},
+            'target_percentage': setting.target_percentage,
+        }
+    )
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+@login_required_api
+@versioned_api
+async def subjects_view(request):
+    if request.method != 'GET':
+        return await sync_to_async(views.subjects_view)(request)
+    subjects = [row async for row in subject_rows(Subject.objects.filter(user=request.user))]
+    return FastJsonResponse({'subjects': subjects})
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+@login_required_api
+@versioned_api
+async def lectures_view(request):
+    if request.method != 'GET':
+        return await sync_to_async(views.lectures_view)(request)
+    day = (request.GET.get('day') or '').strip().lower()
+    lectures = Lecture.objects.filter(user=request.user)
+    if day:
+        lectures = lectures.filter(day=day)
+    rows = [row async for row in lecture_rows(lectures)]
+    return FastJsonResponse({'lectures': serialize_lecture_rows(rows)})
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+@login_required_api
+@versioned_api
+async def records_view(request):
+    if request.method != 'GET':
+        return await sync_to_async(views.records_view)(request)
+    try:
+        records, limit = records_query(request)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    if limit is None:
+        rows = [row async for row in record_rows(records)]
+        return FastJsonResponse({'records': serialize_record_rows(rows)})
+    page = [row async for row in record_rows(records)[: limit + 1]]
+    return FastJsonResponse(records_page(page, limit))
+
+
+@require_http_methods(['GET'])
+@login_required_api
+@versioned_api
+async def dashboard_summary_view(request):
+    try:
+        date_from, date_to = parse_date_range(request)
+    except ValueError:
+        return JsonResponse({'error': 'from and to must be YYYY-MM-DD'}, status=400)
+    rows = [row async for row in dashboard_rows(request.user, date_from, date_to)]
+    return FastJsonResponse(dashboard_summary(rows))
@@ -0,0 +1,67 @@
+"""Append-only per-user change log behind ``/api/sync/``.
+
+Each write records what changed as ``(model, object_id, action, data)``
+tuples under a fresh sequence number taken from the user's data version.
+Clients keep the last sequence they saw and ask for everything after it.
+Deleting a subject logs only the subject's tombstone; clients drop its
+lectures and records themselves, as the database cascade does. Bulk imports
+log a single ``resync`` entry instead of one entry per row.
+"""
+from django.db.models import Max
+
+from .models import ChangeLogEntry, UserSetting
+from .versioning import bump_data_version
+
+SYNC_PAGE_SIZE = 1000
+
+
+def log_changes(user_id, changes):
+    """Record ``changes`` for the user under a new sequence number; call inside a transaction."""
+    seq = bump_data_version(user_id)
+    ChangeLogEntry.objects.bulk_create(
+        ChangeLogEntry(user_id=user_id, seq=seq, model=model, object_id=object_id, action=action, data=data)
+        for model, object_id, action, data in changes
+    )
+    return seq
+
+
+def log_resync(user_ids):
+    """Tell the clients of ``user_ids`` to reload everything; call inside a transaction."""
+    for user_id in sorted(user_ids):
+        log_changes(user_id, [('all', None, 'resync', None)])
+
+
+def changes_since(user, since, limit=SYNC_PAGE_SIZE):
+    """Return ``(entries, has_more)`` for sequence numbers after ``since``, oldest first."""
+    entries = ChangeLogEntry.objects.filter(user=user, seq__gt=since).order_by('seq', 'id')
+    page = list(entries[: limit + 1])
+    has_more = len(page) > limit
+    if has_more:
+        # Never split the entries of one write across pages.
+        boundary = page[limit].seq
+        page = [entry for entry in page if entry.seq < boundary] or list(entries.filter(seq=boundary))
+    return page, has_more
+
+
+def compact(user_id, before):
+    """Fold the user's entries created before ``before`` into one snapshot entry per object.
+
+    Superseded upserts are removed, and old tombstones and resync markers are
+    dropped; the user's ``sync_floor`` is raised past them so that clients
+    behind it are told to reload instead of silently missing a delete.
+    Returns the number of entries removed. Call inside a transaction.
+    """
+    setting, _ = UserSetting.objects.select_for_update().get_or_create(user_id=user_id)
+    entries = ChangeLogEntry.objects.filter(user_id=user_id)
+    old = entries.filter(created_at__lt=before)
+
+    latest = entries.values('model', 'object_id').annotate(last=Max('id')).values('last')
+    removed, _ = old.filter(action='upsert').exclude(id__in=latest).delete()
+
+    dropped = old.exclude(action='upsert')
+    floor = dropped.aggregate(floor=Max('seq'))['floor']
+    if floor is not None:
+        removed += dropped.delete()[0]
+        if floor > setting.sync_floor:
+            UserSetting.objects.filter(pk=setting.pk).update(sync_floor=floor)
+    return removed
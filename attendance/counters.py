@@ -0,0 +1,129 @@
+"""Incrementally maintained per-subject attendance counters.
+
+Every write to AttendanceRecord must be reported through ``records_changed`` so
+that SubjectAttendanceSummary stays in step with the records table. Callers
+are expected to run inside ``transaction.atomic()`` together with the record
+write itself.
+
+Records moved out by ``archive_attendance`` stay counted: the counters cover
+the live records plus the archived months in AttendanceRollup.
+"""
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F, Q, Sum
+
+from .models import AttendanceRecord, AttendanceRollup, SubjectAttendanceSummary
+
+STATUSES = ('present', 'absent', 'off')
+
+
+def count_records(records):
+    """Return ``{subject_id: {'user_id', 'present', 'absent', 'off'}}`` in one grouped query."""
+    rows = (
+        records.order_by()
+        .values('subject_id', 'user_id')
+        .annotate(**{status: Count('id', filter=Q(status=status)) for status in STATUSES})
+    )
+    return {
+        row['subject_id']: {'user_id': row['user_id'], **{status: row[status] for status in STATUSES}}
+        for row in rows
+    }
+
+
+def count_history(records, rollups):
+    """``count_records`` for ``records`` plus the archived totals in ``rollups``."""
+    counts = count_records(records)
+    rows = (
+        rollups.order_by()
+        .values('subject_id', 'user_id')
+        .annotate(**{f'archived_{status}': Sum(status) for status in STATUSES})
+    )
+    for row in rows:
+        subject = counts.setdefault(row['subject_id'], {'user_id': row['user_id'], **dict.fromkeys(STATUSES, 0)})
+        for status in STATUSES:
+            subject[status] += row[f'archived_{status}']
+    return counts
+
+
+def record_status_changed(user_id, subject_id, old_status=None, new_status=None):
+    """Apply a single record transition to the subject's counters.
+
+    ``old_status`` is ``None`` for a newly created record and ``new_status`` is
+    ``None`` for a deleted one.
+    """
+    records_changed(user_id, [(subject_id, old_status, new_status)])
+
+
+def records_changed(user_id, transitions):
+    """Apply many ``(subject_id, old_status, new_status)`` transitions, one UPDATE per subject."""
+    per_subject = defaultdict(Counter)
+    for subject_id, old_status, new_status in transitions:
+        if old_status == new_status:
+            continue
+        if old_status:
+            per_subject[subject_id][old_status] -= 1
+        if new_status:
+            per_subject[subject_id][new_status] += 1
+
+    for subject_id, deltas in per_subject.items():
+        deltas = {status: delta for status, delta in deltas.items() if delta}
+        if not deltas:
+            continue
+        summary = SubjectAttendanceSummary.objects.filter(subject_id=subject_id)
+        increments = {status: F(status) + delta for status, delta in deltas.items()}
+        if summary.update(**increments):
+            continue
+
+        # No counter row yet: seed it from the records table and the rollups
+        # as they were before the writes that triggered this call, then apply
+        # the deltas like any other write. When two first writes race, the
+        # second insert is skipped and both deltas still land on the one row.
+        counts = count_history(
+            AttendanceRecord.objects.filter(subject_id=subject_id),
+            AttendanceRollup.objects.filter(subject_id=subject_id),
+        ).get(subject_id, {})
+        seed = {status: max(counts.get(status, 0) - deltas.get(status, 0), 0) for status in STATUSES}
+        SubjectAttendanceSummary.objects.bulk_create(
+            [SubjectAttendanceSummary(subject_id=subject_id, user_id=user_id, **seed)], ignore_conflicts=True
+        )
+        summary.update(**increments)
+
+
+def reconcile(user_ids=None, fix=True, batch_size=1000):
+    """Compare every counter row against the records table and rollups in bulk.
+
+    Returns ``(missing, stale)`` lists of subject ids. With ``fix``
+    the differences are written back using bulk operations.
+    """
+    records = AttendanceRecord.objects.all()
+    rollups = AttendanceRollup.objects.all()
+    summaries = SubjectAttendanceSummary.objects.all()
+    if user_ids:
+        records = records.filter(user_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+        summaries = summaries.filter(user_id__in=user_ids)
+
+    expected = count_history(records, rollups)
+    current = {summary.subject_id: summary for summary in summaries.iterator(chunk_size=batch_size)}
+
+    missing = [subject_id for subject_id in expected if subject_id not in current]
+    stale = []
+    for subject_id, summary in current.items():
+        counts = expected.get(subject_id, dict.fromkeys(STATUSES, 0))
+        if any(getattr(summary, status) != counts[status] for status in STATUSES):
+            for status in STATUSES:
+                setattr(summary, status, counts[status])
+            stale.append(subject_id)
+
+    if fix:
+        # Concurrent rebuilds (e.g. two queued jobs) may insert the same row.
+        SubjectAttendanceSummary.objects.bulk_create(
+            [SubjectAttendanceSummary(subject_id=subject_id, **expected[subject_id]) for subject_id in missing],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+        SubjectAttendanceSummary.objects.bulk_update(
+            [current[subject_id] for subject_id in stale], STATUSES, batch_size=batch_size
+        )
+
+    return missing, stale
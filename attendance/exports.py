@@ -0,0 +1,74 @@
+"""Streaming serialisation of a user's attendance history.
+
+Rows are pulled from a server-side cursor in fixed-size chunks and encoded
+as they arrive, so memory use does not depend on the size of the history.
+Archived records are read from their own table and merged in date order.
+"""
+import csv
+import heapq
+import json
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+EXPORT_COLUMNS = ('id', 'subject_id', 'subject_name', 'date', 'lecture_time', 'status')
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BUFFER_BYTES = 64 * 1024
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the encoded line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(records):
+    """Yield ``EXPORT_COLUMNS`` tuples for ``records`` without building model instances."""
+    rows = records.order_by('date', 'id').values_list(
+        'id', 'subject_id', 'subject__name', 'date', 'lecture_time', 'status'
+    )
+    for record_id, subject_id, subject_name, date, lecture_time, status in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield (
+            record_id,
+            subject_id,
+            subject_name,
+            date.isoformat(),
+            lecture_time.strftime('%H:%M') if lecture_time else None,
+            status,
+        )
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, row))) + '\n'
+
+
+def buffered(lines, size=EXPORT_BUFFER_BYTES):
+    """Group small lines into ~``size`` byte chunks; the first line is sent at once."""
+    buffer, buffered_bytes = [], 0
+    for index, line in enumerate(lines):
+        buffer.append(line)
+        buffered_bytes += len(line)
+        if index == 0 or buffered_bytes >= size:
+            yield ''.join(buffer)
+            buffer, buffered_bytes = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_export(records, export_format, archived=None):
+    """Return an iterator of encoded chunks for ``records`` (and ``archived``) in ``export_format``."""
+    encoder = iter_csv if export_format == 'csv' else iter_ndjson
+    rows = export_rows(records)
+    if archived is not None:
+        rows = heapq.merge(export_rows(archived), rows, key=lambda row: (row[3], row[0]))
+    return buffered(encoder(rows))
@@ -0,0 +1,42 @@
+"""Query-string filters shared by the record endpoints and background jobs.
+
+Only ``request.GET`` is read, so jobs can replay a stored query string
+through the same code.
+"""
+from datetime import datetime
+
+RECORD_FILTER_ERROR = 'Invalid filter: use YYYY-MM-DD dates, a numeric subject_id and a valid status'
+
+
+def parse_date_range(request):
+    """Read optional ``?from=`` / ``?to=`` (YYYY-MM-DD) bounds; raises ValueError on bad input."""
+    bounds = []
+    for name in ('from', 'to'):
+        value = (request.GET.get(name) or '').strip()
+        bounds.append(datetime.strptime(value, '%Y-%m-%d').date() if value else None)
+    return tuple(bounds)
+
+
+def filter_records(request, records):
+    """Apply the ``date``/``from``/``to``/``subject_id``/``status`` query filters; raises ValueError."""
+    date_str = (request.GET.get('date') or '').strip()
+    if date_str:
+        records = records.filter(date=datetime.strptime(date_str, '%Y-%m-%d').date())
+
+    date_from, date_to = parse_date_range(request)
+    if date_from:
+        records = records.filter(date__gte=date_from)
+    if date_to:
+        records = records.filter(date__lte=date_to)
+
+    subject_id = (request.GET.get('subject_id') or '').strip()
+    if subject_id:
+        records = records.filter(subject_id=int(subject_id))
+
+    status = (request.GET.get('status') or '').strip().lower()
+    if status:
+        if status not in {'present', 'absent', 'off'}:
+            raise ValueError(f'unknown status {status!r}')
+        records = records.filter(status=status)
+    return records
+
@@ -0,0 +1,289 @@
+﻿"""Set-based CSV import of timetables and attendance history.
+
+The CSV is read as a stream and processed in chunks. Each chunk resolves or
+creates its Subject rows in bulk. It is then loaded into a temporary
+staging table (``COPY FROM STDIN`` on PostgreSQL) and merged into the real
+tables with two set-based statements, and the counters of its users are
+rebuilt in the same transaction. Rows that fail validation are reported
+back with their line number instead of aborting the import.
+
+Records CSV columns: ``subject, date, status[, lecture_time, subject_code]``
+Lectures CSV columns: ``subject, day, time[, subject_code]``
+Either file may carry an ``email`` column when importing for many users.
+"""
+import csv
+import io
+from datetime import date, datetime, time
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import changelog, counters
+from .archive import archived_keys
+from .models import AttendanceRecord, Lecture, Subject
+from .versioning import lock_versions
+
+IMPORT_KINDS = ('records', 'lectures')
+IMPORT_CHUNK_ROWS = 50000
+MAX_REPORTED_REJECTS = 1000
+
+STAGE_TABLE = 'attendance_import_stage'
+STAGE_COLUMNS = {
+    'records': ('user_id', 'subject_id', 'date', 'lecture_time', 'status'),
+    'lectures': ('user_id', 'subject_id', 'day', 'time'),
+}
+STAGE_DDL = {
+    'records': f'CREATE TEMPORARY TABLE {STAGE_TABLE} (user_id bigint, subject_id bigint, date date, lecture_time time, status varchar(10))',
+    'lectures': f'CREATE TEMPORARY TABLE {STAGE_TABLE} (user_id bigint, subject_id bigint, day varchar(10), time time)',
+}
+VALID_DAYS = {value for value, _ in Lecture.DAYS}
+VALID_STATUSES = {value for value, _ in AttendanceRecord.STATUS_CHOICES}
+
+
+def _parse_time(value):
+    return datetime.strptime(value, '%H:%M').time()
+
+
+def parse_row(kind, row):
+    """Validate one CSV row; returns ``(email, subject, code, key, value)`` or raises ValueError.
+
+    ``key`` identifies the target row within its subject and ``value`` is the
+    column that is overwritten on conflict (``None`` for lectures).
+    """
+    email = (row.get('email') or '').strip().lower()
+    subject = (row.get('subject') or '').strip()
+    code = (row.get('subject_code') or '').strip()
+    if not subject:
+        raise ValueError('subject is required')
+    if len(subject) > Subject._meta.get_field('name').max_length:
+        raise ValueError('subject name is too long')
+    if len(code) > Subject._meta.get_field('code').max_length:
+        raise ValueError('subject_code is too long')
+
+    if kind == 'records':
+        try:
+            record_date = datetime.strptime((row.get('date') or '').strip(), '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError('date must be YYYY-MM-DD') from None
+        status = (row.get('status') or '').strip().lower()
+        if status not in VALID_STATUSES:
+            raise ValueError('status must be present, absent or off')
+        lecture_time_value = (row.get('lecture_time') or '').strip()
+        try:
+            lecture_time = _parse_time(lecture_time_value) if lecture_time_value else None
+        except ValueError:
+            raise ValueError('lecture_time must be HH:MM') from None
+        return email, subject, code, (record_date, lecture_time), status
+
+    day = (row.get('day') or '').strip().lower()
+    if day not in VALID_DAYS:
+        raise ValueError('day must be a weekday name')
+    try:
+        lecture_time = _parse_time((row.get('time') or '').strip())
+    except ValueError:
+        raise ValueError('time must be HH:MM') from None
+    return email, subject, code, (day, lecture_time), None
+
+
+def import_csv(lines, kind, user=None, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Import an iterable of CSV text lines; returns a summary dict.
+
+    With ``user`` every row belongs to that account and any ``email`` column
+    is ignored; otherwise each row's ``email`` selects the account.
+    """
+    if kind not in IMPORT_KINDS:
+        raise ValueError(f'kind must be one of {", ".join(IMPORT_KINDS)}')
+
+    result = {'rows': 0, 'created': 0, 'updated': 0, 'subjects_created': 0, 'rejected_count': 0, 'rejected': []}
+    touched_users = set()
+    chunk = []
+
+    def reject(line, reason):
+        result['rejected_count'] += 1
+        if len(result['rejected']) < MAX_REPORTED_REJECTS:
+            result['rejected'].append({'line': line, 'error': reason})
+
+    reader = csv.DictReader(lines)
+    for row in reader:
+        result['rows'] += 1
+        # A quoted field may span lines: report where the row ends.
+        line = reader.line_num
+        try:
+            chunk.append((line, *parse_row(kind, row)))
+        except ValueError as exc:
+            reject(line, str(exc))
+            continue
+        if len(chunk) >= chunk_rows:
+            touched_users |= _import_chunk(kind, chunk, user, result, reject)
+            chunk = []
+    if chunk:
+        touched_users |= _import_chunk(kind, chunk, user, result, reject)
+
+    if touched_users:
+        with transaction.atomic():
+            changelog.log_resync(touched_users)
+    return result
+
+
+def _import_chunk(kind, chunk, user, result, reject):
+    if user is not None:
+        user_ids = {email: user.id for _, email, *_ in chunk}
+    else:
+        emails = {email for _, email, *_ in chunk if email}
+        user_ids = dict(User.objects.filter(username__in=emails).values_list('username', 'id'))
+
+    # Later lines win when the same lecture appears twice in a chunk.
+    staged = {}
+    subject_codes = {}
+    for line, email, subject, code, key, value in chunk:
+        user_id = user_ids.get(email)
+        if user_id is None:
+            reject(line, 'email is required' if not email else f'unknown user {email}')
+            continue
+        subject_codes.setdefault((user_id, subject), code)
+        staged[(user_id, subject, *key)] = (line, value)
+    if not staged:
+        return set()
+
+    with transaction.atomic():
+        if kind == 'records':
+            # Record writers lock the users' versions before any record row.
+            lock_versions({user_id for user_id, *_ in staged})
+        subject_ids = _resolve_subjects(subject_codes, result)
+        rows = {}
+        for (user_id, subject, *key), (line, value) in staged.items():
+            row = (user_id, subject_ids[(user_id, subject)], *key)
+            rows[row] = (line, value)
+        if kind == 'records':
+            for row in archived_keys({row[0] for row in rows}, rows):
+                reject(rows.pop(row)[0], 'lecture is archived and can no longer be changed')
+        rows = [(*row, value) if kind == 'records' else row for row, (_, value) in rows.items()]
+        if not rows:
+            return set()
+        created, updated = _merge(kind, rows)
+        touched = {user_id for user_id, *_ in rows}
+        if kind == 'records':
+            # Rebuilt under the version locks taken above, so no concurrent
+            # F() increment lands between the count and the write-back.
+            counters.reconcile(user_ids=touched)
+
+    result['created'] += created
+    result['updated'] += updated
+    return touched
+
+
+def _resolve_subjects(subject_codes, result):
+    """Map ``(user_id, name)`` to subject ids, creating the missing subjects in one statement."""
+    user_ids = {user_id for user_id, _ in subject_codes}
+    names = {name for _, name in subject_codes}
+
+    def lookup():
+        existing = Subject.objects.filter(user_id__in=user_ids, name__in=names).values_list('user_id', 'name', 'id')
+        return {(user_id, name): subject_id for user_id, name, subject_id in existing}
+
+    subject_ids = lookup()
+    missing = [
+        (user_id, name, code) for (user_id, name), code in subject_codes.items() if (user_id, name) not in subject_ids
+    ]
+    if missing:
+        result['subjects_created'] += _insert_subjects(missing)
+        subject_ids = lookup()
+    return subject_ids
+
+
+def _insert_subjects(subjects):
+    """Insert ``(user_id, name, code)`` rows, skipping names that already exist; returns the rows inserted."""
+    # bulk_create(ignore_conflicts=True) cannot tell which rows were skipped
+    # because a concurrent import created the same subject; the rowcount of
+    # ON CONFLICT DO NOTHING only counts the inserted ones.
+    table = Subject._meta.db_table
+    columns = ('user_id', 'name', 'code', 'created_at')
+    created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    batch_size = connection.ops.bulk_batch_size(columns, subjects)
+    inserted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(subjects), batch_size):
+            batch = subjects[start : start + batch_size]
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(columns)}) VALUES {", ".join(["(%s, %s, %s, %s)"] * len(batch))} '
+                'ON CONFLICT (user_id, name) DO NOTHING',
+                [value for row in batch for value in (*row, created_at)],
+            )
+            inserted += cursor.rowcount
+    return inserted
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Bulk-load ``rows`` into ``table``: ``COPY FROM STDIN`` on PostgreSQL, ``executemany`` elsewhere."""
+    if connection.vendor != 'postgresql':
+        placeholders = ', '.join(['%s'] * len(columns))
+        params = [[value.isoformat() if isinstance(value, (date, time)) else value for value in row] for row in rows]
+        cursor.executemany(f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})', params)
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow('' if value is None else value for value in row)
+    buffer.seek(0)
+    raw = cursor.cursor
+    copy_sql = f'COPY {table} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)'
+    if hasattr(raw, 'copy_expert'):  # psycopg2
+        raw.copy_expert(copy_sql, buffer)
+    else:  # psycopg 3
+        with raw.copy(copy_sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def _merge(kind, rows):
+    """Load ``rows`` into the staging table and merge them; returns ``(created, updated)``."""
+    with connection.cursor() as cursor:
+        cursor.execute(STAGE_DDL[kind])
+        copy_rows(cursor, STAGE_TABLE, STAGE_COLUMNS[kind], rows)
+        if kind == 'records':
+            counts = _merge_records(cursor)
+        else:
+            counts = _merge_lectures(cursor), 0
+        # Only dropped on success: after an error the transaction is aborted
+        # (a DROP would fail and hide the error) and its rollback removes the
+        # table anyway.
+        cursor.execute(f'DROP TABLE {STAGE_TABLE}')
+    return counts
+
+
+def _merge_records(cursor):
+    table = AttendanceRecord._meta.db_table
+    # lecture_time is nullable, so rows are matched with IS NOT DISTINCT FROM
+    # rather than relying on ON CONFLICT against the unique index, whose NULLs
+    # never conflict. Record writers hold the user's version lock, which the
+    # import took first; ON CONFLICT still turns a row written by anything
+    # else in the meantime into an update instead of an IntegrityError.
+    match = (
+        f'{table}.user_id = s.user_id AND {table}.subject_id = s.subject_id '
+        f'AND {table}.date = s.date AND {table}.lecture_time IS NOT DISTINCT FROM s.lecture_time'
+    )
+    cursor.execute(
+        f'UPDATE {table} SET status = s.status FROM {STAGE_TABLE} s '
+        f'WHERE {match} AND {table}.status <> s.status'
+    )
+    updated = cursor.rowcount
+    cursor.execute(
+        f'INSERT INTO {table} (user_id, subject_id, date, lecture_time, status) '
+        f'SELECT s.user_id, s.subject_id, s.date, s.lecture_time, s.status FROM {STAGE_TABLE} s '
+        f'WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE {match}) '
+        'ON CONFLICT (user_id, subject_id, date, lecture_time) DO UPDATE SET status = EXCLUDED.status'
+    )
+    return cursor.rowcount, updated
+
+
+def _merge_lectures(cursor):
+    table = Lecture._meta.db_table
+    cursor.execute(
+        f'INSERT INTO {table} (user_id, subject_id, day, time) '
+        f'SELECT s.user_id, s.subject_id, s.day, s.time FROM {STAGE_TABLE} s '
+        f'WHERE NOT EXISTS (SELECT 1 FROM {table} l WHERE l.user_id = s.user_id AND l.subject_id = s.subject_id '
+        f'AND l.day = s.day AND l.time = s.time) '
+        'ON CONFLICT (user_id, subject_id, day, time) DO NOTHING'
+    )
+    return cursor.rowcount
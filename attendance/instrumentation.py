@@ -0,0 +1,200 @@
+﻿"""Per-request SQL instrumentation and query budgets.
+
+``QueryTimingMiddleware`` counts and times every query issued while a request
+is handled, reports it in a ``Server-Timing`` header and logs requests over
+the configured thresholds. Streamed bodies are generated after the view
+returns, so their queries are counted while the body is consumed and such
+requests are checked against the thresholds once it is exhausted; their
+header only covers the time to the first byte. ``QUERY_BUDGETS`` declares how many queries each
+named route in ``attendance/urls.py`` may issue, and ``query_budget`` turns
+that into an assertion for tests and for the ``check_query_budgets`` command.
+"""
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger('attendance.sql')
+
+# Queries per request, including the session and auth lookups done by the
+# middleware stack and transaction savepoints, keyed by URL name and HTTP
+# method: the count ``check_query_budgets`` measures plus a margin of one
+# query for reads and two for writes.
+QUERY_BUDGETS = {
+    'register': {'POST': 10},
+    'login': {'POST': 7},
+    'logout': {'POST': 6},
+    'me': {'GET': 4},
+    'subjects': {'GET': 5, 'POST': 12},
+    'subject-detail': {'PUT': 9, 'DELETE': 10},
+    'lectures': {'GET': 5, 'POST': 12},
+    'lecture-detail': {'DELETE': 8},
+    'records': {'GET': 5, 'POST': 18},
+    'records-export': {'GET': 5},
+    'records-bulk': {'POST': 13},
+    'records-missing': {'GET': 5},
+    'record-detail': {'DELETE': 11},
+    'import': {'POST': 18},
+    'settings': {'GET': 5, 'PUT': 9},
+    'bootstrap': {'GET': 8},
+    'sync': {'GET': 6},
+    'calendar': {'GET': 5},
+    'dashboard-summary': {'GET': 5},
+    'projection': {'GET': 7},
+    'jobs': {'GET': 4},
+    'job-detail': {'GET': 4},
+    'job-result': {'GET': 4},
+    'job-create': {'POST': 8},
+}
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats:
+    """``connection.execute_wrapper`` callable that counts and times queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+# Stats of the request being handled. Connections are per thread, and under
+# ASGI a request's queries run on sync_to_async threads, so the middleware
+# publishes its stats through a context variable (copied into those threads)
+# instead of wrapping one connection.
+_request_stats = contextvars.ContextVar('attendance_request_stats', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def _install_query_recorder(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class QueryTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'ATTENDANCE_SLOW_REQUEST_MS', 500)
+        self.max_queries = getattr(settings, 'ATTENDANCE_SLOW_REQUEST_QUERIES', 20)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = QueryStats()
+        started = time.perf_counter()
+        token = _request_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self.report(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        started = time.perf_counter()
+        token = _request_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self.report(request, response, stats, started)
+
+    def report(self, request, response, stats, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = stats.duration * 1000
+
+        response['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{stats.count} queries", app;dur={max(total_ms - db_ms, 0):.1f}'
+        )
+
+        if response.streaming:
+            measure = self.ameasure_stream if response.is_async else self.measure_stream
+            response.streaming_content = measure(response.streaming_content, request, stats, started)
+        else:
+            self.check_thresholds(request, stats, started)
+        return response
+
+    def measure_stream(self, content, request, stats, started):
+        content = iter(content)
+        try:
+            while True:
+                token = _request_stats.set(stats)
+                try:
+                    chunk = next(content)
+                except StopIteration:
+                    break
+                finally:
+                    _request_stats.reset(token)
+                yield chunk
+        finally:
+            self.check_thresholds(request, stats, started)
+
+    async def ameasure_stream(self, content, request, stats, started):
+        content = aiter(content)
+        try:
+            while True:
+                # Queries run in sync_to_async threads, which copy the context.
+                token = _request_stats.set(stats)
+                try:
+                    chunk = await anext(content)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    _request_stats.reset(token)
+                yield chunk
+        finally:
+            self.check_thresholds(request, stats, started)
+
+    def check_thresholds(self, request, stats, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = stats.duration * 1000
+        if total_ms > self.slow_ms or stats.count > self.max_queries:
+            match = getattr(request, 'resolver_match', None)
+            logger.warning(
+                'Slow request %s %s (%s): %.0f ms total, %d queries in %.0f ms',
+                request.method,
+                request.path,
+                match.url_name if match else '-',
+                total_ms,
+                stats.count,
+                db_ms,
+            )
+
+
+@contextmanager
+def query_budget(url_name, method='GET'):
+    """Fail with QueryBudgetExceeded if the block issues more queries than the route's budget."""
+    budget = QUERY_BUDGETS[url_name][method.upper()]
+    stats = QueryStats()
+    with connection.execute_wrapper(stats):
+        yield stats
+    if stats.count > budget:
+        raise QueryBudgetExceeded(f'{method.upper()} {url_name} issued {stats.count} queries (budget {budget})')
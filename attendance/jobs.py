@@ -0,0 +1,205 @@
+"""Database-backed queue for work too slow to run inside a request.
+
+Views ``enqueue`` a Job row and answer at once; ``run_worker`` processes
+``claim`` the oldest queued job with ``SELECT ... FOR UPDATE SKIP LOCKED``,
+so any number of workers, on any number of hosts, share the queue through
+the database alone and never pick the same job twice. The claim commits
+before the job runs. While it runs, the worker renews the job's lease every
+JOB_HEARTBEAT_SECONDS; a job whose lease is older than JOB_LEASE lost its
+worker and is queued again, up to JOB_MAX_ATTEMPTS runs. Finished jobs are
+removed after JOB_RETENTION.
+
+Uploads and exports are stored gzip-compressed on the job row.
+"""
+import gzip
+import io
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+
+from . import counters
+from .exports import stream_export
+from .filters import filter_records
+from .imports import import_csv
+from .models import ArchivedAttendanceRecord, AttendanceRecord, Job
+from .purge import purge_users
+
+logger = logging.getLogger('attendance.jobs')
+
+JOB_HEARTBEAT_SECONDS = 30
+JOB_LEASE = timedelta(minutes=2)
+JOB_MAX_ATTEMPTS = 3
+JOB_RETENTION = timedelta(days=7)
+JOB_POLL_SECONDS = 1.0
+HOUSEKEEPING_SECONDS = 60
+
+
+def enqueue(kind, user=None, params=None, data=None):
+    """Queue a job of ``kind``; ``data`` bytes are handed to the job compressed."""
+    return Job.objects.create(
+        kind=kind, user=user, params=params or {}, input=gzip.compress(data) if data is not None else None
+    )
+
+
+def query_request(query):
+    """A bare HttpRequest whose GET holds ``query``, for the shared record filters."""
+    request = HttpRequest()
+    request.GET = QueryDict(query)
+    return request
+
+
+def run_export(job):
+    request = query_request(job.params.get('query', ''))
+    records = filter_records(request, AttendanceRecord.objects.filter(user_id=job.user_id))
+    archived = filter_records(request, ArchivedAttendanceRecord.objects.filter(user_id=job.user_id))
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb') as out:
+        for chunk in stream_export(records, job.params['format'], archived=archived):
+            out.write(chunk.encode())
+    job.output = buffer.getvalue()
+    return {'format': job.params['format'], 'compressed_bytes': len(job.output)}
+
+
+def run_import(job):
+    text = gzip.decompress(job.input).decode('utf-8-sig')
+    return import_csv(io.StringIO(text, newline=''), job.params['kind'], user=job.user)
+
+
+def run_reconcile(job):
+    missing, stale = counters.reconcile(user_ids=[job.user_id] if job.user_id else None)
+    return {'missing': len(missing), 'stale': len(stale)}
+
+
+def run_delete_account(job):
+    deleted = purge_users([job.params['user_id']])
+    return {'deleted': sum(deleted.values())}
+
+
+JOB_HANDLERS = {
+    'export': run_export,
+    'import': run_import,
+    'reconcile': run_reconcile,
+    'delete_account': run_delete_account,
+}
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker):
+    """Mark the oldest queued job as running for ``worker`` and return it, or None."""
+    with transaction.atomic():
+        job_id = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED)
+            .order_by('id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        now = timezone.now()
+        Job.objects.filter(pk=job_id).update(
+            status=Job.RUNNING, started_at=now, heartbeat_at=now, attempts=F('attempts') + 1, worker=worker
+        )
+    return Job.objects.select_related('user').get(pk=job_id)
+
+
+@contextmanager
+def heartbeat(job, interval=JOB_HEARTBEAT_SECONDS):
+    """Renew ``job``'s lease every ``interval`` seconds from a background thread while the block runs."""
+    stopped = threading.Event()
+
+    def beat():
+        try:
+            while not stopped.wait(interval):
+                try:
+                    Job.objects.filter(pk=job.pk, status=Job.RUNNING, attempts=job.attempts).update(
+                        heartbeat_at=timezone.now()
+                    )
+                except DatabaseError:
+                    # One missed beat is harmless; the lease outlasts several.
+                    logger.warning('Could not renew the lease of job %s', job.pk, exc_info=True)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'job-{job.pk}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def run(job):
+    """Run a claimed job and store its outcome."""
+    if job.user_id is None and job.kind != 'delete_account':
+        # The owner was deleted after queueing: an import would route rows by
+        # email and a rebuild would cover every account.
+        outcome = {'status': Job.FAILED, 'error': 'The account no longer exists'}
+    else:
+        try:
+            with heartbeat(job):
+                result = JOB_HANDLERS[job.kind](job)
+        except Exception as exc:
+            logger.exception('Job %s (%s) failed', job.pk, job.kind)
+            outcome = {'status': Job.FAILED, 'error': str(exc) or exc.__class__.__name__}
+        else:
+            outcome = {'status': Job.DONE, 'result': result, 'output': job.output}
+    # update() rather than save(): an account deletion has just nulled the
+    # row's user, and the input is no longer needed. A run whose lease
+    # expired and was claimed again no longer owns the row.
+    Job.objects.filter(pk=job.pk, attempts=job.attempts).update(finished_at=timezone.now(), input=None, **outcome)
+    return outcome['status']
+
+
+def housekeeping(now=None):
+    """Requeue jobs whose lease expired and drop old finished jobs; returns ``(requeued, lost, removed)``."""
+    now = now or timezone.now()
+    # Rows claimed before leases existed have no heartbeat: judge those by their start.
+    expired = Q(heartbeat_at__lt=now - JOB_LEASE) | Q(heartbeat_at__isnull=True, started_at__lt=now - JOB_LEASE)
+    stale = Job.objects.filter(expired, status=Job.RUNNING)
+    lost = stale.filter(attempts__gte=JOB_MAX_ATTEMPTS).update(status=Job.FAILED, finished_at=now, error='Worker lost')
+    requeued = stale.update(status=Job.QUEUED, worker='')
+    removed, _ = Job.objects.filter(status__in=[Job.DONE, Job.FAILED], finished_at__lt=now - JOB_RETENTION).delete()
+    return requeued, lost, removed
+
+
+def work(once=False, poll=JOB_POLL_SECONDS, stop=lambda: False):
+    """Claim and run jobs until ``stop()`` returns true, or the queue is empty with ``once``.
+
+    Returns the number of jobs run.
+    """
+    worker = worker_name()
+    ran = 0
+    next_housekeeping = 0.0
+    while not stop():
+        # Between jobs, as between requests: honour CONN_MAX_AGE.
+        close_old_connections()
+        if time.monotonic() >= next_housekeeping:
+            requeued, lost, _ = housekeeping()
+            if requeued or lost:
+                logger.warning('Requeued %d and failed %d jobs left running by lost workers', requeued, lost)
+            next_housekeeping = time.monotonic() + HOUSEKEEPING_SECONDS
+
+        job = claim(worker)
+        if job is None:
+            if once:
+                break
+            time.sleep(poll)
+            continue
+        status = run(job)
+        logger.info('Job %s (%s) %s', job.pk, job.kind, status)
+        ran += 1
+    return ran
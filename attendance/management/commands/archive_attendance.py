@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance import archive
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'{value!r} is not a YYYY-MM-DD date') from None
+
+
+class Command(BaseCommand):
+    help = (
+        'Move attendance records dated before --before into the archive table and keep per-subject, '
+        'per-month rollups of them; the dashboard, counters and exports still include them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', required=True, type=_date, help='Archive records dated before this day (YYYY-MM-DD)')
+        parser.add_argument(
+            '--users-per-batch', type=int, default=archive.ARCHIVE_USERS_PER_BATCH, help='Users archived per transaction'
+        )
+
+    def handle(self, *args, before=None, users_per_batch=archive.ARCHIVE_USERS_PER_BATCH, **options):
+        users, records = archive.archive_before(before, users_per_batch=users_per_batch)
+        self.stdout.write(self.style.SUCCESS(f'Archived {records} records of {users} users dated before {before}'))
@@ -0,0 +1,158 @@
+import json
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+from django.urls import resolve
+
+from attendance.instrumentation import QueryBudgetExceeded, query_budget
+from attendance.models import Job
+from attendance.purge import purge_users
+
+TERM = timedelta(weeks=16)
+
+# GET requests replayed through the full middleware stack; {date} and
+# {month} are filled from the user's most recent record, {term_end} a term
+# after it.
+CHECKED_REQUESTS = [
+    '/api/auth/me/',
+    '/api/subjects/',
+    '/api/lectures/',
+    '/api/records/',
+    '/api/records/?limit=50',
+    '/api/records/?from={date}&to={date}',
+    '/api/records/export/?format=ndjson',
+    '/api/settings/',
+    '/api/bootstrap/',
+    '/api/sync/?since=0',
+    '/api/calendar/?month={month}',
+    '/api/dashboard/summary/',
+    '/api/dashboard/summary/?from={date}&to={date}',
+    '/api/projection/?from={date}&to={term_end}',
+    '/api/records/missing/?from={date}&to={date}',
+    '/api/jobs/',
+]
+
+# The write routes run as a throwaway account that is registered, used and
+# deleted again, so replaying them never touches real data.
+SCRATCH_EMAIL = 'query-budget-check@example.invalid'
+SCRATCH_PASSWORD = 'query-budget-check'
+
+
+def checked_request(client, method, url, data=None, content_type='application/json'):
+    """Issue one request under its route's budget; returns ``(response, queries, error)``.
+
+    Streamed bodies are consumed inside the budget, since their queries only
+    run then. ``error`` is the QueryBudgetExceeded, or ``None``.
+    """
+    url_name = resolve(urlsplit(url).path).url_name
+    body = json.dumps(data) if isinstance(data, dict) else data or ''
+    error = None
+    try:
+        with query_budget(url_name, method) as stats:
+            response = client.generic(method, url, body, content_type=content_type)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+    except QueryBudgetExceeded as exc:
+        error = exc
+    return response, stats.count, error
+
+
+def replay_reads(user):
+    """``(method, url, queries, error)`` for each of CHECKED_REQUESTS, replayed as ``user``."""
+    latest = user.records.order_by('-date').values_list('date', flat=True).first()
+    client = Client()
+    client.force_login(user)
+    results = []
+    try:
+        for template in CHECKED_REQUESTS:
+            url = template.format(
+                date=latest.isoformat(), month=latest.strftime('%Y-%m'), term_end=(latest + TERM).isoformat()
+            )
+            _, queries, error = checked_request(client, 'GET', url)
+            results.append(('GET', url, queries, error))
+    finally:
+        client.logout()
+    return results
+
+
+def replay_writes():
+    """``(method, url, queries, error)`` for every budgeted write, replayed as a throwaway account."""
+    delete_scratch_account()
+    client = Client()
+    results = []
+
+    def step(method, url, data=None, content_type='application/json'):
+        response, queries, error = checked_request(client, method, url, data, content_type)
+        results.append((method, url, queries, error))
+        return response.json()
+
+    credentials = {'email': SCRATCH_EMAIL, 'password': SCRATCH_PASSWORD}
+    try:
+        step('POST', '/api/auth/register/', {'name': 'Query budget check', **credentials})
+        step('POST', '/api/auth/logout/')
+        step('POST', '/api/auth/login/', credentials)
+        subject = step('POST', '/api/subjects/', {'name': 'Budget', 'code': 'QB1'})['subject']['id']
+        step('PUT', f'/api/subjects/{subject}/', {'name': 'Budget', 'code': 'QB2'})
+        lecture = step('POST', '/api/lectures/', {'subject_id': subject, 'day': 'monday', 'time': '09:00'})
+        step('DELETE', f'/api/lectures/{lecture["lecture"]["id"]}/')
+        record = step(
+            'POST',
+            '/api/records/',
+            {'subject_id': subject, 'date': '2024-01-01', 'lecture_time': '09:00', 'status': 'present'},
+        )
+        step(
+            'POST',
+            '/api/records/bulk/',
+            {'records': [{'subject_id': subject, 'date': f'2024-01-{day:02d}', 'status': 'absent'} for day in (8, 15, 22)]},
+        )
+        step('DELETE', f'/api/records/{record["record"]["id"]}/')
+        step('POST', '/api/import/?kind=records', 'subject,date,status\nBudget,2024-01-29,present\n', 'text/csv')
+        step('PUT', '/api/settings/', {'target_percentage': 75})
+        job = step('POST', '/api/jobs/export/?format=csv')['job']['id']
+        step('GET', f'/api/jobs/{job}/')
+        step('GET', f'/api/jobs/{job}/result/')
+        step('DELETE', f'/api/subjects/{subject}/')
+        step('POST', '/api/jobs/delete-account/', {'password': SCRATCH_PASSWORD})
+    finally:
+        delete_scratch_account()
+    return results
+
+
+def delete_scratch_account():
+    scratch = list(User.objects.filter(username=SCRATCH_EMAIL).values_list('id', flat=True))
+    if scratch:
+        # Its queued jobs would otherwise outlive the account.
+        Job.objects.filter(user_id__in=scratch).delete()
+        purge_users(scratch)
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay the API read paths for a seeded user and every write route as a throwaway account, '
+        'and fail if any route exceeds its query budget.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='User id to replay as (default: the user with most records)')
+
+    def handle(self, *args, user=None, **options):
+        users = User.objects.annotate(record_count=Count('records')).order_by('-record_count')
+        target = users.filter(id=user).first() if user else users.first()
+        if target is None or not target.record_count:
+            raise CommandError('Seed some attendance data first (no user with records found)')
+
+        failures = []
+        for method, url, queries, error in replay_reads(target) + replay_writes():
+            if error:
+                failures.append(str(error))
+                self.stdout.write(self.style.ERROR(f'OVER  {method:<6} {url}: {error}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'ok    {method:<6} {url}: {queries} queries'))
+
+        if failures:
+            raise CommandError(f'{len(failures)} route(s) exceeded their query budget')
@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+TERM = timedelta(weeks=16)
+SEQ_SCAN = 'Seq Scan on attendance_'
+
+# GET requests whose SQL must be index-driven; {date} is filled from the
+# user's most recent record so every filter matches real rows; {term_end}
+# is a term after it.
+CHECKED_REQUESTS = [
+    '/api/subjects/',
+    '/api/lectures/',
+    '/api/lectures/?day=monday',
+    '/api/records/?date={date}',
+    '/api/records/?from={date}&to={date}',
+    '/api/records/?limit=50',
+    '/api/dashboard/summary/',
+    '/api/dashboard/summary/?from={date}&to={date}',
+    '/api/projection/?from={date}&to={term_end}',
+    '/api/records/missing/?from={date}&to={date}',
+]
+
+
+def explain(sql):
+    # With seq scans priced out, a Seq Scan in the plan means no usable
+    # index exists for the query, independent of the table's size.
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute(f'EXPLAIN {sql}')
+        return '\n'.join(row[0] for row in cursor.fetchall())
+
+
+def query_plans(user, latest):
+    """Yield ``(url, sql, plan)`` for every attendance query the checked requests issue as ``user``."""
+    factory = RequestFactory()
+    for template in CHECKED_REQUESTS:
+        url = template.format(date=latest.isoformat(), term_end=(latest + TERM).isoformat())
+        request = factory.get(url)
+        request.user = user
+        request.auser = sync_to_async(lambda: user)
+        match = resolve(request.path_info)
+        # Under ATTENDANCE_ASYNC_VIEWS the read paths are coroutines.
+        view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+
+        with CaptureQueriesContext(connection) as ctx:
+            view(request, *match.args, **match.kwargs)
+
+        for query in ctx.captured_queries:
+            if 'attendance_' in query['sql']:
+                yield url, query['sql'], explain(query['sql'])
+
+
+class Command(BaseCommand):
+    help = (
+        'Run each API read path for a seeded user, EXPLAIN the SQL it issues and fail if any '
+        'attendance table is read with a sequential scan (PostgreSQL only).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='User id to replay as (default: the user with most records)')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print the full plan of every query')
+
+    def handle(self, *args, user=None, verbose_plans=False, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('check_query_plans needs PostgreSQL')
+
+        users = User.objects.annotate(record_count=Count('records')).order_by('-record_count')
+        target = users.filter(id=user).first() if user else users.first()
+        if target is None or not target.record_count:
+            raise CommandError('Seed some attendance data first (no user with records found)')
+
+        latest = target.records.order_by('-date').values_list('date', flat=True).first()
+        failures = []
+
+        for url, sql, plan in query_plans(target, latest):
+            if verbose_plans:
+                self.stdout.write(f'\n{url}\n{sql}\n{plan}')
+            if SEQ_SCAN in plan:
+                failures.append((url, sql, plan))
+                self.stdout.write(self.style.ERROR(f'SEQ SCAN  {url}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'ok        {url}'))
+
+        if failures:
+            for url, sql, plan in failures:
+                self.stderr.write(f'\n{url}\n{sql}\n{plan}')
+            raise CommandError(f'{len(failures)} query plan(s) regressed to a sequential scan')
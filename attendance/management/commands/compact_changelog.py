@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from attendance import changelog
+from attendance.models import ChangeLogEntry
+
+
+class Command(BaseCommand):
+    help = 'Fold change-log entries older than N days into one snapshot entry per object.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=30)
+
+    def handle(self, *args, older_than_days=30, **options):
+        before = timezone.now() - timedelta(days=older_than_days)
+        user_ids = (
+            ChangeLogEntry.objects.filter(created_at__lt=before).order_by().values_list('user_id', flat=True).distinct()
+        )
+
+        users = removed = 0
+        for user_id in user_ids.iterator():
+            with transaction.atomic():
+                removed += changelog.compact(user_id, before)
+            users += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Compacted change log for {users} users, removed {removed} entries'))
@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import time
+from datetime import date
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from attendance.synthetic import ABSENCE_PATTERNS, SUBJECT_CATALOGUE, email_for, generate_block
+
+
+def _init_worker():
+    # Spawned workers (Windows/macOS) start without Django configured; forked
+    # ones must not share the parent's database connections.
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Generate deterministic synthetic users, timetables and attendance histories for benchmarking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--subjects-per-user', type=int, default=6)
+        parser.add_argument('--weeks', type=int, default=16, help='Weeks of history ending at --end')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--pattern', choices=ABSENCE_PATTERNS, default='mixed', help='Absence pattern (mixed picks one per user)')
+        parser.add_argument('--absence-rate', type=float, default=0.15, help='Base probability of missing a lecture')
+        parser.add_argument('--unmarked-rate', type=float, default=0.03, help='Probability a lecture was never marked')
+        parser.add_argument('--end', type=date.fromisoformat, default=None, help='Last day of history (YYYY-MM-DD, default today)')
+        parser.add_argument('--prefix', default='synthetic', help='Users are <prefix>-NNNNNN@example.com')
+        parser.add_argument('--start-index', type=int, default=0, help='First user number, to add users to an earlier run')
+        parser.add_argument('--password', default='test123')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--users-per-block', type=int, default=200, help='Users written per transaction')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create statement')
+
+    def handle(self, *args, **options):
+        users = options['users']
+        if users < 1 or options['weeks'] < 1:
+            raise CommandError('--users and --weeks must be positive')
+        if not 1 <= options['subjects_per_user'] <= len(SUBJECT_CATALOGUE):
+            raise CommandError(f'--subjects-per-user must be between 1 and {len(SUBJECT_CATALOGUE)}')
+
+        first, last = options['start_index'], options['start_index'] + users
+        emails = [email_for(options['prefix'], index) for index in (first, last - 1)]
+        if User.objects.filter(username__in=emails).exists():
+            raise CommandError(f'Users {emails[0]} .. {emails[1]} already exist; use another --prefix or --start-index')
+
+        block_size = max(1, options['users_per_block'])
+        shared = {
+            'seed': options['seed'],
+            'end': options['end'] or date.today(),
+            'weeks': options['weeks'],
+            'subjects_per_user': options['subjects_per_user'],
+            'pattern': options['pattern'],
+            'absence_rate': options['absence_rate'],
+            'unmarked_rate': options['unmarked_rate'],
+            'prefix': options['prefix'],
+            # Hashing is deliberately slow, so every user shares one hash.
+            'password_hash': make_password(options['password']),
+            'batch_size': options['batch_size'],
+        }
+        blocks = [
+            {**shared, 'start': start, 'stop': min(start + block_size, last)}
+            for start in range(first, last, block_size)
+        ]
+
+        totals = {'users': 0, 'subjects': 0, 'lectures': 0, 'records': 0}
+        started = time.perf_counter()
+        workers = max(1, min(options['workers'], len(blocks)))
+        if workers == 1:
+            self._collect(map(generate_block, blocks), len(blocks), totals)
+        else:
+            connections.close_all()
+            with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+                self._collect(pool.imap_unordered(generate_block, blocks), len(blocks), totals)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"Users: {totals['users']}")
+        self.stdout.write(f"Subjects: {totals['subjects']}")
+        self.stdout.write(f"Lectures: {totals['lectures']}")
+        self.stdout.write(f"Records: {totals['records']} ({totals['records'] / elapsed:,.0f} rows/s)")
+        self.stdout.write(f"Log in as {emails[0]} / {options['password']}")
+        self.stdout.write(self.style.SUCCESS(f'Generated in {elapsed:.1f}s'))
+
+    def _collect(self, results, block_count, totals):
+        for done, counts in enumerate(results, 1):
+            for key, value in counts.items():
+                totals[key] += value
+            self.stdout.write(f"  block {done}/{block_count}: {totals['users']} users, {totals['records']} records")
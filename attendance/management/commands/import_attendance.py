@@ -0,0 +1,51 @@
+import csv
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.imports import IMPORT_CHUNK_ROWS, IMPORT_KINDS, import_csv
+
+
+class Command(BaseCommand):
+    help = 'Bulk-import lectures or attendance records from a CSV file (use - for stdin).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import, or - to read stdin')
+        parser.add_argument('--kind', choices=IMPORT_KINDS, default='records')
+        parser.add_argument('--user', help='Import everything for this email instead of using an email column')
+        parser.add_argument('--chunk-rows', type=int, default=IMPORT_CHUNK_ROWS)
+        parser.add_argument('--rejects', help='Write rejected lines and reasons to this CSV file')
+
+    def handle(self, *args, path, kind, user=None, chunk_rows=IMPORT_CHUNK_ROWS, rejects=None, **options):
+        owner = None
+        if user:
+            try:
+                owner = User.objects.get(username=user.strip().lower())
+            except User.DoesNotExist:
+                raise CommandError(f'User {user} not found')
+
+        if path == '-':
+            result = import_csv(sys.stdin, kind, user=owner, chunk_rows=chunk_rows)
+        else:
+            try:
+                with open(path, encoding='utf-8-sig', newline='') as handle:
+                    result = import_csv(handle, kind, user=owner, chunk_rows=chunk_rows)
+            except OSError as exc:
+                raise CommandError(str(exc))
+
+        self.stdout.write(f"Rows read: {result['rows']}")
+        self.stdout.write(f"Created: {result['created']}")
+        self.stdout.write(f"Updated: {result['updated']}")
+        self.stdout.write(f"Subjects created: {result['subjects_created']}")
+        self.stdout.write(f"Rejected: {result['rejected_count']}")
+
+        if rejects and result['rejected']:
+            with open(rejects, 'w', newline='') as handle:
+                writer = csv.DictWriter(handle, fieldnames=['line', 'error'])
+                writer.writeheader()
+                writer.writerows(result['rejected'])
+        for reject in result['rejected'][:10]:
+            self.stdout.write(self.style.WARNING(f"  line {reject['line']}: {reject['error']}"))
+
+        self.stdout.write(self.style.SUCCESS('Import finished'))
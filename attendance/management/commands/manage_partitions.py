@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance import partitions
+
+
+def _month(value):
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f'{value!r} is not a YYYY-MM month') from None
+
+
+class Command(BaseCommand):
+    help = (
+        'Maintain the monthly partitions of the attendance record table (PostgreSQL): create upcoming '
+        'months, sweep rows out of the DEFAULT partition and detach or drop old months.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=3, help='Months to create ahead of the current one')
+        parser.add_argument('--detach-before', help='Detach every month before this one (YYYY-MM)')
+        parser.add_argument('--drop', action='store_true', help='Drop detached months instead of keeping them as tables')
+        parser.add_argument('--list', action='store_true', help='Only list the partitions')
+
+    def handle(self, *args, ahead=3, detach_before=None, drop=False, list=False, **options):
+        if not partitions.is_partitioned():
+            raise CommandError('attendance_attendancerecord is not partitioned (needs PostgreSQL and migration 0006)')
+
+        if not list:
+            for name, moved in partitions.ensure_partitions(months_ahead=ahead):
+                self.stdout.write(f'Created {name}' + (f' ({moved} rows moved from DEFAULT)' if moved else ''))
+
+            if detach_before:
+                names, user_ids = partitions.detach_partitions(_month(detach_before), drop=drop)
+                for name in names:
+                    self.stdout.write(f"{'Dropped' if drop else 'Detached'} {name}")
+                if user_ids:
+                    self.stdout.write(f'Reconciled counters for {len(user_ids)} users')
+
+        for name, start, end, rows in partitions.list_partitions():
+            bounds = f'{start} .. {end}' if start else 'DEFAULT'
+            self.stdout.write(f'  {name:<45} {bounds:<26} ~{rows} rows')
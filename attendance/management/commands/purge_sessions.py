@@ -0,0 +1,33 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired rows from django_session in small batches (a non-blocking clearsessions). '
+        'With --all, empty the table after moving sessions to the cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Delete every stored session, not just expired ones')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+
+    def handle(self, *args, all=False, batch_size=5000, pause=0.0, **options):
+        sessions = Session.objects.all() if all else Session.objects.filter(expire_date__lt=timezone.now())
+        deleted = 0
+        while True:
+            # Short transactions keep row locks and WAL bursts small on a big table.
+            with transaction.atomic():
+                keys = list(sessions.values_list('session_key', flat=True)[:batch_size])
+                if not keys:
+                    break
+                deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            self.stdout.write(f'  deleted {deleted} sessions')
+            if pause:
+                time.sleep(pause)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} sessions'))
@@ -0,0 +1,74 @@
+from collections import Counter
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attendance.purge import PURGE_BATCH_SIZE, PURGE_USERS_PER_GROUP, inactive_users, purge_users
+
+
+def _ids(value):
+    try:
+        return sorted({int(part) for part in value.split(',') if part.strip()})
+    except ValueError:
+        raise CommandError(f'{value!r} is not a comma-separated list of user ids') from None
+
+
+def _date(value):
+    try:
+        return timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'))
+    except ValueError:
+        raise CommandError(f'{value!r} is not a YYYY-MM-DD date') from None
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete user accounts and all their data without prompting, in batches of rows with one short '
+        'transaction each, so thousands of accounts can go without long locks. --inactive-since never '
+        'selects staff or superusers.'
+    )
+
+    def add_arguments(self, parser):
+        selection = parser.add_mutually_exclusive_group(required=True)
+        selection.add_argument('--ids', type=_ids, help='Comma-separated user ids')
+        selection.add_argument(
+            '--inactive-since', type=_date, help='Accounts with no login since this day (YYYY-MM-DD)'
+        )
+        parser.add_argument('--keep-accounts', action='store_true', help='Delete the data but keep the accounts')
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE, help='Rows per transaction')
+        parser.add_argument('--users-per-group', type=int, default=PURGE_USERS_PER_GROUP)
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the matching accounts')
+
+    def handle(
+        self,
+        *args,
+        ids=None,
+        inactive_since=None,
+        keep_accounts=False,
+        batch_size=PURGE_BATCH_SIZE,
+        users_per_group=PURGE_USERS_PER_GROUP,
+        pause=0.0,
+        dry_run=False,
+        **options,
+    ):
+        if batch_size < 1 or users_per_group < 1:
+            raise CommandError('--batch-size and --users-per-group must be at least 1')
+
+        users = User.objects.filter(id__in=ids) if ids is not None else inactive_users(inactive_since)
+        user_ids = list(users.order_by('id').values_list('id', flat=True))
+        if dry_run:
+            self.stdout.write(f'{len(user_ids)} accounts match')
+            return
+
+        deleted = Counter()
+        for start in range(0, len(user_ids), users_per_group):
+            group = user_ids[start : start + users_per_group]
+            deleted.update(purge_users(group, keep_accounts=keep_accounts, batch_size=batch_size, pause=pause))
+            self.stdout.write(f'  purged {start + len(group)}/{len(user_ids)} accounts')
+
+        for label, count in sorted(deleted.items()):
+            self.stdout.write(f'  {label}: {count}')
+        action = 'Emptied' if keep_accounts else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{action} {len(user_ids)} accounts'))
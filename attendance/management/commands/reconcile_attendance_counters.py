@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from attendance import counters
+
+
+class Command(BaseCommand):
+    help = 'Rebuild and verify the per-subject attendance counters against AttendanceRecord.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Limit to a user id (repeatable)')
+        parser.add_argument('--check', action='store_true', help='Only report drift; exit with an error if any is found')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, user_ids=None, check=False, batch_size=1000, **options):
+        with transaction.atomic():
+            missing, stale = counters.reconcile(user_ids=user_ids, fix=not check, batch_size=batch_size)
+
+        self.stdout.write(f'Missing counter rows: {len(missing)}')
+        self.stdout.write(f'Stale counter rows: {len(stale)}')
+
+        if check and (missing or stale):
+            raise CommandError(f'Counters out of sync for subjects: {sorted(missing + stale)[:20]}')
+        if not check:
+            self.stdout.write(self.style.SUCCESS('Attendance counters reconciled'))
@@ -0,0 +1,71 @@
+import multiprocessing
+import signal
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from attendance import jobs
+
+
+def _serve(once, poll, ignore_sigint=False):
+    # Finish the current job on SIGTERM (and Ctrl-C) instead of dying mid-way;
+    # in pool processes Ctrl-C is left to the parent, which forwards SIGTERM.
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+    signal.signal(signal.SIGINT, signal.SIG_IGN if ignore_sigint else lambda *args: stopping.append(True))
+    return jobs.work(once=once, poll=poll, stop=lambda: bool(stopping))
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def _pool_process(once, poll):
+    # Spawned processes (Windows/macOS) start without Django configured;
+    # forked ones must not share the parent's database connections.
+    django.setup()
+    connections.close_all()
+    _serve(once, poll, ignore_sigint=True)
+
+
+class Command(BaseCommand):
+    help = (
+        'Run background jobs from the database queue (exports, imports, counter rebuilds, account '
+        'deletions). Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED, so several processes '
+        'and hosts can share one queue.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Worker processes to run')
+        parser.add_argument('--poll', type=float, default=jobs.JOB_POLL_SECONDS, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, processes=1, poll=jobs.JOB_POLL_SECONDS, once=False, **options):
+        if processes < 1:
+            raise CommandError('--processes must be at least 1')
+        if processes > 1 and connection.vendor == 'sqlite':
+            raise CommandError('SQLite allows a single writer: run one worker process')
+
+        if processes == 1:
+            ran = _serve(once, poll)
+            self.stdout.write(self.style.SUCCESS(f'Worker {jobs.worker_name()} ran {ran} jobs'))
+            return
+
+        connections.close_all()
+        pool = [multiprocessing.Process(target=_pool_process, args=(once, poll)) for _ in range(processes)]
+        for process in pool:
+            process.start()
+        self.stdout.write(f'Started {processes} worker processes')
+        # Service managers stop the parent with SIGTERM: pass it on and wait.
+        signal.signal(signal.SIGTERM, _interrupt)
+        try:
+            for process in pool:
+                process.join()
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping after the current jobs...')
+            for process in pool:
+                process.terminate()
+            for process in pool:
+                process.join()
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
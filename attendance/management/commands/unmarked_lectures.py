@@ -0,0 +1,69 @@
+import json
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from attendance.missing import MISSING_RANGE_MAX_DAYS, MISSING_USERS_PER_CHUNK, missing_by_user
+from attendance.models import Lecture
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'{value!r} is not a YYYY-MM-DD date') from None
+
+
+class Command(BaseCommand):
+    help = (
+        'List every user with scheduled lectures left unmarked in a date range (yesterday by default), '
+        'one line per user, for the nightly "you forgot to mark" reminder. Users are read in chunks '
+        'with one query each, so memory stays bounded on any number of users.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', type=_date, help='First day (YYYY-MM-DD, default yesterday)')
+        parser.add_argument('--to', dest='date_to', type=_date, help='Last day (YYYY-MM-DD, default --from)')
+        parser.add_argument('--chunk-size', type=int, default=MISSING_USERS_PER_CHUNK, help='Users per query')
+        parser.add_argument('--format', choices=['text', 'ndjson'], default='text')
+
+    def handle(self, *args, date_from=None, date_to=None, chunk_size=MISSING_USERS_PER_CHUNK, format='text', **options):
+        date_from = date_from or timezone.localdate() - timedelta(days=1)
+        date_to = date_to or date_from
+        if not timedelta(0) <= date_to - date_from < timedelta(days=MISSING_RANGE_MAX_DAYS):
+            raise CommandError(f'--to must be on or after --from and at most {MISSING_RANGE_MAX_DAYS} days later')
+
+        candidates = (
+            User.objects.filter(Exists(Lecture.objects.filter(user=OuterRef('pk'))), is_active=True)
+            .order_by('id')
+            .values_list('id', 'email')
+            .iterator(chunk_size=chunk_size)
+        )
+        users = lectures = 0
+        while chunk := dict(islice(candidates, chunk_size)):
+            for user_id, rows in missing_by_user(list(chunk), date_from, date_to):
+                self.report(chunk[user_id], user_id, rows, format)
+                users += 1
+                lectures += len(rows)
+
+        self.stderr.write(f'{users} users with {lectures} unmarked lectures between {date_from} and {date_to}')
+
+    def report(self, email, user_id, rows, format):
+        if format == 'text':
+            self.stdout.write(f'{email}: {len(rows)} unmarked')
+            return
+        missing = [
+            {
+                'date': day.isoformat(),
+                'lecture_id': lecture_id,
+                'subject_id': subject_id,
+                'subject_name': name,
+                'time': time.strftime('%H:%M'),
+            }
+            for _, day, lecture_id, subject_id, name, time in rows
+        ]
+        self.stdout.write(json.dumps({'user_id': user_id, 'email': email, 'missing': missing}))
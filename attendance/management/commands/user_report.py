@@ -0,0 +1,121 @@
+import csv
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.counters import STATUSES
+from attendance.reports import REPORT_CHUNK_SIZE, SUBJECT_FIELDS, percentage, user_report
+
+CSV_COLUMNS = (
+    'user_id', 'username', 'email', 'name', 'is_active', 'date_joined', 'last_login', 'last_marked',
+    'subject_id', 'subject', 'code', 'lectures', *STATUSES, 'percentage',
+)
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'{value!r} is not a YYYY-MM-DD date') from None
+
+
+def _when(value, format='%Y-%m-%d %H:%M'):
+    return value.strftime(format) if value else ''
+
+
+class Command(BaseCommand):
+    help = (
+        'Report every user with per-subject lecture and attendance counts, from two ordered queries read '
+        'in chunks (server-side cursors on PostgreSQL), as a table, CSV (one row per subject) or a JSON '
+        'array. --active-since/--active-until keep the users who marked attendance in that window.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['table', 'csv', 'json'], default='table')
+        parser.add_argument('--active-since', type=_date, help='Only users who marked attendance on or after this day')
+        parser.add_argument('--active-until', type=_date, help='Only users who marked attendance on or before this day')
+        parser.add_argument('--chunk-size', type=int, default=REPORT_CHUNK_SIZE, help='Rows fetched per round trip')
+
+    def handle(self, *args, format='table', active_since=None, active_until=None, chunk_size=REPORT_CHUNK_SIZE, **options):
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        report = user_report(active_since, active_until, chunk_size=chunk_size)
+        users = getattr(self, f'write_{format}')(report)
+        self.stderr.write(f'{users} users')
+
+    def write_table(self, report):
+        users = 0
+        for user, subjects in report:
+            totals = {status: sum(subject[status] for subject in subjects) for status in STATUSES}
+            self.stdout.write('-' * 80)
+            self.stdout.write(
+                f"{user['id']:<7} {user['email'] or user['username']:<40} {user['first_name'] or 'N/A':<20}"
+                f"{'' if user['is_active'] else ' (inactive)'}"
+            )
+            self.stdout.write(
+                f"        joined {_when(user['date_joined'])}, last login {_when(user['last_login']) or 'never'}, "
+                f"last marked {_when(user['last_marked'], '%Y-%m-%d') or 'never'}"
+            )
+            self.stdout.write(
+                f"        {len(subjects)} subjects, {sum(subject['lecture_count'] for subject in subjects)} lectures, "
+                f"{totals['present']}P/{totals['absent']}A/{totals['off']}O, "
+                f"{percentage(totals['present'], totals['absent'])}%"
+            )
+            for subject in subjects:
+                self.stdout.write(
+                    f"          - {subject['name']} ({subject['code'] or 'No code'}): "
+                    f"{percentage(subject['present'], subject['absent'])}% "
+                    f"({subject['present']}P/{subject['absent']}A/{subject['off']}O, {subject['lecture_count']} lectures)"
+                )
+            users += 1
+        return users
+
+    def write_csv(self, report):
+        writer = csv.writer(self.stdout, lineterminator='\n')
+        writer.writerow(CSV_COLUMNS)
+        users = 0
+        for user, subjects in report:
+            account = [
+                user['id'], user['username'], user['email'], user['first_name'], user['is_active'],
+                _when(user['date_joined']), _when(user['last_login']), _when(user['last_marked'], '%Y-%m-%d'),
+            ]
+            if not subjects:
+                # Users without subjects still get a row, with the subject columns empty.
+                writer.writerow(account + [''] * (len(CSV_COLUMNS) - len(account)))
+            for subject in subjects:
+                writer.writerow(
+                    account
+                    + [subject['id'], subject['name'], subject['code'], subject['lecture_count']]
+                    + [subject[status] for status in STATUSES]
+                    + [percentage(subject['present'], subject['absent'])]
+                )
+            users += 1
+        return users
+
+    def write_json(self, report):
+        # One element per line, written as the rows arrive: valid JSON without
+        # holding the whole report in memory.
+        self.stdout.write('[', ending='')
+        users = 0
+        for user, subjects in report:
+            totals = {status: sum(subject[status] for subject in subjects) for status in STATUSES}
+            entry = {
+                **{field: user[field] for field in ('id', 'username', 'email', 'first_name', 'is_active')},
+                'date_joined': user['date_joined'].isoformat(),
+                'last_login': user['last_login'].isoformat() if user['last_login'] else None,
+                'last_marked': user['last_marked'].isoformat() if user['last_marked'] else None,
+                **totals,
+                'percentage': percentage(totals['present'], totals['absent']),
+                'subjects': [
+                    {
+                        **{field: subject[field] for field in SUBJECT_FIELDS},
+                        'percentage': percentage(subject['present'], subject['absent']),
+                    }
+                    for subject in subjects
+                ],
+            }
+            self.stdout.write(('\n' if not users else ',\n') + json.dumps(entry), ending='')
+            users += 1
+        self.stdout.write('\n]')
+        return users
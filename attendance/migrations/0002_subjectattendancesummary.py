@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_summaries(apps, schema_editor):
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    SubjectAttendanceSummary = apps.get_model('attendance', 'SubjectAttendanceSummary')
+    rows = (
+        AttendanceRecord.objects.order_by()
+        .values('subject_id', 'user_id')
+        .annotate(
+            present=Count('id', filter=Q(status='present')),
+            absent=Count('id', filter=Q(status='absent')),
+            off=Count('id', filter=Q(status='off')),
+        )
+    )
+    SubjectAttendanceSummary.objects.bulk_create(
+        (SubjectAttendanceSummary(**row) for row in rows.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubjectAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('off', models.PositiveIntegerField(default=0)),
+                ('subject', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summary', to='attendance.subject')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_subjectattendancesummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['user', '-date', '-id'], name='record_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(condition=models.Q(('status__in', ['present', 'absent'])), fields=['user', 'date'], include=('subject', 'status'), name='record_user_date_counted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(condition=models.Q(('status__in', ['present', 'absent'])), fields=['user', 'subject', 'status'], name='record_user_subject_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lecture',
+            index=models.Index(fields=['user', 'day', 'time'], name='lecture_user_day_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersetting',
+            name='data_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,123 @@
+"""Turn attendance_attendancerecord into a table range-partitioned by month.
+
+PostgreSQL only; other databases keep the plain table. The data is copied
+inside the migration's transaction, so run it in a maintenance window on a
+large table. Django's model is unchanged: ``id`` stays the model's primary
+key, but partitioned tables need the partition key in every unique index,
+so the database-level primary key becomes ``(id, date)``. The unique
+constraint on ``(user, subject, date, lecture_time)`` already includes it.
+
+Months from the oldest record to three months ahead get a partition; a
+DEFAULT partition catches anything else until ``manage_partitions`` creates
+the month it belongs to.
+"""
+from datetime import date
+
+from django.db import migrations
+
+TABLE = 'attendance_attendancerecord'
+OLD_TABLE = f'{TABLE}_old'
+SEQUENCE = f'{TABLE}_id_seq'
+COLUMNS = 'id, user_id, subject_id, date, lecture_time, status'
+MONTHS_AHEAD = 3
+
+
+def _add_months(start, months):
+    years, month = divmod(start.month - 1 + months, 12)
+    return date(start.year + years, month + 1, 1)
+
+
+def _is_partitioned(cursor):
+    cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [TABLE])
+    return cursor.fetchone() is not None
+
+
+def _capture(cursor):
+    """Unique/foreign-key constraints and plain indexes of TABLE, as SQL to replay."""
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('u', 'f') ORDER BY conname",
+        [TABLE],
+    )
+    statements = [f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}' for name, definition in cursor.fetchall()]
+    cursor.execute(
+        'SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s '
+        'AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass) ORDER BY indexname',
+        [TABLE, TABLE],
+    )
+    statements += [definition.replace(' ON ONLY ', ' ON ') for (definition,) in cursor.fetchall()]
+    return statements
+
+
+def _rebuild(cursor, partitioned):
+    replay = _capture(cursor)
+    cursor.execute(f"SELECT nextval(pg_get_serial_sequence('{TABLE}', 'id'))")
+    next_id = cursor.fetchone()[0]
+
+    cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}')
+    if not partitioned:
+        # Identity sequences are named after the column, so free the name first.
+        cursor.execute(f'ALTER TABLE {OLD_TABLE} ALTER COLUMN id DROP DEFAULT')
+        cursor.execute(f'DROP SEQUENCE {SEQUENCE}')
+    else:
+        cursor.execute(f'ALTER TABLE {OLD_TABLE} ALTER COLUMN id DROP IDENTITY')
+    cursor.execute(
+        f'CREATE TABLE {TABLE} (LIKE {OLD_TABLE} INCLUDING CONSTRAINTS)'
+        + (' PARTITION BY RANGE (date)' if partitioned else '')
+    )
+
+    if partitioned:
+        # Identity columns on partitioned tables need PostgreSQL 17; a plain
+        # owned sequence works everywhere.
+        cursor.execute(f'CREATE SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id')
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+        cursor.execute(f"SELECT setval('{SEQUENCE}', %s)", [next_id])
+
+        cursor.execute(f'SELECT MIN(date) FROM {OLD_TABLE}')
+        today = date.today().replace(day=1)
+        month = min(cursor.fetchone()[0] or today, today).replace(day=1)
+        while month <= _add_months(today, MONTHS_AHEAD):
+            end = _add_months(month, 1)
+            cursor.execute(
+                f'CREATE TABLE {TABLE}_y{month.year}m{month.month:02d} PARTITION OF {TABLE} '
+                'FOR VALUES FROM (%s) TO (%s)',
+                [month, end],
+            )
+            month = end
+        cursor.execute(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+    else:
+        cursor.execute(f'ALTER TABLE {TABLE} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY (START WITH {next_id})')
+
+    cursor.execute(f'INSERT INTO {TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {OLD_TABLE}')
+    cursor.execute(f'DROP TABLE {OLD_TABLE}')
+
+    cursor.execute(f'ALTER TABLE {TABLE} ADD PRIMARY KEY ({"id, date" if partitioned else "id"})')
+    for statement in replay:
+        cursor.execute(statement)
+
+
+def partition_records(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if not _is_partitioned(cursor):
+            _rebuild(cursor, partitioned=True)
+
+
+def unpartition_records(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if _is_partitioned(cursor):
+            _rebuild(cursor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_changelog'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_records, unpartition_records),
+    ]
@@ -0,0 +1,68 @@
+"""Make PostgreSQL itself cascade deletes of users and subjects.
+
+Django emulates ``on_delete`` in Python and creates its foreign keys
+without a referential action, so ``Subject.delete()`` first loads every
+lecture and record of the subject. This recreates each foreign key of this
+app that points at a user or a subject with the matching ``ON DELETE
+CASCADE`` (or ``SET NULL``), so a plain ``DELETE`` of the parent row is
+enough (see ``attendance.purge``). Constraint names are kept; on the
+partitioned record table the parent's constraint is replaced and the
+partitions follow.
+
+PostgreSQL only. Re-adding a constraint checks the existing rows, so run
+it in a maintenance window on a large table. A later migration that alters
+one of these fields recreates its constraint without the action and has to
+add it back the same way.
+"""
+from django.db import migrations, models
+
+ACTIONS = {models.CASCADE: 'ON DELETE CASCADE', models.SET_NULL: 'ON DELETE SET NULL'}
+
+
+def _foreign_keys(apps):
+    """``(table, column, referenced table, on_delete)`` for the app's keys to users and subjects."""
+    user, subject = apps.get_model('auth', 'User'), apps.get_model('attendance', 'Subject')
+    for model in apps.get_app_config('attendance').get_models():
+        for field in model._meta.local_fields:
+            if not isinstance(field, models.ForeignKey) or field.related_model not in (user, subject):
+                continue
+            if field.remote_field.on_delete in ACTIONS:
+                yield model._meta.db_table, field.column, field.related_model._meta.db_table, field.remote_field.on_delete
+
+
+def _recreate(apps, schema_editor, cascade):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, column, referenced, on_delete in _foreign_keys(apps):
+            cursor.execute(
+                'SELECT c.conname FROM pg_constraint c '
+                'JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1] '
+                "WHERE c.contype = 'f' AND c.conrelid = %s::regclass AND a.attname = %s AND c.conparentid = 0",
+                [table, column],
+            )
+            for (name,) in cursor.fetchall():
+                cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT {name}')
+                cursor.execute(
+                    f'ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {referenced} (id)'
+                    f'{" " + ACTIONS[on_delete] if cascade else ""} DEFERRABLE INITIALLY DEFERRED'
+                )
+
+
+def cascade_foreign_keys(apps, schema_editor):
+    _recreate(apps, schema_editor, cascade=True)
+
+
+def restore_foreign_keys(apps, schema_editor):
+    _recreate(apps, schema_editor, cascade=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(cascade_foreign_keys, restore_foreign_keys),
+    ]
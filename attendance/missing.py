@@ -0,0 +1,85 @@
+"""Scheduled lectures that were never marked.
+
+A lecture occurrence counts as marked when a record (live or archived)
+exists for its subject on that date with the lecture's time, or with no
+time at all. The timetable is assumed to have applied over the whole range.
+
+On PostgreSQL the occurrences and the anti-join are one statement: each
+lecture expands to its dates with ``generate_series`` stepping a week at a
+time, and the unique (user, subject, date, lecture_time) index answers the
+NOT EXISTS probes. Other databases expand the timetable in Python
+(``schedule.expand``) against one query of the marks in range.
+"""
+from django.db import connection
+
+from .models import ArchivedAttendanceRecord, AttendanceRecord, Lecture, Subject
+from .schedule import WEEKDAYS, expand
+
+MISSING_RANGE_MAX_DAYS = 366
+MISSING_USERS_PER_CHUNK = 1000
+
+_MARKED = '''NOT EXISTS (
+        SELECT 1 FROM {table} r
+        WHERE r.user_id = l.user_id AND r.subject_id = l.subject_id AND r.date = d.day::date
+          AND (r.lecture_time = l.time OR r.lecture_time IS NULL)
+    )'''
+
+MISSING_SQL = f'''
+SELECT l.user_id, d.day::date, l.id, l.subject_id, s.name, l.time
+FROM {Lecture._meta.db_table} l
+JOIN {Subject._meta.db_table} s ON s.id = l.subject_id
+CROSS JOIN LATERAL generate_series(
+    %(from)s::date + (array_position(%(days)s::text[], l.day::text) - extract(isodow FROM %(from)s::date)::int + 7) %% 7,
+    %(to)s::date,
+    interval '7 days'
+) AS d(day)
+WHERE l.user_id = ANY(%(users)s)
+  AND {_MARKED.format(table=AttendanceRecord._meta.db_table)}
+  AND {_MARKED.format(table=ArchivedAttendanceRecord._meta.db_table)}
+ORDER BY l.user_id, d.day, l.time, l.id
+'''
+
+
+def missing_lectures(user_ids, date_from, date_to):
+    """Return ``(user_id, date, lecture_id, subject_id, subject_name, time)`` rows for unmarked lectures.
+
+    Ordered by user, date and lecture time.
+    """
+    if not user_ids or date_to < date_from:
+        return []
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                MISSING_SQL,
+                # isodow numbers Monday as 1, like the day's position here.
+                {'from': date_from, 'to': date_to, 'days': list(WEEKDAYS), 'users': list(user_ids)},
+            )
+            return cursor.fetchall()
+
+    marked = set()
+    for model in (AttendanceRecord, ArchivedAttendanceRecord):
+        marked.update(
+            model.objects.filter(user_id__in=user_ids, date__gte=date_from, date__lte=date_to)
+            .values_list('subject_id', 'date', 'lecture_time')
+            .order_by()
+        )
+    lectures = Lecture.objects.filter(user_id__in=user_ids).select_related('subject').order_by('user_id', 'id')
+    rows = [
+        (lecture.user_id, day, lecture.id, lecture.subject_id, lecture.subject.name, lecture.time)
+        for day, lecture in expand(lectures, date_from, date_to)
+        if (lecture.subject_id, day, lecture.time) not in marked and (lecture.subject_id, day, None) not in marked
+    ]
+    return sorted(rows, key=lambda row: (row[0], row[1], row[5], row[2]))
+
+
+def missing_by_user(user_ids, date_from, date_to):
+    """Yield ``(user_id, rows)`` for each of ``user_ids`` with unmarked lectures, from one query."""
+    current, group = None, []
+    for row in missing_lectures(user_ids, date_from, date_to):
+        if row[0] != current and group:
+            yield current, group
+            group = []
+        current = row[0]
+        group.append(row)
+    if group:
+        yield current, group
@@ -35,6 +35,10 @@ class Lecture(models.Model):
     class Meta:
         unique_together = ('user', 'subject', 'day', 'time')
         ordering = ('day', 'time')
+        indexes = [
+            # lectures_view: filter by user (+ day), ordered by day/time.
+            models.Index(fields=['user', 'day', 'time'], name='lecture_user_day_idx'),
+        ]
 
 
 class AttendanceRecord(models.Model):
@@ -53,11 +57,165 @@ class AttendanceRecord(models.Model):
     class Meta:
         unique_together = ('user', 'subject', 'date', 'lecture_time')
         ordering = ('-date',)
+        indexes = [
+            # records_view: user + date/range filters and (date, id) keyset pages.
+            models.Index(fields=['user', '-date', '-id'], name='record_user_date_idx'),
+            # Windowed dashboard: index-only scan over a date range. Not partial,
+            # so subjects with only 'off' marks in the window are still listed.
+            models.Index(fields=['user', 'date'], include=['subject', 'status'], name='record_user_date_cover_idx'),
+            # Per-subject counts (counter seeding and reconciliation).
+            models.Index(
+                fields=['user', 'subject', 'status'],
+                condition=models.Q(status__in=['present', 'absent']),
+                name='record_user_subject_status_idx',
+            ),
+        ]
+
+
+class ArchivedAttendanceRecord(models.Model):
+    """An AttendanceRecord moved out of the live table by ``archive_attendance``.
+
+    Keeps the original id and columns so exports can still list the full
+    history; only the export and the windowed dashboard's partial months
+    ever read it.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_records')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='archived_records')
+    date = models.DateField()
+    lecture_time = models.TimeField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=AttendanceRecord.STATUS_CHOICES)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='archive_user_date_idx'),
+        ]
+
+
+class AttendanceRollup(models.Model):
+    """Present/absent/off totals of one subject's archived records in one month."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendance_rollups')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='rollups')
+    month = models.DateField()
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    off = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('subject', 'month')
+        indexes = [
+            # Windowed dashboard: the user's rollups for a range of months.
+            models.Index(fields=['user', 'month'], name='rollup_user_month_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject.name} {self.month:%Y-%m}: {self.present}P/{self.absent}A/{self.off}O'
 
 
 class UserSetting(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='attendance_setting')
     target_percentage = models.PositiveSmallIntegerField(default=80)
+    # Bumped with every write to the user's data; exposed as the API's ETag
+    # and used as the sequence number of the user's change log.
+    data_version = models.PositiveBigIntegerField(default=0)
+    # Change-log entries at or below this sequence may have been compacted away.
+    sync_floor = models.PositiveBigIntegerField(default=0)
 
     def __str__(self):
         return f'{self.user.username}: {self.target_percentage}%'
+
+
+class SubjectAttendanceSummary(models.Model):
+    """Running present/absent/off counters for one subject.
+
+    Maintained alongside every AttendanceRecord write so the dashboard can
+    read one row per subject instead of scanning the user's full history.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendance_summaries')
+    subject = models.OneToOneField(Subject, on_delete=models.CASCADE, related_name='attendance_summary')
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    off = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.subject.name}: {self.present}P/{self.absent}A/{self.off}O'
+
+
+class ChangeLogEntry(models.Model):
+    """Append-only log of writes, replayed by clients through ``/api/sync/``."""
+
+    MODELS = [
+        ('subject', 'Subject'),
+        ('lecture', 'Lecture'),
+        ('record', 'Attendance record'),
+        ('setting', 'Setting'),
+        ('all', 'All data'),
+    ]
+    ACTIONS = [
+        ('upsert', 'Upsert'),
+        ('delete', 'Delete'),
+        ('resync', 'Resync'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='changes')
+    seq = models.PositiveBigIntegerField()
+    model = models.CharField(max_length=10, choices=MODELS)
+    object_id = models.BigIntegerField(null=True, blank=True)
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    data = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('seq', 'id')
+        indexes = [
+            models.Index(fields=['user', 'seq'], name='changelog_user_seq_idx'),
+        ]
+
+
+class Job(models.Model):
+    """A unit of background work, claimed by ``run_worker`` with FOR UPDATE SKIP LOCKED."""
+
+    KINDS = [
+        ('export', 'Export'),
+        ('import', 'Import'),
+        ('reconcile', 'Counter rebuild'),
+        ('delete_account', 'Account deletion'),
+    ]
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+    STATUSES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    # Kept when the account is deleted, so the deletion job itself survives.
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    params = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    # gzip-compressed upload (imports) and download (exports).
+    input = models.BinaryField(null=True, blank=True)
+    output = models.BinaryField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Renewed by the running worker; an expired lease means the worker is gone.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # run_worker: oldest queued job first.
+            models.Index(fields=['id'], condition=models.Q(status='queued'), name='job_queued_idx'),
+            models.Index(fields=['user', '-id'], name='job_user_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk}: {self.status}'
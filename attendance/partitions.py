@@ -0,0 +1,130 @@
+"""Monthly range partitions of the attendance record table (PostgreSQL).
+
+Migration 0006 partitions ``attendance_attendancerecord`` by month on
+``date``, with a DEFAULT partition for dates outside the created months.
+Date-range queries then only touch the months they cover, and vacuum and
+index maintenance run per month.
+
+``ensure_partitions`` creates the coming months ahead of time and moves any
+rows that landed in the DEFAULT partition into a proper month.
+``detach_partitions`` takes whole old months out of the table (optionally
+dropping them) and re-derives the counters of the users they belonged to.
+"""
+import re
+from datetime import date
+
+from django.db import connection, transaction
+
+from . import changelog, counters
+from .models import AttendanceRecord
+
+TABLE = AttendanceRecord._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+BOUND_RE = re.compile(r"FROM \('([\d-]+)'\) TO \('([\d-]+)'\)")
+
+
+def add_months(start, months):
+    years, month = divmod(start.month - 1 + months, 12)
+    return date(start.year + years, month + 1, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_y{month.year}m{month.month:02d}'
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [TABLE])
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """Return ``[(name, start, end, rows), ...]`` ordered by start; the DEFAULT partition has no bounds.
+
+    ``rows`` is the planner's estimate, which is enough for reporting.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint FROM pg_inherits i '
+            'JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass',
+            [TABLE],
+        )
+        rows = cursor.fetchall()
+    partitions = []
+    for name, bound, estimate in rows:
+        match = BOUND_RE.search(bound)
+        start, end = (date.fromisoformat(match[1]), date.fromisoformat(match[2])) if match else (None, None)
+        partitions.append((name, start, end, max(estimate, 0)))
+    return sorted(partitions, key=lambda partition: (partition[1] is None, partition[1] or date.min))
+
+
+def create_partition(cursor, month):
+    """Create the partition for ``month``, moving its rows out of DEFAULT; returns the rows moved."""
+    name, end = partition_name(month), add_months(month, 1)
+    # Attaching a standalone table (rather than CREATE ... PARTITION OF)
+    # lets rows already in DEFAULT for this month be moved across first.
+    cursor.execute(f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s RETURNING *) '
+        f'INSERT INTO {name} SELECT * FROM moved',
+        [month, end],
+    )
+    moved = cursor.rowcount
+    cursor.execute(f'ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)', [month, end])
+    return moved
+
+
+def ensure_partitions(months_ahead=3, today=None):
+    """Create missing partitions up to ``months_ahead`` and for any month found in DEFAULT.
+
+    Returns ``[(name, rows_moved), ...]`` for the partitions created.
+    """
+    this_month = (today or date.today()).replace(day=1)
+    existing = {start for _, start, _, _ in list_partitions() if start}
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT DISTINCT date_trunc('month', date)::date FROM {DEFAULT_PARTITION}")
+        wanted = {month for (month,) in cursor.fetchall()}
+    wanted |= {add_months(this_month, offset) for offset in range(months_ahead + 1)}
+
+    created = []
+    for month in sorted(wanted - existing):
+        with transaction.atomic(), connection.cursor() as cursor:
+            # A month detached earlier still owns its table name; rows marked
+            # for it since then stay in DEFAULT until archive_attendance
+            # moves them out.
+            cursor.execute('SELECT to_regclass(%s)', [partition_name(month)])
+            if cursor.fetchone()[0] is not None:
+                continue
+            created.append((partition_name(month), create_partition(cursor, month)))
+    return created
+
+
+def detach_partitions(before, drop=False):
+    """Detach (or drop) every monthly partition that ends on or before ``before``.
+
+    Detached tables keep their rows under the same name but lose their
+    foreign keys, so deleting a user is not blocked by archived rows.
+    Returns ``(names, user_ids)``.
+    """
+    old = [name for name, start, end, _ in list_partitions() if end and end <= before]
+    user_ids = set()
+    for name in old:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'SELECT DISTINCT user_id FROM {name}')
+            users = {user_id for (user_id,) in cursor.fetchall()}
+            cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+            if drop:
+                cursor.execute(f'DROP TABLE {name}')
+            else:
+                cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [name])
+                for (constraint,) in cursor.fetchall():
+                    cursor.execute(f'ALTER TABLE {name} DROP CONSTRAINT {constraint}')
+            # The rows are gone from the live table: bring the dashboard
+            # counters in line and have clients reload.
+            if users:
+                counters.reconcile(user_ids=users)
+                changelog.log_resync(users)
+        user_ids |= users
+    return old, user_ids
@@ -0,0 +1,99 @@
+"""Deletion of users and subjects without Django's deletion collector.
+
+``Model.delete()`` collects every related row into memory before deleting,
+and one large DELETE holds its row locks and writes all of its WAL in a
+single transaction. ``purge_users`` instead clears each of the users'
+tables ``batch_size`` rows at a time, one short transaction per batch and
+children before parents, and removes the (by then empty) accounts last.
+
+On PostgreSQL the foreign keys cascade in the database (migration 0009),
+so ``delete_subject`` is a single DELETE of the subject row; elsewhere it
+falls back to ``Subject.delete()``.
+"""
+import time
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from . import changelog
+from .models import (
+    ArchivedAttendanceRecord,
+    AttendanceRecord,
+    AttendanceRollup,
+    ChangeLogEntry,
+    Lecture,
+    Subject,
+    SubjectAttendanceSummary,
+    UserSetting,
+)
+
+PURGE_BATCH_SIZE = 5000
+PURGE_USERS_PER_GROUP = 200
+
+# Children before parents, so every batch deletes from one table only.
+PURGED_MODELS = (
+    AttendanceRecord,
+    ArchivedAttendanceRecord,
+    ChangeLogEntry,
+    AttendanceRollup,
+    SubjectAttendanceSummary,
+    Lecture,
+    Subject,
+)
+
+
+def delete_in_batches(queryset, batch_size=PURGE_BATCH_SIZE, pause=0.0):
+    """Delete the rows of ``queryset`` ``batch_size`` at a time, one transaction each; returns the count."""
+    model = queryset.model
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += model.objects.filter(pk__in=ids).delete()[0]
+        if pause:
+            time.sleep(pause)
+
+
+def inactive_users(since):
+    """Ordinary accounts that have not logged in since ``since`` (or never did, and joined before it)."""
+    return User.objects.filter(is_staff=False, is_superuser=False).filter(
+        Q(last_login__lt=since) | Q(last_login__isnull=True, date_joined__lt=since)
+    )
+
+
+def purge_users(user_ids, keep_accounts=False, batch_size=PURGE_BATCH_SIZE, pause=0.0):
+    """Delete all data of ``user_ids`` in batches, then the accounts themselves.
+
+    With ``keep_accounts`` the accounts and their settings stay, and their
+    clients are told to reload. Returns ``{model label: rows deleted}``.
+    Call outside a transaction, with a few hundred users at a time.
+    """
+    user_ids = list(user_ids)
+    deleted = Counter()
+    for model in PURGED_MODELS:
+        deleted[model._meta.label] += delete_in_batches(
+            model.objects.filter(user_id__in=user_ids), batch_size=batch_size, pause=pause
+        )
+
+    with transaction.atomic():
+        if keep_accounts:
+            # The change log is gone: send clients that were behind it to a full reload.
+            UserSetting.objects.filter(user_id__in=user_ids).update(sync_floor=F('data_version'))
+            changelog.log_resync(UserSetting.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+        else:
+            # Only settings, jobs and Django's own rows are left for the collector.
+            deleted.update(User.objects.filter(id__in=user_ids).delete()[1])
+    return {label: count for label, count in deleted.items() if count}
+
+
+def delete_subject(subject):
+    """Delete ``subject`` with its lectures, records, counters and rollups; call inside a transaction."""
+    if connection.vendor != 'postgresql':
+        subject.delete()
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {Subject._meta.db_table} WHERE id = %s', [subject.pk])
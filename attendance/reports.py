@@ -0,0 +1,82 @@
+"""Per-user and per-subject statistics for the ``user_report`` command.
+
+The whole report is two queries, both ordered by user and read in chunks
+(through a server-side cursor on PostgreSQL): one row per user, and one row
+per subject with its counters from SubjectAttendanceSummary and its lecture
+count. ``user_report`` walks the two streams side by side, so memory stays
+bounded on any number of users and nothing is counted from the record table.
+"""
+from itertools import groupby
+
+from django.contrib.auth.models import User
+from django.db.models import Count, Exists, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .counters import STATUSES
+from .models import ArchivedAttendanceRecord, AttendanceRecord, Lecture, Subject
+
+REPORT_CHUNK_SIZE = 2000
+USER_FIELDS = ('id', 'username', 'email', 'first_name', 'is_active', 'date_joined', 'last_login')
+SUBJECT_FIELDS = ('id', 'name', 'code', 'lecture_count', *STATUSES)
+
+
+def _latest(model):
+    return Subquery(model.objects.filter(user=OuterRef('pk')).order_by('-date').values('date')[:1])
+
+
+def report_users(active_since=None, active_until=None):
+    """Users annotated with ``last_marked``; with a window, only those who marked attendance in it."""
+    # Archiving only moves records older than every live one, so the live
+    # table answers first and the archive only for fully archived users.
+    users = User.objects.annotate(last_marked=Coalesce(_latest(AttendanceRecord), _latest(ArchivedAttendanceRecord)))
+    if active_since or active_until:
+        window = Q()
+        if active_since:
+            window &= Q(date__gte=active_since)
+        if active_until:
+            window &= Q(date__lte=active_until)
+        users = users.filter(
+            Exists(AttendanceRecord.objects.filter(window, user=OuterRef('pk')))
+            | Exists(ArchivedAttendanceRecord.objects.filter(window, user=OuterRef('pk')))
+        )
+    return users
+
+
+def report_subjects(users):
+    """Subjects of ``users`` with their counters and lecture counts."""
+    lectures = (
+        Lecture.objects.filter(subject=OuterRef('pk')).order_by().values('subject').annotate(n=Count('id')).values('n')
+    )
+    return Subject.objects.filter(user__in=users.values('pk')).annotate(
+        lecture_count=Coalesce(Subquery(lectures, output_field=IntegerField()), Value(0)),
+        **{status: Coalesce(f'attendance_summary__{status}', Value(0)) for status in STATUSES},
+    )
+
+
+def user_report(active_since=None, active_until=None, chunk_size=REPORT_CHUNK_SIZE):
+    """Yield ``(user, subjects)`` dicts for every matching user, ordered by id; subjects by name."""
+    users = report_users(active_since, active_until)
+    user_rows = users.order_by('id').values(*USER_FIELDS, 'last_marked').iterator(chunk_size=chunk_size)
+    subject_rows = (
+        report_subjects(users)
+        .order_by('user_id', 'name', 'id')
+        .values('user_id', *SUBJECT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    subjects_by_user = groupby(subject_rows, key=lambda row: row['user_id'])
+    pending = next(subjects_by_user, None)
+    for user in user_rows:
+        # Both streams are ordered by user id: advance the subjects to this user.
+        while pending and pending[0] < user['id']:
+            pending = next(subjects_by_user, None)
+        subjects = []
+        if pending and pending[0] == user['id']:
+            subjects = list(pending[1])
+            pending = next(subjects_by_user, None)
+        yield user, subjects
+
+
+def percentage(present, absent):
+    """Present share of the held lectures, to one decimal; 0 when none were held."""
+    held = present + absent
+    return round(present / held * 100, 1) if held else 0
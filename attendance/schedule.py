@@ -0,0 +1,101 @@
+"""Expansion of the weekly lecture timetable into concrete dates.
+
+Each Lecture is a weekly rule (weekday + time). Occurrences in a date range
+are counted arithmetically per weekday rather than by walking the days, so
+a term of any length costs one division per lecture plus one step per
+holiday. ``project`` turns the remaining occurrences into the "how many can
+I still miss" numbers behind ``/api/projection/``.
+"""
+from collections import Counter
+from datetime import date, timedelta
+from functools import lru_cache
+
+from .models import Lecture
+
+WEEKDAYS = {day: index for index, (day, _) in enumerate(Lecture.DAYS)}
+HOLIDAY_RANGE_SEPARATOR = '..'
+
+
+def _first_weekday(start, weekday):
+    return start + timedelta(days=(weekday - start.weekday()) % 7)
+
+
+@lru_cache(maxsize=4096)
+def weekday_count(start, end, weekday):
+    """Number of dates falling on ``weekday`` (Monday is 0) in ``start..end`` inclusive."""
+    first = _first_weekday(start, weekday)
+    return (end - first).days // 7 + 1 if first <= end else 0
+
+
+def weekday_dates(start, end, weekday):
+    """Every date falling on ``weekday`` in ``start..end``, a week apart."""
+    first = _first_weekday(start, weekday)
+    return [first + timedelta(weeks=week) for week in range(weekday_count(start, end, weekday))]
+
+
+def expand(lectures, start, end, holidays=frozenset()):
+    """Return the ``(date, lecture)`` occurrences of ``lectures`` in ``start..end``, skipping holidays.
+
+    ``lectures`` are Lecture instances (or anything with ``day`` and ``time``);
+    the result is ordered by date and lecture time.
+    """
+    occurrences = [
+        (day, lecture)
+        for lecture in lectures
+        for day in weekday_dates(start, end, WEEKDAYS[lecture.day])
+        if day not in holidays
+    ]
+    return sorted(occurrences, key=lambda occurrence: (occurrence[0], occurrence[1].time))
+
+
+def count_occurrences(lectures, start, end, holidays=frozenset()):
+    """Return ``{subject_id: occurrences}`` for ``(subject_id, day)`` lecture rules in ``start..end``."""
+    if end < start:
+        return Counter()
+    holiday_weekdays = Counter(day.weekday() for day in holidays if start <= day <= end)
+    counts = Counter()
+    for subject_id, day in lectures:
+        weekday = WEEKDAYS[day]
+        counts[subject_id] += weekday_count(start, end, weekday) - holiday_weekdays[weekday]
+    return counts
+
+
+def parse_holidays(value, start, end):
+    """Parse comma-separated ``YYYY-MM-DD`` days and ``YYYY-MM-DD..YYYY-MM-DD`` ranges.
+
+    Only the days inside ``start..end`` are kept, so long ranges stay cheap.
+    Raises ValueError on bad input.
+    """
+    holidays = set()
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        first, _, last = item.partition(HOLIDAY_RANGE_SEPARATOR)
+        first = date.fromisoformat(first)
+        last = date.fromisoformat(last) if last else first
+        day, last = max(first, start), min(last, end)
+        while day <= last:
+            holidays.add(day)
+            day += timedelta(days=1)
+    return frozenset(holidays)
+
+
+def project(present, absent, remaining, target_percentage):
+    """Return ``(skippable, required_to_recover)`` for one subject (or the overall totals).
+
+    ``skippable`` is how many of the ``remaining`` lectures can be missed with
+    the final percentage still at or above the target. ``required_to_recover``
+    is how many lectures in a row must be attended to get back to the target
+    (0 when already there, None when no number of lectures can).
+    """
+    held = present + absent
+    final_total = held + remaining
+    skippable = (100 * (present + remaining) - target_percentage * final_total) // 100 if final_total else 0
+    skippable = min(max(skippable, 0), remaining)
+
+    deficit = target_percentage * held - 100 * present
+    if deficit <= 0:
+        required = 0
+    elif target_percentage >= 100:
+        required = None
+    else:
+        required = -(-deficit // (100 - target_percentage))
+    return skippable, required
@@ -0,0 +1,84 @@
+"""Fast serialisation path for the list endpoints.
+
+Rows are fetched as tuples with ``values_list`` instead of model instances,
+dates and times are formatted once per distinct value, and the payload is
+encoded with orjson when it is installed (stdlib ``json`` otherwise).
+The output matches ``subject_to_dict``/``lecture_to_dict``/``record_to_dict``.
+"""
+import json
+
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+
+def dumps(data):
+    """Encode ``data`` to JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+class FastJsonResponse(HttpResponse):
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+class _Formatter(dict):
+    """Memoising formatter: each distinct date/time is formatted only once."""
+
+    def __init__(self, fmt):
+        super().__init__()
+        self.fmt = fmt
+
+    def __missing__(self, value):
+        text = self[value] = self.fmt(value) if value is not None else None
+        return text
+
+
+def _minutes(value):
+    return value.isoformat(timespec='minutes')
+
+
+def subject_rows(subjects):
+    return subjects.values('id', 'name', 'code')
+
+
+def serialize_subjects(subjects):
+    return list(subject_rows(subjects))
+
+
+def lecture_rows(lectures):
+    """Raw ``(id, subject_id, day, time)`` tuples for ``lectures``."""
+    return lectures.values_list('id', 'subject_id', 'day', 'time')
+
+
+def serialize_lecture_rows(rows):
+    times = _Formatter(_minutes)
+    return [{'id': pk, 'subject_id': subject_id, 'day': day, 'time': times[time]} for pk, subject_id, day, time in rows]
+
+
+def serialize_lectures(lectures):
+    return serialize_lecture_rows(lecture_rows(lectures))
+
+
+def record_rows(records):
+    """Raw ``(id, subject_id, date, lecture_time, status)`` tuples for ``records``."""
+    return records.values_list('id', 'subject_id', 'date', 'lecture_time', 'status')
+
+
+def serialize_record_rows(rows):
+    dates = _Formatter(lambda value: value.isoformat())
+    times = _Formatter(_minutes)
+    return [
+        {'id': pk, 'subject_id': subject_id, 'date': dates[date], 'lecture_time': times[lecture_time], 'status': status}
+        for pk, subject_id, date, lecture_time, status in rows
+    ]
+
+
+def serialize_records(records):
+    return serialize_record_rows(record_rows(records))
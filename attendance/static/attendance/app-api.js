@@ -8,6 +8,8 @@ async function apiCall(endpoint, method = 'GET', body = null) {
     const options = {
         method,
         credentials: 'include',
+        // Revalidate with If-None-Match; unchanged data comes back as a cheap 304
+        cache: 'no-cache',
         headers: { 'Content-Type': 'application/json' }
     };
     if (body) options.body = JSON.stringify(body);
@@ -87,11 +89,17 @@ const LecturesAPI = {
 };
 
 // Attendance Records API
+const RECORDS_PAGE_SIZE = 500;
+
 const RecordsAPI = {
-    async getAll(date = null) {
-        const query = date ? `?date=${date}` : '';
-        const data = await apiCall(`/records/${query}`);
-        return data.records;
+    // One keyset page, newest first; filters: date, from, to, subject_id, status, cursor, limit.
+    // Only what the UI shows is fetched: pass next_cursor back as cursor for the page before it.
+    async getPage(filters = {}) {
+        const params = new URLSearchParams({ limit: RECORDS_PAGE_SIZE });
+        Object.entries(filters).forEach(([key, value]) => {
+            if (value !== null && value !== undefined && value !== '') params.set(key, value);
+        });
+        return await apiCall(`/records/?${params}`);
     },
     
     async mark(subjectId, date, status, lectureTime = null) {
@@ -101,6 +109,16 @@ const RecordsAPI = {
         return data.record;
     },
     
+    // Download link for the full history as csv or ndjson (streamed by the server)
+    exportUrl(format = 'csv') {
+        return `${API_BASE}/records/export/?format=${format}`;
+    },
+    
+    // Mark several lectures at once: [{subject_id, date, status, lecture_time?}]
+    async markMany(records) {
+        return await apiCall('/records/bulk/', 'POST', { records });
+    },
+    
     async delete(id) {
         return await apiCall(`/records/${id}/`, 'DELETE');
     }
@@ -121,17 +139,55 @@ const SettingsAPI = {
 
 // Dashboard API
 const DashboardAPI = {
-    async getSummary() {
-        return await apiCall('/dashboard/summary/');
+    // Optional from/to (YYYY-MM-DD) restrict the summary to a term or week;
+    // without them the per-subject counts cover the whole history
+    async getSummary(from = null, to = null) {
+        const params = new URLSearchParams();
+        if (from) params.set('from', from);
+        if (to) params.set('to', to);
+        const query = params.toString() ? `?${params}` : '';
+        return await apiCall(`/dashboard/summary/${query}`);
+    }
+};
+
+// Startup API: user, settings, subjects, lectures and records in one call
+const BootstrapAPI = {
+    async get(from = null) {
+        const query = from ? `?from=${from}` : '';
+        return await apiCall(`/bootstrap/${query}`);
+    }
+};
+
+// Calendar API: one month of per-subject date->status maps and counters
+const CalendarAPI = {
+    async getMonth(month) {
+        const data = await apiCall(`/calendar/?month=${month}`);
+        return data.subjects;
+    }
+};
+
+// Delta sync API: changes after a sequence number from the server's change log
+const SyncAPI = {
+    async since(seq) {
+        return await apiCall(`/sync/?since=${seq}`);
     }
 };
 
 // Data Transformation Helpers
 const DataTransform = {
     // Convert API subjects to frontend format
-    subjectsToFrontend(apiSubjects, apiRecords) {
+    // totals: an unwindowed dashboard summary, whose counts cover records not loaded
+    subjectsToFrontend(apiSubjects, apiRecords, totals = null) {
+        // Group once instead of filtering the full record list per subject
+        const recordsBySubject = new Map();
+        apiRecords.forEach(r => {
+            if (!recordsBySubject.has(r.subject_id)) recordsBySubject.set(r.subject_id, []);
+            recordsBySubject.get(r.subject_id).push(r);
+        });
+        const totalsBySubject = new Map((totals ? totals.subjects : []).map(t => [t.subject_id, t]));
+        
         return apiSubjects.map(sub => {
-            const records = apiRecords.filter(r => r.subject_id === sub.id);
+            const records = recordsBySubject.get(sub.id) || [];
             const dates = {};
             let att = 0, miss = 0;
             
@@ -151,17 +207,33 @@ const DataTransform = {
                 }
             });
             
+            const total = totalsBySubject.get(sub.id);
             return {
                 id: sub.id,
                 name: sub.name,
                 code: sub.code || '',
-                att,
-                miss,
+                att: total ? total.present : att,
+                miss: total ? total.absent : miss,
                 dates
             };
         });
     },
     
+    // Convert a /calendar/ month into {dateString: 'att'|'miss'|'off'} per subject id
+    calendarToFrontend(calendarSubjects) {
+        const statusMap = { present: 'att', absent: 'miss', off: 'off' };
+        const bySubject = {};
+        calendarSubjects.forEach(sub => {
+            const dates = {};
+            Object.entries(sub.dates).forEach(([apiDate, status]) => {
+                const [year, month, day] = apiDate.split('-').map(Number);
+                dates[new Date(year, month - 1, day).toDateString()] = statusMap[status];
+            });
+            bySubject[sub.subject_id] = { att: sub.present, miss: sub.absent, dates };
+        });
+        return bySubject;
+    },
+    
     // Convert API lectures to frontend timetable format
     lecturesToTimetable(apiLectures, apiSubjects) {
         const days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'];
@@ -195,6 +267,13 @@ const DataTransform = {
         return `${year}-${month}-${day}`;
     },
     
+    // The local date `days` days before today in API format
+    daysAgoToAPI(days) {
+        const d = new Date();
+        d.setDate(d.getDate() - days);
+        return this.dateToAPI(d);
+    },
+    
     // Convert 12-hour time to 24-hour format for API
     timeTo24Hour(time12) {
         if (!time12 || time12 === 'Time not set') return null;
@@ -227,5 +306,8 @@ window.AttendanceAPI = {
     Records: RecordsAPI,
     Settings: SettingsAPI,
     Dashboard: DashboardAPI,
+    Bootstrap: BootstrapAPI,
+    Sync: SyncAPI,
+    Calendar: CalendarAPI,
     Transform: DataTransform
 };
@@ -1,36 +1,55 @@
 // Storage Adapter - Bridges localStorage code to API
 // This allows your existing code to work with minimal changes
 
+// Records older than this are not loaded at startup; loadOlder() pages through them
+const RECORDS_WINDOW_DAYS = 120;
+
 class APIStorage {
     constructor() {
         this.cache = {
             subjects: [],
             lectures: [],
             records: [],
+            totals: null,
             target: 80,
             user: null
         };
         this.initialized = false;
+        this.seq = null;
+        // Paging state for records before the startup window
+        this.olderTo = null;
+        this.olderCursor = null;
+        this.hasOlder = false;
     }
     
     async init(force = false) {
         if (this.initialized && !force) return;
         
         try {
-            // Load all data from API
-            const [subjects, lectures, records, target, user] = await Promise.all([
-                AttendanceAPI.Subjects.getAll(),
-                AttendanceAPI.Lectures.getAll(),
-                AttendanceAPI.Records.getAll(),
-                AttendanceAPI.Settings.get(),
-                AttendanceAPI.Auth.getMe()
+            // Refresh incrementally when possible; fall back to a full load
+            if (this.initialized && this.seq !== null && await this.sync()) {
+                this.cache.totals = await AttendanceAPI.Dashboard.getSummary();
+                return;
+            }
+            
+            // The recent records and everything else in one round trip; the
+            // attendance counts of the whole history come from the summary
+            const from = AttendanceAPI.Transform.daysAgoToAPI(RECORDS_WINDOW_DAYS);
+            const [data, totals] = await Promise.all([
+                AttendanceAPI.Bootstrap.get(from),
+                AttendanceAPI.Dashboard.getSummary()
             ]);
             
-            this.cache.subjects = subjects;
-            this.cache.lectures = lectures;
-            this.cache.records = records;
-            this.cache.target = target;
-            this.cache.user = user.user;
+            this.cache.subjects = data.subjects;
+            this.cache.lectures = data.lectures;
+            this.cache.records = data.records;
+            this.cache.totals = totals;
+            this.cache.target = data.target_percentage;
+            this.cache.user = data.user;
+            this.seq = data.seq;
+            this.olderTo = AttendanceAPI.Transform.daysAgoToAPI(RECORDS_WINDOW_DAYS + 1);
+            this.olderCursor = null;
+            this.hasOlder = true;
             this.initialized = true;
         } catch (err) {
             console.error('Failed to initialize API storage:', err);
@@ -38,11 +57,54 @@ class APIStorage {
         }
     }
     
+    // Apply change-log entries since the last seen sequence; false means reload everything
+    async sync() {
+        const collections = { subject: 'subjects', lecture: 'lectures', record: 'records' };
+        let page;
+        do {
+            page = await AttendanceAPI.Sync.since(this.seq);
+            if (page.reset) return false;
+            
+            for (const change of page.changes) {
+                if (change.action === 'resync') return false;
+                if (change.model === 'setting') {
+                    this.cache.target = change.data.target_percentage;
+                    continue;
+                }
+                const key = collections[change.model];
+                const items = this.cache[key].filter(item => item.id !== change.id);
+                if (change.action === 'upsert') {
+                    items.push(change.data);
+                } else if (change.model === 'subject') {
+                    // Deleting a subject cascades to its lectures and records
+                    this.cache.lectures = this.cache.lectures.filter(l => l.subject_id !== change.id);
+                    this.cache.records = this.cache.records.filter(r => r.subject_id !== change.id);
+                }
+                this.cache[key] = items;
+            }
+            this.seq = page.seq;
+        } while (page.has_more);
+        return true;
+    }
+    
+    // Load the next page of records before the startup window; false once there are no more
+    async loadOlder() {
+        if (!this.hasOlder) return false;
+        const page = await AttendanceAPI.Records.getPage({ to: this.olderTo, cursor: this.olderCursor });
+        // Sync may already have brought in an older record that was edited
+        const known = new Set(this.cache.records.map(r => r.id));
+        this.cache.records.push(...page.records.filter(r => !known.has(r.id)));
+        this.olderCursor = page.next_cursor;
+        this.hasOlder = page.next_cursor !== null;
+        return page.records.length > 0;
+    }
+    
     // Get subjects in frontend format
     getSubjects() {
         return AttendanceAPI.Transform.subjectsToFrontend(
             this.cache.subjects,
-            this.cache.records
+            this.cache.records,
+            this.cache.totals
         );
     }
     
@@ -0,0 +1,174 @@
+"""Deterministic synthetic users, timetables and attendance histories.
+
+Every user is generated from its own ``Random(f'{seed}:{index}')`` so the
+same arguments always produce the same data regardless of how users are
+split across worker processes. Each block of users is written in one
+transaction: users, settings, subjects and lectures with ``bulk_create``,
+attendance records with ``COPY`` on PostgreSQL, and the dashboard counters
+from the totals computed while generating.
+"""
+import random
+from datetime import time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from .imports import copy_rows
+from .models import AttendanceRecord, Lecture, Subject, SubjectAttendanceSummary, UserSetting
+
+SUBJECT_CATALOGUE = [
+    ('Mathematics', 'MATH'),
+    ('Physics', 'PHY'),
+    ('Chemistry', 'CHEM'),
+    ('Computer Science', 'CS'),
+    ('Biology', 'BIO'),
+    ('English', 'ENG'),
+    ('Economics', 'ECO'),
+    ('History', 'HIS'),
+    ('Statistics', 'STAT'),
+    ('Electronics', 'ELEC'),
+    ('Mechanics', 'MECH'),
+    ('Data Structures', 'DSA'),
+    ('Operating Systems', 'OS'),
+    ('Databases', 'DBMS'),
+    ('Networks', 'CN'),
+    ('Philosophy', 'PHIL'),
+]
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday']
+SLOTS = [time(hour, 0) for hour in range(8, 18)]
+
+# How a user's absence probability evolves over the term.
+ABSENCE_PATTERNS = ('steady', 'declining', 'skipper', 'diligent', 'mixed')
+OFF_RATE = 0.02
+HOLIDAY_WEEK_EVERY = 12
+
+RECORD_COLUMNS = ('user_id', 'subject_id', 'date', 'lecture_time', 'status')
+
+
+def email_for(prefix, index):
+    return f'{prefix}-{index:06d}@example.com'
+
+
+def absence_rate(pattern, base, week, weeks, skipped):
+    if pattern == 'declining':
+        return min(0.9, base * (0.5 + 2 * week / max(weeks, 1)))
+    if pattern == 'skipper' and skipped:
+        return min(0.9, base * 4)
+    if pattern == 'diligent':
+        return base * 0.25
+    return base
+
+
+def timetable(rng, subjects_per_user):
+    """Return ``[(name, code, [(day, time), ...]), ...]`` without clashing slots."""
+    free = [(day, slot) for day in WEEKDAYS[:5] for slot in SLOTS]
+    if rng.random() < 0.3:
+        free += [('saturday', slot) for slot in SLOTS[:4]]
+    rng.shuffle(free)
+    subjects = []
+    for number, (name, code) in enumerate(rng.sample(SUBJECT_CATALOGUE, subjects_per_user)):
+        lectures = sorted(free.pop() for _ in range(rng.randint(1, 3)))
+        subjects.append((name, f'{code}{101 + number}', lectures))
+    return subjects
+
+
+def history(rng, lectures, start, end, pattern, base, unmarked_rate, skipped):
+    """Yield ``(date, lecture_time, status)`` for every marked lecture between ``start`` and ``end``."""
+    weeks = (end - start).days // 7 + 1
+    holidays = {week for week in range(weeks) if rng.random() < 1 / HOLIDAY_WEEK_EVERY}
+    for week in range(weeks):
+        monday = start + timedelta(weeks=week)
+        rate = absence_rate(pattern, base, week, weeks, skipped)
+        for day, slot in lectures:
+            lecture_date = monday + timedelta(days=WEEKDAYS.index(day))
+            if lecture_date > end:
+                continue
+            if rng.random() < unmarked_rate:
+                continue
+            if week in holidays or rng.random() < OFF_RATE:
+                status = 'off'
+            elif rng.random() < rate:
+                status = 'absent'
+            else:
+                status = 'present'
+            yield lecture_date, slot, status
+
+
+def generate_block(options):
+    """Generate and write the users ``options['start']`` .. ``options['stop'] - 1``; returns row counts."""
+    seed = options['seed']
+    end = options['end']
+    start = end - timedelta(weeks=options['weeks'] - 1, days=end.weekday())
+    indexes = range(options['start'], options['stop'])
+    plans = {}
+    for index in indexes:
+        rng = random.Random(f'{seed}:{index}')
+        pattern = options['pattern']
+        if pattern == 'mixed':
+            pattern = rng.choice(ABSENCE_PATTERNS[:-1])
+        plans[index] = (rng, pattern, timetable(rng, options['subjects_per_user']))
+
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            [
+                User(
+                    username=email_for(options['prefix'], index),
+                    email=email_for(options['prefix'], index),
+                    first_name=f'Synthetic {index}',
+                    password=options['password_hash'],
+                )
+                for index in indexes
+            ],
+            batch_size=options['batch_size'],
+        )
+        user_ids = {index: user.id for index, user in zip(indexes, users)}
+        UserSetting.objects.bulk_create(
+            [UserSetting(user_id=user_ids[index], target_percentage=plans[index][0].choice([75, 75, 80, 85])) for index in indexes],
+            batch_size=options['batch_size'],
+        )
+
+        subjects = Subject.objects.bulk_create(
+            [
+                Subject(user_id=user_ids[index], name=name, code=code)
+                for index in indexes
+                for name, code, _ in plans[index][2]
+            ],
+            batch_size=options['batch_size'],
+        )
+        subject_ids = {(subject.user_id, subject.name): subject.id for subject in subjects}
+
+        lectures = []
+        records = []
+        summaries = []
+        for index in indexes:
+            rng, pattern, plan = plans[index]
+            user_id = user_ids[index]
+            skipped = rng.randrange(len(plan))
+            for number, (name, _, slots) in enumerate(plan):
+                subject_id = subject_ids[(user_id, name)]
+                lectures.extend(Lecture(user_id=user_id, subject_id=subject_id, day=day, time=slot) for day, slot in slots)
+                totals = {'present': 0, 'absent': 0, 'off': 0}
+                for lecture_date, slot, status in history(
+                    rng, slots, start, end, pattern, options['absence_rate'], options['unmarked_rate'], number == skipped
+                ):
+                    totals[status] += 1
+                    records.append((user_id, subject_id, lecture_date, slot, status))
+                summaries.append(SubjectAttendanceSummary(user_id=user_id, subject_id=subject_id, **totals))
+
+        Lecture.objects.bulk_create(lectures, batch_size=options['batch_size'])
+        SubjectAttendanceSummary.objects.bulk_create(summaries, batch_size=options['batch_size'])
+        write_records(records, options['batch_size'])
+
+    return {'users': len(user_ids), 'subjects': len(subject_ids), 'lectures': len(lectures), 'records': len(records)}
+
+
+def write_records(rows, batch_size):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            copy_rows(cursor, AttendanceRecord._meta.db_table, RECORD_COLUMNS, rows)
+        return
+    AttendanceRecord.objects.bulk_create(
+        [AttendanceRecord(**dict(zip(RECORD_COLUMNS, row))) for row in rows],
+        batch_size=batch_size,
+    )
+
@@ -0,0 +1,756 @@
+import csv
+import io
+import json
+import threading
+import time as time_module
+from datetime import date, time, timedelta
+from unittest import mock, skipUnless
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, models
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+from . import changelog, counters, exports, jobs
+from .archive import archive_before
+from .counters import STATUSES
+from .exports import EXPORT_COLUMNS
+from .imports import import_csv
+from .instrumentation import QUERY_BUDGETS
+from .management.commands.check_query_budgets import replay_reads, replay_writes
+from .management.commands.check_query_plans import SEQ_SCAN, query_plans
+from .models import (
+    ArchivedAttendanceRecord,
+    AttendanceRecord,
+    AttendanceRollup,
+    ChangeLogEntry,
+    Job,
+    Lecture,
+    Subject,
+    UserSetting,
+)
+from .purge import purge_users
+from .usercache import user_key
+from .views import dashboard_rows, dashboard_summary
+
+DASHBOARD_TABLES = (AttendanceRecord._meta.db_table, 'attendance_subjectattendancesummary')
+
+
+class DashboardSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('student@example.com', 'student@example.com', 'secret-password')
+        cls.maths = Subject.objects.create(user=cls.user, name='Maths')
+        cls.physics = Subject.objects.create(user=cls.user, name='Physics')
+        cls.chemistry = Subject.objects.create(user=cls.user, name='Chemistry')
+        AttendanceRecord.objects.bulk_create(
+            [
+                AttendanceRecord(user=cls.user, subject=cls.maths, date=date(2024, 3, 4), status='present'),
+                AttendanceRecord(user=cls.user, subject=cls.maths, date=date(2024, 3, 5), status='present'),
+                AttendanceRecord(user=cls.user, subject=cls.maths, date=date(2024, 3, 6), status='absent'),
+                AttendanceRecord(user=cls.user, subject=cls.physics, date=date(2024, 3, 4), status='absent'),
+                AttendanceRecord(user=cls.user, subject=cls.physics, date=date(2024, 4, 1), status='present'),
+                AttendanceRecord(user=cls.user, subject=cls.chemistry, date=date(2024, 3, 7), status='off'),
+            ]
+        )
+        # An archived February, only reachable through the rollups.
+        AttendanceRollup.objects.create(
+            user=cls.user, subject=cls.maths, month=date(2024, 2, 1), present=3, absent=1, off=0
+        )
+        counters.reconcile(user_ids=[cls.user.id])
+
+    def summary(self, date_from=None, date_to=None):
+        with self.assertNumQueries(1):
+            return dashboard_summary(dashboard_rows(self.user, date_from, date_to))
+
+    def test_unwindowed_summary_is_one_query(self):
+        summary = self.summary()
+        self.assertEqual(summary['overall'], {'total': 9, 'attended': 6, 'missed': 3, 'percentage': 67})
+        self.assertEqual(
+            [(subject['subject_name'], subject['present'], subject['absent']) for subject in summary['subjects']],
+            [('Chemistry', 0, 0), ('Maths', 5, 2), ('Physics', 1, 1)],
+        )
+
+    def test_windowed_summary_is_one_query(self):
+        summary = self.summary(date(2024, 2, 1), date(2024, 3, 31))
+        self.assertEqual(summary['overall'], {'total': 8, 'attended': 5, 'missed': 3, 'percentage': 62})
+        self.assertEqual(
+            [(subject['subject_name'], subject['present'], subject['absent']) for subject in summary['subjects']],
+            [('Chemistry', 0, 0), ('Maths', 5, 2), ('Physics', 0, 1)],
+        )
+
+    def test_window_without_marks_is_empty(self):
+        summary = self.summary(date(2024, 5, 1), date(2024, 5, 31))
+        self.assertEqual(summary, {'overall': {'total': 0, 'attended': 0, 'missed': 0, 'percentage': 0}, 'subjects': []})
+
+    def test_endpoint_aggregates_in_one_query(self):
+        self.client.force_login(self.user)
+        for url in ('/api/dashboard/summary/', '/api/dashboard/summary/?from=2024-03-01&to=2024-03-31'):
+            with self.subTest(url=url), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                # Everything else is the session, user and data version lookups.
+                aggregations = [query for query in queries if any(table in query['sql'] for table in DASHBOARD_TABLES)]
+                self.assertEqual(len(aggregations), 1, [query['sql'] for query in aggregations])
+
+    def test_invalid_window_is_rejected(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/api/dashboard/summary/?from=2024-13-01')
+        self.assertEqual(response.status_code, 400)
+
+
+def seed_histories():
+    """Two users with a weekly timetable and twenty weeks of marks; returns the first."""
+    users = [
+        User.objects.create_user(email, email, 'secret-password')
+        for email in ('seeded@example.com', 'other@example.com')
+    ]
+    records = []
+    for user in users:
+        UserSetting.objects.create(user=user)
+        for index, name in enumerate(('Maths', 'Physics', 'Chemistry')):
+            subject = Subject.objects.create(user=user, name=name)
+            Lecture.objects.create(user=user, subject=subject, day='monday', time=time(9 + index))
+            records += [
+                AttendanceRecord(
+                    user=user,
+                    subject=subject,
+                    date=date(2024, 1, 1) + timedelta(weeks=week),
+                    lecture_time=time(9 + index),
+                    status=STATUSES[(week + index) % 3],
+                )
+                for week in range(20)
+            ]
+    AttendanceRecord.objects.bulk_create(records)
+    counters.reconcile()
+    return users[0]
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_histories()
+        archive_before(date(2024, 2, 1))  # January is only in the cold table
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def export(self, query):
+        # A chunk size below the history's length makes the cursor page.
+        with mock.patch.object(exports, 'EXPORT_CHUNK_SIZE', 7):
+            response = self.client.get(f'/api/records/export/?{query}')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            return [chunk.decode() for chunk in response.streaming_content]
+
+    def expected_ids(self, **filters):
+        records = AttendanceRecord.objects.filter(user=self.user, **filters)
+        archived = ArchivedAttendanceRecord.objects.filter(user=self.user, **filters)
+        return sorted(
+            list(records.values_list('date', 'id')) + list(archived.values_list('date', 'id'))
+        )
+
+    def test_csv_streams_the_whole_history_in_date_order(self):
+        chunks = self.export('format=csv')
+        # The header goes out on its own, before any row is fetched.
+        self.assertEqual(chunks[0], ','.join(EXPORT_COLUMNS) + '\r\n')
+        rows = list(csv.DictReader(io.StringIO(''.join(chunks))))
+        self.assertEqual(len(rows), 60)
+        self.assertEqual(
+            [(row['date'], int(row['id'])) for row in rows],
+            [(day.isoformat(), record_id) for day, record_id in self.expected_ids()],
+        )
+        self.assertEqual(rows[0]['subject_name'], 'Maths')
+        self.assertEqual(rows[0]['lecture_time'], '09:00')
+
+    def test_ndjson_applies_the_record_filters(self):
+        chunks = self.export('format=ndjson&from=2024-01-15&to=2024-02-05&status=present')
+        rows = [json.loads(line) for line in ''.join(chunks).splitlines()]
+        self.assertEqual(
+            [(row['date'], row['id']) for row in rows],
+            [
+                (day.isoformat(), record_id)
+                for day, record_id in self.expected_ids(date__range=(date(2024, 1, 15), date(2024, 2, 5)), status='present')
+            ],
+        )
+        self.assertTrue(rows)
+        self.assertEqual({tuple(row) for row in rows}, {EXPORT_COLUMNS})
+
+    def test_invalid_format_and_filters_are_rejected(self):
+        for query in ('format=xml', 'format=csv&status=late', 'format=csv&from=yesterday'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/records/export/?{query}').status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+    URLS = ('/api/subjects/', '/api/lectures/', '/api/records/', '/api/bootstrap/', '/api/dashboard/summary/')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_histories()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_unchanged_data_answers_304_without_running_the_view(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                etag = response['ETag']
+                self.assertEqual(etag, f'W/"{self.user.id}-0"')
+                self.assertIn('no-cache', response['Cache-Control'])
+                self.assertIn('private', response['Cache-Control'])
+                # Weak comparison: the strong form and a list both match.
+                for header in (etag, etag.removeprefix('W/'), f'"other", {etag}', '*'):
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.client.get(url, HTTP_IF_NONE_MATCH=header)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response['ETag'], etag)
+                    self.assertEqual(response.content, b'')
+                    self.assertFalse([query for query in queries if 'attendance_subject' in query['sql']])
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='W/"0-0"').status_code, 200)
+
+    def test_a_write_bumps_the_version(self):
+        etag = self.client.get('/api/subjects/')['ETag']
+        self.client.post('/api/subjects/', {'name': 'Biology'}, content_type='application/json')
+        response = self.client.get('/api/subjects/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'W/"{self.user.id}-1"')
+        self.assertIn('Biology', [subject['name'] for subject in response.json()['subjects']])
+        # Another user's data, and so their version, is untouched.
+        other = User.objects.get(username='other@example.com')
+        self.assertEqual(UserSetting.objects.get(user=other).data_version, 0)
+
+    def test_errors_carry_no_etag(self):
+        response = self.client.get('/api/records/?status=late')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class ArchiveTests(TestCase):
+    WINDOWS = [(None, None), (date(2024, 1, 15), date(2024, 3, 31)), (date(2024, 2, 1), date(2024, 2, 29))]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_histories()
+        cls.maths = cls.user.subjects.get(name='Maths')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def summaries(self):
+        return [dashboard_summary(dashboard_rows(self.user, *window)) for window in self.WINDOWS]
+
+    def test_archive_moves_old_records_and_keeps_every_total(self):
+        before = self.summaries()
+        # Nine Mondays in January and February, three subjects, two users.
+        self.assertEqual(archive_before(date(2024, 3, 1), users_per_batch=1), (2, 54))
+
+        self.assertFalse(AttendanceRecord.objects.filter(date__lt=date(2024, 3, 1)).exists())
+        self.assertEqual(ArchivedAttendanceRecord.objects.filter(user=self.user).count(), 27)
+        self.assertEqual(AttendanceRollup.objects.filter(user=self.user).count(), 6)
+        self.assertEqual(self.summaries(), before)
+        self.assertEqual(counters.reconcile(fix=False), ([], []))
+        # Clients reload instead of replaying the deletions.
+        self.assertTrue(ChangeLogEntry.objects.filter(user=self.user, model='all', action='resync').exists())
+        self.assertEqual(archive_before(date(2024, 3, 1)), (0, 0))
+
+    def test_archived_lectures_are_read_only(self):
+        archive_before(date(2024, 3, 1))
+        mark = {'subject_id': self.maths.id, 'date': '2024-01-08', 'lecture_time': '09:00', 'status': 'off'}
+        response = self.client.post('/api/records/', mark, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        response = self.client.post('/api/records/bulk/', [mark], content_type='application/json')
+        self.assertEqual(response.json()['results'][0]['result'], 'error')
+        csv = 'subject,date,status,lecture_time\nMaths,2024-01-08,off,09:00\n'
+        result = self.client.post('/api/import/?kind=records', csv, content_type='text/csv').json()
+        self.assertEqual(result['rejected'], [{'line': 2, 'error': 'lecture is archived and can no longer be changed'}])
+        self.assertFalse(AttendanceRecord.objects.filter(date__lt=date(2024, 3, 1)).exists())
+
+    def test_late_marks_in_an_archived_month_are_folded_in_next_run(self):
+        archive_before(date(2024, 3, 1))
+        mark = {'subject_id': self.maths.id, 'date': '2024-02-06', 'status': 'present'}
+        self.assertEqual(self.client.post('/api/records/', mark, content_type='application/json').status_code, 201)
+        before = self.summaries()
+
+        self.assertEqual(archive_before(date(2024, 3, 1)), (1, 1))
+        rollup = AttendanceRollup.objects.get(subject=self.maths, month=date(2024, 2, 1))
+        self.assertEqual(rollup.present + rollup.absent + rollup.off, 5)
+        self.assertEqual(self.summaries(), before)
+        self.assertEqual(counters.reconcile(fix=False), ([], []))
+
+
+class PurgeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_histories()
+        cls.other = User.objects.get(username='other@example.com')
+        archive_before(date(2024, 2, 1))
+        jobs.enqueue('reconcile', user=cls.user)
+
+    def counts(self, user):
+        return {
+            model._meta.label: model.objects.filter(user=user).count()
+            for model in (AttendanceRecord, ArchivedAttendanceRecord, AttendanceRollup, Lecture, Subject)
+        }
+
+    def test_purge_deletes_in_batches_and_spares_other_users(self):
+        others = self.counts(self.other)
+        with CaptureQueriesContext(connection) as queries:
+            deleted = purge_users([self.user.id], batch_size=7)
+        # 45 live records, 7 per DELETE (the collector's cascades find none left).
+        table = AttendanceRecord._meta.db_table
+        batches = [query for query in queries if query['sql'].startswith(f'DELETE FROM "{table}" WHERE "{table}"."id" IN')]
+        self.assertEqual(len(batches), 7)
+        self.assertEqual(deleted['attendance.AttendanceRecord'], 45)
+        self.assertEqual(deleted['attendance.ArchivedAttendanceRecord'], 15)
+        self.assertEqual(deleted['auth.User'], 1)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(self.counts(self.other), others)
+        # The queue keeps the job, without its owner.
+        self.assertEqual(list(Job.objects.values_list('user_id', flat=True)), [None])
+
+    def test_keep_accounts_only_clears_the_data(self):
+        purge_users([self.user.id], keep_accounts=True, batch_size=7)
+        self.assertEqual(set(self.counts(self.user).values()), {0})
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+        # Clients reload rather than replay a change log that is gone.
+        self.assertEqual(
+            list(ChangeLogEntry.objects.filter(user=self.user).values_list('model', 'action')), [('all', 'resync')]
+        )
+
+    def test_deleting_a_subject_removes_everything_under_it(self):
+        maths = self.user.subjects.get(name='Maths')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.delete(f'/api/subjects/{maths.id}/').status_code, 200)
+        for model in (AttendanceRecord, ArchivedAttendanceRecord, AttendanceRollup, Lecture):
+            with self.subTest(model=model.__name__):
+                self.assertFalse(model.objects.filter(subject_id=maths.id).exists())
+                self.assertTrue(model.objects.filter(user=self.user).exists())
+        self.assertEqual(counters.reconcile(fix=False), ([], []))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Migration 0009 only changes PostgreSQL')
+class DatabaseCascadeTests(TestCase):
+    ACTIONS = {models.CASCADE: 'c', models.SET_NULL: 'n'}
+
+    def test_foreign_keys_to_users_and_subjects_carry_their_on_delete(self):
+        expected = {
+            (model._meta.db_table, field.column): self.ACTIONS[field.remote_field.on_delete]
+            for model in AttendanceRecord._meta.app_config.get_models()
+            for field in model._meta.local_fields
+            if isinstance(field, models.ForeignKey) and field.related_model in (User, Subject)
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT c.conrelid::regclass::text, a.attname, c.confdeltype FROM pg_constraint c '
+                'JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1] '
+                "WHERE c.contype = 'f' AND c.conparentid = 0 AND c.confrelid IN (%s::regclass, %s::regclass)",
+                [User._meta.db_table, Subject._meta.db_table],
+            )
+            actual = {(table, column): action for table, column, action in cursor.fetchall() if table.startswith('attendance_')}
+        self.assertEqual(actual, expected)
+
+    def test_deleting_the_user_row_cascades_in_the_database(self):
+        user = seed_histories()
+        archive_before(date(2024, 2, 1))
+        job = jobs.enqueue('reconcile', user=user)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {User._meta.db_table} WHERE id = %s', [user.id])
+        for model in (AttendanceRecord, ArchivedAttendanceRecord, AttendanceRollup, Lecture, Subject, UserSetting):
+            with self.subTest(model=model.__name__):
+                self.assertFalse(model.objects.filter(user_id=user.id).exists())
+        job.refresh_from_db()
+        self.assertIsNone(job.user_id)
+        self.assertTrue(AttendanceRecord.objects.exists())
+
+
+class CounterTests(TestCase):
+    def test_first_write_seeds_the_counter_row_from_history(self):
+        user = User.objects.create_user('counted@example.com', 'counted@example.com', 'secret-password')
+        subject = Subject.objects.create(user=user, name='Maths')
+        # Records written before the subject had a counter row, then one tracked write.
+        AttendanceRecord.objects.bulk_create(
+            [
+                AttendanceRecord(user=user, subject=subject, date=date(2024, 3, 4), status='present'),
+                AttendanceRecord(user=user, subject=subject, date=date(2024, 3, 5), status='off'),
+                AttendanceRecord(user=user, subject=subject, date=date(2024, 3, 6), status='absent'),
+            ]
+        )
+        AttendanceRollup.objects.create(user=user, subject=subject, month=date(2024, 2, 1), present=2, absent=1, off=0)
+        record = AttendanceRecord.objects.create(user=user, subject=subject, date=date(2024, 3, 7), status='absent')
+        counters.record_status_changed(user.id, subject.id, None, 'absent')
+        AttendanceRecord.objects.filter(id=record.id).update(status='present')
+        counters.record_status_changed(user.id, subject.id, 'absent', 'present')
+
+        summary = subject.attendance_summary
+        self.assertEqual((summary.present, summary.absent, summary.off), (4, 2, 1))
+        self.assertEqual(counters.reconcile(user_ids=[user.id], fix=False), ([], []))
+
+
+class AccountDeletionJobTests(TestCase):
+    def test_body_must_be_an_object(self):
+        user = User.objects.create_user('leaving@example.com', 'leaving@example.com', 'secret-password')
+        self.client.force_login(user)
+        for body in ('["secret-password"]', '"secret-password"', '42'):
+            with self.subTest(body=body):
+                response = self.client.post('/api/jobs/delete-account/', body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+        user.refresh_from_db()
+        self.assertTrue(user.is_active)
+        self.assertFalse(Job.objects.filter(user=user).exists())
+
+
+class RecordPayloadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('marker@example.com', 'marker@example.com', 'secret-password')
+        cls.subject = Subject.objects.create(user=cls.user, name='Maths')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_subject_id_must_be_an_integer(self):
+        for subject_id in (True, 'abc', 1.5, [1], {'id': 1}):
+            mark = {'subject_id': subject_id, 'date': '2024-01-08', 'status': 'present'}
+            with self.subTest(subject_id=subject_id):
+                response = self.client.post('/api/records/', mark, content_type='application/json')
+                self.assertEqual((response.status_code, response.json()), (400, {'error': 'subject_id must be an integer'}))
+                response = self.client.post('/api/records/bulk/', [mark], content_type='application/json')
+                self.assertEqual(response.json()['results'][0]['error'], 'subject_id must be an integer')
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_numeric_string_subject_id_is_accepted(self):
+        mark = {'subject_id': str(self.subject.id), 'date': '2024-01-08', 'status': 'present'}
+        response = self.client.post('/api/records/', mark, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+
+class ProjectionTests(TestCase):
+    def test_date_range_is_validated(self):
+        user = User.objects.create_user('planner@example.com', 'planner@example.com', 'secret-password')
+        self.client.force_login(user)
+        for query in ('from=2024-03-01&to=2024-02-01', 'to=2000-01-01', 'from=2024-03-01', 'from=2024-02-30&to=2024-03-01'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/projection/?{query}').status_code, 400)
+        response = self.client.get('/api/projection/?from=2024-03-01&to=2024-03-01')
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(ATTENDANCE_USER_CACHE=True)
+class UserCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cached@example.com', 'cached@example.com', 'secret-password', first_name='Cached')
+        self.client.post(
+            '/api/auth/login/', {'email': 'cached@example.com', 'password': 'secret-password'}, content_type='application/json'
+        )
+        self.addCleanup(cache.clear)
+
+    def test_entry_holds_no_password_hash(self):
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, 200)
+        entry = cache.get(user_key(self.user.id))
+        self.assertEqual(entry['fields']['email'], 'cached@example.com')
+        self.assertNotIn('password', entry['fields'])
+        self.assertNotIn(self.user.password, repr(entry))
+
+    def test_cached_user_serves_requests_and_checks_the_session(self):
+        self.client.get('/api/auth/me/')
+        response = self.client.get('/api/auth/me/')
+        self.assertEqual(response.json()['user'], {'name': 'Cached', 'email': 'cached@example.com'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('new-password')
+            self.user.save()
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, 401)
+
+    def test_password_is_loaded_when_needed(self):
+        self.client.get('/api/auth/me/')
+        for password, status in (('wrong', 400), ('secret-password', 202)):
+            with self.subTest(password=password):
+                response = self.client.post('/api/jobs/delete-account/', {'password': password}, content_type='application/json')
+                self.assertEqual(response.status_code, status)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertTrue(self.user.check_password('secret-password'))
+
+
+class ImportTests(TestCase):
+    def test_merge_updates_existing_records_and_reports_lines(self):
+        user = User.objects.create_user('importer@example.com', 'importer@example.com', 'secret-password')
+        self.client.force_login(user)
+        subject = Subject.objects.create(user=user, name='Maths')
+        self.client.post(
+            '/api/records/', {'subject_id': subject.id, 'date': '2024-01-08', 'lecture_time': '09:00', 'status': 'present'},
+            content_type='application/json',
+        )
+        csv = (
+            'subject,date,status,lecture_time\n'
+            'Maths,2024-01-08,absent,09:00\n'
+            '"Maths\nand more",2024-01-09,late,\n'  # lines 3-4
+            'Maths,2024-01-10,present,\n'
+            'Maths,2024-01-10,absent,\n'
+        )
+        response = self.client.post('/api/import/?kind=records', csv, content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual((result['rows'], result['created'], result['updated']), (4, 1, 1))
+        self.assertEqual(result['rejected'], [{'line': 4, 'error': 'status must be present, absent or off'}])
+        self.assertEqual(sorted(AttendanceRecord.objects.values_list('date', 'status')), [
+            (date(2024, 1, 8), 'absent'), (date(2024, 1, 10), 'absent'),
+        ])
+        self.assertEqual(counters.reconcile(user_ids=[user.id], fix=False), ([], []))
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('queued@example.com', 'queued@example.com', 'secret-password')
+
+    def test_claim_takes_each_queued_job_once_oldest_first(self):
+        first = jobs.enqueue('reconcile', user=self.user)
+        second = jobs.enqueue('reconcile', user=self.user)
+        claimed = [jobs.claim('worker-a'), jobs.claim('worker-b'), jobs.claim('worker-a')]
+        self.assertEqual([job and job.pk for job in claimed], [first.pk, second.pk, None])
+        self.assertEqual((claimed[0].status, claimed[0].attempts, claimed[0].worker), (Job.RUNNING, 1, 'worker-a'))
+        self.assertIsNotNone(claimed[0].heartbeat_at)
+
+    def test_only_an_expired_lease_is_requeued(self):
+        jobs.enqueue('reconcile', user=self.user)
+        job = jobs.claim('worker-a')
+        # A long run whose worker still renews its lease is left alone.
+        Job.objects.filter(pk=job.pk).update(started_at=job.started_at - timedelta(hours=2))
+        self.assertEqual(jobs.housekeeping(job.heartbeat_at + jobs.JOB_LEASE / 2), (0, 0, 0))
+        self.assertEqual(jobs.housekeeping(job.heartbeat_at + jobs.JOB_LEASE * 2), (1, 0, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (Job.QUEUED, ''))
+
+        # The first run finishing late no longer owns the row.
+        self.assertEqual(jobs.claim('worker-b').attempts, 2)
+        jobs.run(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (Job.RUNNING, 'worker-b'))
+
+    def test_a_job_out_of_attempts_is_failed(self):
+        jobs.enqueue('reconcile', user=self.user)
+        job = jobs.claim('worker-a')
+        Job.objects.filter(pk=job.pk).update(attempts=jobs.JOB_MAX_ATTEMPTS)
+        self.assertEqual(jobs.housekeeping(job.heartbeat_at + jobs.JOB_LEASE * 2), (0, 1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (Job.FAILED, 'Worker lost'))
+
+    def test_jobs_of_a_deleted_owner_fail_without_running(self):
+        other = User.objects.create_user('other@example.com', 'other@example.com', 'secret-password')
+        Subject.objects.create(user=other, name='Maths')
+        csv = b'email,subject,date,status\nother@example.com,Maths,2024-01-08,present\n'
+        queued = [jobs.enqueue('import', user=self.user, params={'kind': 'records'}, data=csv), jobs.enqueue('reconcile', user=self.user)]
+        self.user.delete()
+        for _ in queued:
+            job = jobs.claim('worker-a')
+            self.assertIsNone(job.user_id)
+            self.assertEqual(jobs.run(job), Job.FAILED)
+        self.assertEqual(set(Job.objects.values_list('error', flat=True)), {'The account no longer exists'})
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_account_deletion_runs_after_the_owner_is_gone(self):
+        Subject.objects.create(user=self.user, name='Maths')
+        jobs.enqueue('delete_account', user=self.user, params={'user_id': self.user.id})
+        self.assertEqual(jobs.run(jobs.claim('worker-a')), Job.DONE)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        # Retried after its worker died: the owner is already gone.
+        Job.objects.update(status=Job.QUEUED)
+        self.assertEqual(jobs.run(jobs.claim('worker-a')), Job.DONE)
+
+
+class SyncTests(TestCase):
+    def test_user_without_setting_row_starts_at_zero(self):
+        user = User.objects.create_user('fresh@example.com', 'fresh@example.com', 'secret-password')
+        self.client.force_login(user)
+        response = self.client.get('/api/sync/?since=0')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'reset': False, 'seq': 0, 'changes': [], 'has_more': False})
+        # A read never creates the row.
+        self.assertFalse(UserSetting.objects.filter(user=user).exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN checks need PostgreSQL')
+class QueryPlanTests(TestCase):
+    """The ``check_query_plans`` requests against a small seeded history, with seq scans priced out."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_histories()
+
+    def test_read_paths_use_indexes(self):
+        latest = self.user.records.order_by('-date').values_list('date', flat=True).first()
+        plans = list(query_plans(self.user, latest))
+        self.assertTrue(plans)
+        for url, sql, plan in plans:
+            with self.subTest(url=url):
+                self.assertNotIn(SEQ_SCAN, plan, f'{sql}\n{plan}')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query budgets are counted on PostgreSQL')
+class QueryBudgetTests(TransactionTestCase):
+    """Every route in QUERY_BUDGETS, reads and writes, replayed through the full middleware stack.
+
+    Not a TestCase: its surrounding transaction would turn each view's
+    transaction into counted savepoints.
+    """
+
+    # replay_writes in order: (method, URL name, queries). A change here
+    # should move the route's QUERY_BUDGETS entry with it.
+    WRITE_QUERIES = [
+        ('POST', 'register', 8),
+        ('POST', 'logout', 4),
+        ('POST', 'login', 5),
+        ('POST', 'subjects', 10),
+        ('PUT', 'subject-detail', 7),
+        ('POST', 'lectures', 10),
+        ('DELETE', 'lecture-detail', 6),
+        ('POST', 'records', 16),
+        ('POST', 'records-bulk', 11),
+        ('DELETE', 'record-detail', 9),
+        ('POST', 'import', 16),
+        ('PUT', 'settings', 7),
+        ('POST', 'job-create', 3),
+        ('GET', 'job-detail', 3),
+        ('GET', 'job-result', 3),
+        ('DELETE', 'subject-detail', 8),
+        ('POST', 'job-create', 6),
+    ]
+
+    def test_every_budgeted_route_stays_within_budget(self):
+        results = replay_reads(seed_histories()) + replay_writes()
+        checked = {(resolve(urlsplit(url).path).url_name, method) for method, url, _, _ in results}
+        budgeted = {(url_name, method) for url_name, methods in QUERY_BUDGETS.items() for method in methods}
+        self.assertEqual(checked, budgeted)
+        for method, url, queries, error in results:
+            with self.subTest(method=method, url=url):
+                self.assertIsNone(error)
+
+    # Database sessions and no user cache, whatever the environment configures.
+    @override_settings(ATTENDANCE_USER_CACHE=False, SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_write_routes_issue_the_measured_queries(self):
+        counts = [(method, resolve(urlsplit(url).path).url_name, queries) for method, url, queries, _ in replay_writes()]
+        self.assertEqual(counts, self.WRITE_QUERIES)
+
+
+def in_thread(target, errors):
+    """Run ``target`` in a thread with its own connection, collecting its exceptions in ``errors``."""
+
+    def run():
+        try:
+            target()
+        except Exception as exc:  # surfaced by the caller's assertions
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Row locks need PostgreSQL')
+class ArchiveConcurrencyTests(TransactionTestCase):
+    """An edit racing ``archive_attendance`` for the same lecture, in both orders."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('racer@example.com', 'racer@example.com', 'secret-password')
+        self.subject = Subject.objects.create(user=self.user, name='Maths')
+        self.client.force_login(self.user)
+        self.mark('present')
+
+    def mark(self, status):
+        return self.client.post(
+            '/api/records/', {'subject_id': self.subject.id, 'date': '2024-01-08', 'status': status},
+            content_type='application/json',
+        )
+
+    def test_archive_waits_for_an_edit_in_progress(self):
+        editing, errors = threading.Event(), []
+        record_status_changed = counters.record_status_changed
+
+        def slow_edit(*args):
+            record_status_changed(*args)
+            editing.set()
+            time_module.sleep(0.5)  # the archive starts while the edit holds its locks
+
+        def archive():
+            editing.wait(5)
+            archive_before(date(2024, 2, 1))
+
+        archiver = in_thread(archive, errors)
+        with mock.patch.object(counters, 'record_status_changed', slow_edit):
+            response = self.mark('absent')
+        archiver.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(ArchivedAttendanceRecord.objects.values_list('status', flat=True)), ['absent'])
+        self.assertFalse(AttendanceRecord.objects.exists())
+        self.assertEqual(counters.reconcile(fix=False), ([], []))
+
+    def test_edit_waits_for_an_archive_in_progress(self):
+        archiving, errors = threading.Event(), []
+        log_resync = changelog.log_resync
+
+        def slow_resync(user_ids):
+            log_resync(user_ids)
+            archiving.set()
+            time_module.sleep(0.5)  # the edit arrives while the batch holds its locks
+
+        def archive():
+            with mock.patch.object(changelog, 'log_resync', slow_resync):
+                archive_before(date(2024, 2, 1))
+
+        archiver = in_thread(archive, errors)
+        archiving.wait(5)
+        response = self.mark('absent')
+        archiver.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(list(ArchivedAttendanceRecord.objects.values_list('status', flat=True)), ['present'])
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Row locks need PostgreSQL')
+class ImportConcurrencyTests(TransactionTestCase):
+    def test_edit_during_the_counter_rebuild_is_kept(self):
+        user = User.objects.create_user('racer@example.com', 'racer@example.com', 'secret-password')
+        subject = Subject.objects.create(user=user, name='Maths')
+        self.client.force_login(user)
+
+        def mark(day, status):
+            return self.client.post(
+                '/api/records/', {'subject_id': subject.id, 'date': day, 'status': status}, content_type='application/json'
+            )
+
+        mark('2024-01-01', 'present')
+        rebuilding, errors = threading.Event(), []
+        count_history = counters.count_history
+
+        def slow_count(*args):
+            counts = count_history(*args)
+            rebuilding.set()
+            time_module.sleep(0.5)  # the edit arrives between the count and its write-back
+            return counts
+
+        def run_import():
+            import_csv(io.StringIO('subject,date,status\nMaths,2024-01-08,present\n', newline=''), 'records', user=user)
+
+        with mock.patch.object(counters, 'count_history', slow_count):
+            importer = in_thread(run_import, errors)
+            rebuilding.wait(5)
+            response = mark('2024-01-08', 'absent')
+        importer.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(response.status_code, 200)
+        summary = subject.attendance_summary
+        summary.refresh_from_db()
+        self.assertEqual((summary.present, summary.absent), (1, 1))
+        self.assertEqual(counters.reconcile(fix=False), ([], []))
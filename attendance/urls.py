@@ -1,18 +1,34 @@
-﻿from django.urls import path
+﻿from django.conf import settings
+from django.urls import path
 
-from . import views
+from . import async_views, views
+
+# Under ASGI the read endpoints are served by their async variants.
+reads = async_views if settings.ATTENDANCE_ASYNC_VIEWS else views
 
 urlpatterns = [
     path('auth/register/', views.register_view, name='register'),
     path('auth/login/', views.login_view, name='login'),
     path('auth/logout/', views.logout_view, name='logout'),
-    path('auth/me/', views.me_view, name='me'),
-    path('subjects/', views.subjects_view, name='subjects'),
+    path('auth/me/', reads.me_view, name='me'),
+    path('subjects/', reads.subjects_view, name='subjects'),
     path('subjects/<int:subject_id>/', views.subject_detail_view, name='subject-detail'),
-    path('lectures/', views.lectures_view, name='lectures'),
+    path('lectures/', reads.lectures_view, name='lectures'),
     path('lectures/<int:lecture_id>/', views.lecture_detail_view, name='lecture-detail'),
-    path('records/', views.records_view, name='records'),
+    path('records/', reads.records_view, name='records'),
+    path('records/export/', views.records_export_view, name='records-export'),
+    path('records/bulk/', views.records_bulk_view, name='records-bulk'),
+    path('records/missing/', views.records_missing_view, name='records-missing'),
     path('records/<int:record_id>/', views.record_detail_view, name='record-detail'),
+    path('import/', views.import_view, name='import'),
     path('settings/', views.settings_view, name='settings'),
-    path('dashboard/summary/', views.dashboard_summary_view, name='dashboard-summary'),
+    path('bootstrap/', views.bootstrap_view, name='bootstrap'),
+    path('sync/', views.sync_view, name='sync'),
+    path('calendar/', views.calendar_view, name='calendar'),
+    path('dashboard/summary/', reads.dashboard_summary_view, name='dashboard-summary'),
+    path('projection/', views.projection_view, name='projection'),
+    path('jobs/', views.jobs_view, name='jobs'),
+    path('jobs/<int:job_id>/', views.job_detail_view, name='job-detail'),
+    path('jobs/<int:job_id>/result/', views.job_result_view, name='job-result'),
+    path('jobs/<slug:kind>/', views.job_create_view, name='job-create'),
 ]
@@ -0,0 +1,139 @@
+"""Per-user cache of the ``auth_user`` row and the user's ``UserSetting``.
+
+``CachedModelBackend`` serves ``request.user`` from the cache, so together
+with cache-backed sessions an authenticated request no longer touches
+``django_session`` or ``auth_user``. Entries are dropped after commit
+whenever either row is saved or deleted, and expire after
+``USER_CACHE_SECONDS`` to bound staleness from queryset ``update()`` calls.
+
+The user entry holds ``CACHED_USER_FIELDS`` and the session auth hash, never
+the password hash: the user is rebuilt from it with the remaining fields
+deferred, so code that needs the password (``check_password``) loads it.
+
+Caching is only on with ``ATTENDANCE_USER_CACHE``, which the settings turn
+on for a shared cache: invalidating an in-process cache would only reach
+the worker that saw the change. Otherwise every lookup reads the database.
+
+The cached setting is for ``target_percentage`` only: ``data_version`` and
+``sync_floor`` move with every write and are always read from the database.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import UserSetting
+
+USER_CACHE_SECONDS = 300
+CACHED_USER_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser')
+
+
+def user_key(user_id):
+    return f'attendance:user:{user_id}'
+
+
+def setting_key(user_id):
+    return f'attendance:setting:{user_id}'
+
+
+def enabled():
+    return getattr(settings, 'ATTENDANCE_USER_CACHE', False)
+
+
+def user_entry(user):
+    """The cached form of ``user``: its CACHED_USER_FIELDS and session auth hash."""
+    return {'fields': {name: getattr(user, name) for name in CACHED_USER_FIELDS}, 'session_auth_hash': user.get_session_auth_hash()}
+
+
+def cached_user(entry):
+    """Rebuild a User from ``user_entry``; fields not in the entry load from the database on access."""
+    fields = entry['fields']
+    # from_db takes the values in model field order.
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in fields]
+    user = User.from_db(router.db_for_read(User), names, [fields[name] for name in names])
+    # The session check compares against the hash without loading the password.
+    session_auth_hash = entry['session_auth_hash']
+    user.get_session_auth_hash = lambda: session_auth_hash
+    return user
+
+
+class CachedModelBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user = super().authenticate(request, username=username, password=password, **kwargs)
+        if user is None and password is not None:
+            # ModelBackend, listed after this one for older sessions, would
+            # only check the same password again.
+            raise PermissionDenied
+        return user
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        user = await super().aauthenticate(request, username=username, password=password, **kwargs)
+        if user is None and password is not None:
+            raise PermissionDenied
+        return user
+
+    def get_user(self, user_id):
+        if not enabled():
+            return super().get_user(user_id)
+        key = user_key(user_id)
+        entry = cache.get(key)
+        if entry is not None:
+            return cached_user(entry)
+        user = super().get_user(user_id)
+        if user is not None:
+            cache.set(key, user_entry(user), USER_CACHE_SECONDS)
+        return user
+
+    async def aget_user(self, user_id):
+        if not enabled():
+            return await super().aget_user(user_id)
+        key = user_key(user_id)
+        entry = await cache.aget(key)
+        if entry is not None:
+            return cached_user(entry)
+        user = await super().aget_user(user_id)
+        if user is not None:
+            await cache.aset(key, user_entry(user), USER_CACHE_SECONDS)
+        return user
+
+
+def get_setting(user):
+    """Return the user's ``UserSetting``, creating it on first use."""
+    if not enabled():
+        return UserSetting.objects.get_or_create(user=user)[0]
+    key = setting_key(user.id)
+    setting = cache.get(key)
+    if setting is None:
+        # By user_id, so the cached setting does not carry the user along.
+        setting, _ = UserSetting.objects.get_or_create(user_id=user.id)
+        cache.set(key, setting, USER_CACHE_SECONDS)
+    return setting
+
+
+async def aget_setting(user):
+    if not enabled():
+        return (await UserSetting.objects.aget_or_create(user=user))[0]
+    key = setting_key(user.id)
+    setting = await cache.aget(key)
+    if setting is None:
+        setting, _ = await UserSetting.objects.aget_or_create(user_id=user.id)
+        await cache.aset(key, setting, USER_CACHE_SECONDS)
+    return setting
+
+
+def invalidate(user_id):
+    cache.delete_many([user_key(user_id), setting_key(user_id)])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=UserSetting)
+@receiver(post_delete, sender=UserSetting)
+def _invalidate_on_change(sender, instance, **kwargs):
+    user_id = instance.pk if sender is User else instance.user_id
+    # Deleting before commit would let a concurrent request re-cache the old row.
+    transaction.on_commit(lambda: invalidate(user_id))
@@ -0,0 +1,47 @@
+"""Per-user data version used for conditional GETs and the change log.
+
+The version lives on UserSetting and only ever increases. It is bumped in
+the same transaction as the write it describes, while holding a lock on the
+user's setting row, so versions are handed out in commit order and a reader
+never sees a new version together with old data.
+
+Writers of attendance records take that lock first, with ``lock_versions``,
+before touching any record row. Archiving takes the same locks first too, so
+the two can never wait on each other's rows in opposite orders.
+"""
+from django.db.models import F
+
+from .models import UserSetting
+
+
+def data_version(user):
+    return UserSetting.objects.filter(user=user).values_list('data_version', flat=True).first() or 0
+
+
+async def adata_version(user):
+    return await UserSetting.objects.filter(user=user).values_list('data_version', flat=True).afirst() or 0
+
+
+def lock_versions(user_ids):
+    """Lock the setting rows of ``user_ids`` in id order, creating missing ones; call inside a transaction."""
+    user_ids = sorted(set(user_ids))
+    locked = UserSetting.objects.select_for_update().filter(user_id__in=user_ids).order_by('user_id')
+    found = set(locked.values_list('user_id', flat=True))
+    if len(found) < len(user_ids):
+        UserSetting.objects.bulk_create(
+            [UserSetting(user_id=user_id) for user_id in user_ids if user_id not in found], ignore_conflicts=True
+        )
+        list(locked.values_list('user_id', flat=True))
+
+
+def bump_data_version(user_id):
+    """Lock the user's setting row and return the incremented version; call inside a transaction."""
+    setting, _ = UserSetting.objects.select_for_update().get_or_create(user_id=user_id)
+    UserSetting.objects.filter(pk=setting.pk).update(data_version=F('data_version') + 1)
+    return setting.data_version + 1
+
+
+def etag_for(user, version=None):
+    if version is None:
+        version = data_version(user)
+    return f'W/"{user.id}-{version}"'
@@ -1,15 +1,53 @@
-﻿import json
-from datetime import datetime
+﻿import base64
+import codecs
+import csv
+import gzip
+import io
+import json
+from collections import Counter
+from datetime import datetime, timedelta
 from functools import wraps
 
+from asgiref.sync import iscoroutinefunction
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.core.cache import cache
 from django.db.models import Count, Q
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
-from .models import AttendanceRecord, Lecture, Subject, UserSetting
+from . import changelog, counters, jobs
+from .archive import archived_dashboard_rows, archived_keys
+from .exports import EXPORT_FORMATS, stream_export
+from .filters import RECORD_FILTER_ERROR, filter_records, parse_date_range
+from .imports import IMPORT_KINDS, import_csv
+from .missing import MISSING_RANGE_MAX_DAYS, missing_lectures
+from .models import (
+    ArchivedAttendanceRecord,
+    AttendanceRecord,
+    Job,
+    Lecture,
+    Subject,
+    SubjectAttendanceSummary,
+    UserSetting,
+)
+from .purge import delete_subject
+from .schedule import count_occurrences, parse_holidays, project
+from .serializers import (
+    FastJsonResponse,
+    record_rows,
+    serialize_lectures,
+    serialize_record_rows,
+    serialize_records,
+    serialize_subjects,
+)
+from .usercache import get_setting
+from .versioning import adata_version, data_version, etag_for, lock_versions
 
 
 def parse_json(request):
@@ -20,6 +58,18 @@ def parse_json(request):
 
 
 def login_required_api(view_func):
+    if iscoroutinefunction(view_func):
+
+        @wraps(view_func)
+        async def _awrapped(request, *args, **kwargs):
+            # Resolve the lazy user without a synchronous ORM call.
+            request.user = await request.auser()
+            if not request.user.is_authenticated:
+                return JsonResponse({'error': 'Authentication required'}, status=401)
+            return await view_func(request, *args, **kwargs)
+
+        return _awrapped
+
     @wraps(view_func)
     def _wrapped(request, *args, **kwargs):
         if not request.user.is_authenticated:
@@ -29,10 +79,173 @@ def login_required_api(view_func):
     return _wrapped
 
 
+def versioned_api(view_func):
+    """Answer reads conditionally from the user's data version.
+
+    Writes bump the version through ``changelog.log_changes``. Must be applied
+    below ``login_required_api``.
+    """
+
+    def match_etag(request, version):
+        # Kept on the request so views can key caches on it without a second query.
+        request.data_version = version
+        etag = etag_for(request.user, version)
+        client_etags = {tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))}
+        return etag, etag.removeprefix('W/') in client_etags or '*' in client_etags
+
+    def finish(response, etag):
+        if response.status_code not in (200, 304):
+            return response
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    if iscoroutinefunction(view_func):
+
+        @wraps(view_func)
+        async def _awrapped(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view_func(request, *args, **kwargs)
+            etag, matched = match_etag(request, await adata_version(request.user))
+            if matched:
+                return finish(HttpResponseNotModified(), etag)
+            return finish(await view_func(request, *args, **kwargs), etag)
+
+        return _awrapped
+
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view_func(request, *args, **kwargs)
+        etag, matched = match_etag(request, data_version(request.user))
+        if matched:
+            return finish(HttpResponseNotModified(), etag)
+        return finish(view_func(request, *args, **kwargs), etag)
+
+    return _wrapped
+
+
+RECORD_PAGE_SIZE_MAX = 1000
+CALENDAR_CACHE_SECONDS = 60 * 60
+# When one subject has several lectures on a day, the day shows the most
+# significant mark.
+CALENDAR_STATUS_PRECEDENCE = {'absent': 3, 'present': 2, 'off': 1}
+BULK_RECORDS_MAX = 500
+JOB_LIST_SIZE = 20
+JOB_URL_KINDS = ('export', 'import', 'reconcile', 'delete-account')
+ARCHIVED_LECTURE_ERROR = 'This lecture is archived and can no longer be changed'
+
+
+def encode_cursor(date, record_id):
+    raw = f'{date.isoformat()}:{record_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the ``(date, id)`` position encoded by ``encode_cursor``; raises ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        date_part, id_part = raw.split(':')
+        return datetime.strptime(date_part, '%Y-%m-%d').date(), int(id_part)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError('invalid cursor') from exc
+
+
+def records_query(request):
+    """Build the records list query; returns ``(records, limit)``.
+
+    ``limit`` is None for the unpaginated list. Raises ValueError with the
+    message to send back to the client.
+    """
+    try:
+        records = filter_records(request, AttendanceRecord.objects.filter(user=request.user))
+    except ValueError:
+        raise ValueError(RECORD_FILTER_ERROR) from None
+
+    limit_value = (request.GET.get('limit') or '').strip()
+    cursor = (request.GET.get('cursor') or '').strip()
+    if not limit_value and not cursor:
+        return records, None
+
+    # Keyset pagination on (date, id), newest first, so every page costs
+    # the same regardless of how far into the history it starts.
+    try:
+        limit = min(int(limit_value or RECORD_PAGE_SIZE_MAX), RECORD_PAGE_SIZE_MAX)
+        if limit < 1:
+            raise ValueError('limit must be positive')
+        if cursor:
+            cursor_date, cursor_id = decode_cursor(cursor)
+            records = records.filter(Q(date__lt=cursor_date) | Q(date=cursor_date, id__lt=cursor_id))
+    except ValueError:
+        raise ValueError('Invalid limit or cursor') from None
+    return records.order_by('-date', '-id'), limit
+
+
+def records_page(page, limit):
+    """Response body for up to ``limit + 1`` rows fetched by a paginated ``records_query``."""
+    next_cursor = None
+    if len(page) > limit:
+        record_id, _, date, _, _ = page[limit - 1]
+        next_cursor = encode_cursor(date, record_id)
+    return {'records': serialize_record_rows(page[:limit]), 'next_cursor': next_cursor}
+
+
+def parse_subject_id(value):
+    """``value`` as a subject id; JSON numbers and digit strings only, or raises ValueError."""
+    if isinstance(value, str) and value.strip().isascii() and value.strip().isdigit():
+        return int(value)
+    # bool is an int subclass: true must not pass as subject 1.
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError('subject_id must be an integer')
+    return value
+
+
+def parse_record_payload(payload):
+    """Validate one attendance mark; returns ``(subject_id, date, lecture_time, status)`` or raises ValueError."""
+    if not isinstance(payload, dict):
+        raise ValueError('Each record must be an object')
+
+    subject_id = payload.get('subject_id')
+    date_value = str(payload.get('date') or '').strip()
+    status = str(payload.get('status') or '').strip().lower()
+    lecture_time_value = payload.get('lecture_time')
+
+    if not subject_id or not date_value or status not in {'present', 'absent', 'off'}:
+        raise ValueError('subject_id, date and valid status are required')
+    subject_id = parse_subject_id(subject_id)
+
+    lecture_time = None
+    if lecture_time_value:
+        try:
+            lecture_time = datetime.strptime(str(lecture_time_value), '%H:%M').time()
+        except ValueError:
+            raise ValueError('lecture_time must be HH:MM') from None
+
+    try:
+        date_obj = datetime.strptime(date_value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('date must be YYYY-MM-DD') from None
+
+    return subject_id, date_obj, lecture_time, status
+
+
 def subject_to_dict(subject):
     return {'id': subject.id, 'name': subject.name, 'code': subject.code}
 
 
+def job_to_dict(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'result': job.result,
+        'error': job.error,
+    }
+
+
 def lecture_to_dict(lecture):
     return {
         'id': lecture.id,
@@ -71,7 +284,7 @@ def register_view(request):
 
     user = User.objects.create_user(username=email, email=email, password=password, first_name=name)
     UserSetting.objects.get_or_create(user=user)
-    login(request, user)
+    login(request, user, backend='attendance.usercache.CachedModelBackend')
     return JsonResponse({'message': 'Account created', 'user': {'name': user.first_name, 'email': user.email}}, status=201)
 
 
@@ -106,7 +319,7 @@ def logout_view(request):
 @require_http_methods(['GET'])
 @login_required_api
 def me_view(request):
-    setting, _ = UserSetting.objects.get_or_create(user=request.user)
+    setting = get_setting(request.user)
     return JsonResponse(
         {
             'user': {'name': request.user.first_name, 'email': request.user.email},
@@ -118,10 +331,11 @@ def me_view(request):
 @csrf_exempt
 @require_http_methods(['GET', 'POST'])
 @login_required_api
+@versioned_api
 def subjects_view(request):
     if request.method == 'GET':
         subjects = Subject.objects.filter(user=request.user)
-        return JsonResponse({'subjects': [subject_to_dict(s) for s in subjects]})
+        return FastJsonResponse({'subjects': serialize_subjects(subjects)})
 
     payload = parse_json(request)
     if payload is None:
@@ -132,10 +346,17 @@ def subjects_view(request):
     if not name:
         return JsonResponse({'error': 'name is required'}, status=400)
 
-    subject, created = Subject.objects.get_or_create(user=request.user, name=name, defaults={'code': code})
-    if not created and code and subject.code != code:
-        subject.code = code
-        subject.save(update_fields=['code'])
+    with transaction.atomic():
+        subject, created = Subject.objects.get_or_create(user=request.user, name=name, defaults={'code': code})
+        if created:
+            # An empty counter row now spares the first mark from seeding it.
+            SubjectAttendanceSummary.objects.create(user=request.user, subject=subject)
+        changed = not created and code and subject.code != code
+        if changed:
+            subject.code = code
+            subject.save(update_fields=['code'])
+        if created or changed:
+            changelog.log_changes(request.user.id, [('subject', subject.id, 'upsert', subject_to_dict(subject))])
 
     return JsonResponse({'subject': subject_to_dict(subject), 'created': created}, status=201 if created else 200)
 
@@ -143,6 +364,7 @@ def subjects_view(request):
 @csrf_exempt
 @require_http_methods(['PUT', 'DELETE'])
 @login_required_api
+@versioned_api
 def subject_detail_view(request, subject_id):
     try:
         subject = Subject.objects.get(id=subject_id, user=request.user)
@@ -150,7 +372,11 @@ def subject_detail_view(request, subject_id):
         return JsonResponse({'error': 'Subject not found'}, status=404)
 
     if request.method == 'DELETE':
-        subject.delete()
+        deleted_id = subject.id
+        with transaction.atomic():
+            lock_versions([request.user.id])
+            delete_subject(subject)
+            changelog.log_changes(request.user.id, [('subject', deleted_id, 'delete', None)])
         return JsonResponse({'message': 'Subject deleted'})
 
     payload = parse_json(request)
@@ -163,20 +389,23 @@ def subject_detail_view(request, subject_id):
     if name:
         subject.name = name
     subject.code = code
-    subject.save()
+    with transaction.atomic():
+        subject.save()
+        changelog.log_changes(request.user.id, [('subject', subject.id, 'upsert', subject_to_dict(subject))])
     return JsonResponse({'subject': subject_to_dict(subject)})
 
 
 @csrf_exempt
 @require_http_methods(['GET', 'POST'])
 @login_required_api
+@versioned_api
 def lectures_view(request):
     if request.method == 'GET':
         day = (request.GET.get('day') or '').strip().lower()
         lectures = Lecture.objects.filter(user=request.user)
         if day:
             lectures = lectures.filter(day=day)
-        return JsonResponse({'lectures': [lecture_to_dict(l) for l in lectures]})
+        return FastJsonResponse({'lectures': serialize_lectures(lectures)})
 
     payload = parse_json(request)
     if payload is None:
@@ -188,6 +417,10 @@ def lectures_view(request):
 
     if not subject_id or not day or not time_value:
         return JsonResponse({'error': 'subject_id, day, time are required'}, status=400)
+    try:
+        subject_id = parse_subject_id(subject_id)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
 
     try:
         subject = Subject.objects.get(id=subject_id, user=request.user)
@@ -199,12 +432,15 @@ def lectures_view(request):
     except ValueError:
         return JsonResponse({'error': 'time must be HH:MM'}, status=400)
 
-    lecture, created = Lecture.objects.get_or_create(
-        user=request.user,
-        subject=subject,
-        day=day,
-        time=time_obj,
-    )
+    with transaction.atomic():
+        lecture, created = Lecture.objects.get_or_create(
+            user=request.user,
+            subject=subject,
+            day=day,
+            time=time_obj,
+        )
+        if created:
+            changelog.log_changes(request.user.id, [('lecture', lecture.id, 'upsert', lecture_to_dict(lecture))])
 
     return JsonResponse({'lecture': lecture_to_dict(lecture), 'created': created}, status=201 if created else 200)
 
@@ -212,78 +448,256 @@ def lectures_view(request):
 @csrf_exempt
 @require_http_methods(['DELETE'])
 @login_required_api
+@versioned_api
 def lecture_detail_view(request, lecture_id):
-    deleted, _ = Lecture.objects.filter(id=lecture_id, user=request.user).delete()
-    if not deleted:
-        return JsonResponse({'error': 'Lecture not found'}, status=404)
+    with transaction.atomic():
+        deleted, _ = Lecture.objects.filter(id=lecture_id, user=request.user).delete()
+        if not deleted:
+            return JsonResponse({'error': 'Lecture not found'}, status=404)
+        changelog.log_changes(request.user.id, [('lecture', lecture_id, 'delete', None)])
     return JsonResponse({'message': 'Lecture deleted'})
 
 
 @csrf_exempt
 @require_http_methods(['GET', 'POST'])
 @login_required_api
+@versioned_api
 def records_view(request):
     if request.method == 'GET':
-        date_str = (request.GET.get('date') or '').strip()
-        records = AttendanceRecord.objects.filter(user=request.user)
-        if date_str:
-            records = records.filter(date=date_str)
-        return JsonResponse({'records': [record_to_dict(r) for r in records]})
+        try:
+            records, limit = records_query(request)
+        except ValueError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+        if limit is None:
+            return FastJsonResponse({'records': serialize_records(records)})
+        return FastJsonResponse(records_page(list(record_rows(records)[: limit + 1]), limit))
 
     payload = parse_json(request)
     if payload is None:
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
 
-    subject_id = payload.get('subject_id')
-    date_value = (payload.get('date') or '').strip()
-    status = (payload.get('status') or '').strip().lower()
-    lecture_time_value = payload.get('lecture_time')
-
-    if not subject_id or not date_value or status not in {'present', 'absent', 'off'}:
-        return JsonResponse({'error': 'subject_id, date and valid status are required'}, status=400)
+    try:
+        subject_id, date_obj, lecture_time, status = parse_record_payload(payload)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
 
     try:
         subject = Subject.objects.get(id=subject_id, user=request.user)
     except Subject.DoesNotExist:
         return JsonResponse({'error': 'Subject not found'}, status=404)
 
-    lecture_time = None
-    if lecture_time_value:
+    lookup = {'user': request.user, 'subject': subject, 'date': date_obj, 'lecture_time': lecture_time}
+    with transaction.atomic():
+        # The version lock comes before any record lock (see versioning), and
+        # holding it keeps archive_attendance from moving the lecture meanwhile.
+        lock_versions([request.user.id])
+        if archived_keys([request.user.id], [(request.user.id, subject.id, date_obj, lecture_time)]):
+            return JsonResponse({'error': ARCHIVED_LECTURE_ERROR}, status=409)
+        old_status = (
+            AttendanceRecord.objects.select_for_update().filter(**lookup).values_list('status', flat=True).first()
+        )
+        record, created = AttendanceRecord.objects.update_or_create(**lookup, defaults={'status': status})
+        counters.record_status_changed(request.user.id, subject.id, old_status, status)
+        changelog.log_changes(request.user.id, [('record', record.id, 'upsert', record_to_dict(record))])
+    return JsonResponse({'record': record_to_dict(record), 'created': created}, status=201 if created else 200)
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+@login_required_api
+@versioned_api
+def records_bulk_view(request):
+    payload = parse_json(request)
+    if payload is None:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    items = payload.get('records') if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        return JsonResponse({'error': 'records must be a non-empty list'}, status=400)
+    if len(items) > BULK_RECORDS_MAX:
+        return JsonResponse({'error': f'At most {BULK_RECORDS_MAX} records per request'}, status=400)
+
+    results = [None] * len(items)
+    marks = {}
+    for index, item in enumerate(items):
         try:
-            lecture_time = datetime.strptime(lecture_time_value, '%H:%M').time()
-        except ValueError:
-            return JsonResponse({'error': 'lecture_time must be HH:MM'}, status=400)
+            subject_id, date_obj, lecture_time, status = parse_record_payload(item)
+        except ValueError as exc:
+            results[index] = {'index': index, 'result': 'error', 'error': str(exc)}
+            continue
+        key = (subject_id, date_obj, lecture_time)
+        if key in marks:
+            earlier = marks[key][0]
+            results[earlier] = {'index': earlier, 'result': 'error', 'error': 'Superseded by a later item for the same lecture'}
+        marks[key] = (index, status)
+
+    # Ownership of every referenced subject is checked with a single query.
+    owned = set(
+        Subject.objects.filter(user=request.user, id__in={key[0] for key in marks}).values_list('id', flat=True)
+    )
+    for key, (index, _) in list(marks.items()):
+        if key[0] not in owned:
+            results[index] = {'index': index, 'result': 'error', 'error': 'Subject not found'}
+            del marks[key]
+
+    with transaction.atomic():
+        lock_versions([request.user.id])
+        archived = archived_keys([request.user.id], [(request.user.id, *key) for key in marks])
+        for _, *key in archived:
+            index = marks.pop(tuple(key))[0]
+            results[index] = {'index': index, 'result': 'error', 'error': ARCHIVED_LECTURE_ERROR}
+
+        existing = {}
+        if marks:
+            rows = (
+                AttendanceRecord.objects.select_for_update()
+                .filter(user=request.user, subject_id__in={key[0] for key in marks}, date__in={key[1] for key in marks})
+                .values_list('subject_id', 'date', 'lecture_time', 'id', 'status')
+            )
+            existing = {(subject_id, date, time): (pk, status) for subject_id, date, time, pk, status in rows}
+
+        # NULL lecture times never collide in a unique index, so rows that
+        # already exist without a time are updated by primary key instead.
+        to_upsert, to_update = [], []
+        for (subject_id, date_obj, lecture_time), (index, status) in marks.items():
+            record = AttendanceRecord(
+                user=request.user, subject_id=subject_id, date=date_obj, lecture_time=lecture_time, status=status
+            )
+            previous = existing.get((subject_id, date_obj, lecture_time))
+            if previous and lecture_time is None:
+                record.id = previous[0]
+                to_update.append(record)
+            else:
+                to_upsert.append(record)
+
+        AttendanceRecord.objects.bulk_create(
+            to_upsert,
+            update_conflicts=True,
+            unique_fields=['user', 'subject', 'date', 'lecture_time'],
+            update_fields=['status'],
+        )
+        AttendanceRecord.objects.bulk_update(to_update, ['status'])
+
+        transitions = []
+        for record in to_upsert + to_update:
+            key = (record.subject_id, record.date, record.lecture_time)
+            index, status = marks[key]
+            previous = existing.get(key)
+            transitions.append((record.subject_id, previous[1] if previous else None, status))
+            results[index] = {
+                'index': index,
+                'result': 'updated' if previous else 'created',
+                'record': record_to_dict(record),
+            }
+        counters.records_changed(request.user.id, transitions)
+        if transitions:
+            changelog.log_changes(
+                request.user.id,
+                [('record', result['record']['id'], 'upsert', result['record']) for result in results if 'record' in result],
+            )
+
+    summary = {outcome: sum(1 for r in results if r['result'] == outcome) for outcome in ('created', 'updated', 'error')}
+    return JsonResponse({'results': results, **summary})
+
+
+@require_http_methods(['GET'])
+@login_required_api
+def records_export_view(request):
+    export_format = (request.GET.get('format') or 'csv').strip().lower()
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': 'format must be csv or ndjson'}, status=400)
 
     try:
-        date_obj = datetime.strptime(date_value, '%Y-%m-%d').date()
+        records = filter_records(request, AttendanceRecord.objects.filter(user=request.user))
+        archived = filter_records(request, ArchivedAttendanceRecord.objects.filter(user=request.user))
     except ValueError:
-        return JsonResponse({'error': 'date must be YYYY-MM-DD'}, status=400)
-
-    record, created = AttendanceRecord.objects.update_or_create(
-        user=request.user,
-        subject=subject,
-        date=date_obj,
-        lecture_time=lecture_time,
-        defaults={'status': status},
+        return JsonResponse({'error': RECORD_FILTER_ERROR}, status=400)
+
+    response = StreamingHttpResponse(
+        stream_export(records, export_format, archived=archived), content_type=EXPORT_FORMATS[export_format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="attendance.{export_format}"'
+    return response
+
+
+@require_http_methods(['GET'])
+@login_required_api
+@versioned_api
+def records_missing_view(request):
+    try:
+        date_from, date_to = parse_date_range(request)
+    except ValueError:
+        return JsonResponse({'error': 'from and to must be YYYY-MM-DD'}, status=400)
+    if date_from is None or date_to is None:
+        return JsonResponse({'error': 'from and to are required'}, status=400)
+    if not timedelta(0) <= date_to - date_from < timedelta(days=MISSING_RANGE_MAX_DAYS):
+        return JsonResponse({'error': f'to must be on or after from and at most {MISSING_RANGE_MAX_DAYS} days later'}, status=400)
+
+    rows = missing_lectures([request.user.id], date_from, date_to)
+    return FastJsonResponse(
+        {
+            'from': date_from.isoformat(),
+            'to': date_to.isoformat(),
+            'missing': [
+                {
+                    'date': day.isoformat(),
+                    'lecture_id': lecture_id,
+                    'subject_id': subject_id,
+                    'subject_name': subject_name,
+                    'time': time.strftime('%H:%M'),
+                }
+                for _, day, lecture_id, subject_id, subject_name, time in rows
+            ],
+        }
     )
-    return JsonResponse({'record': record_to_dict(record), 'created': created}, status=201 if created else 200)
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+@login_required_api
+@versioned_api
+def import_view(request):
+    kind = (request.GET.get('kind') or 'records').strip().lower()
+    if kind not in IMPORT_KINDS:
+        return JsonResponse({'error': 'kind must be records or lectures'}, status=400)
+
+    upload = request.FILES.get('file')
+    if upload is not None:
+        lines = codecs.iterdecode(upload, 'utf-8-sig')
+    elif request.content_type == 'text/csv':
+        lines = io.StringIO(request.body.decode('utf-8-sig', errors='strict'), newline='')
+    else:
+        return JsonResponse({'error': 'Upload a CSV as the file field or send it as text/csv'}, status=400)
+
+    try:
+        result = import_csv(lines, kind, user=request.user)
+    except (UnicodeDecodeError, csv.Error):
+        return JsonResponse({'error': 'File must be UTF-8 encoded CSV'}, status=400)
+    return JsonResponse(result)
 
 
 @csrf_exempt
 @require_http_methods(['DELETE'])
 @login_required_api
+@versioned_api
 def record_detail_view(request, record_id):
-    deleted, _ = AttendanceRecord.objects.filter(id=record_id, user=request.user).delete()
-    if not deleted:
-        return JsonResponse({'error': 'Record not found'}, status=404)
+    with transaction.atomic():
+        lock_versions([request.user.id])
+        record = AttendanceRecord.objects.select_for_update().filter(id=record_id, user=request.user).first()
+        if record is None:
+            return JsonResponse({'error': 'Record not found'}, status=404)
+        record.delete()
+        counters.record_status_changed(request.user.id, record.subject_id, record.status, None)
+        changelog.log_changes(request.user.id, [('record', record_id, 'delete', None)])
     return JsonResponse({'message': 'Record deleted'})
 
 
 @csrf_exempt
 @require_http_methods(['GET', 'PUT'])
 @login_required_api
+@versioned_api
 def settings_view(request):
-    setting, _ = UserSetting.objects.get_or_create(user=request.user)
+    setting = get_setting(request.user)
 
     if request.method == 'GET':
         return JsonResponse({'target_percentage': setting.target_percentage})
@@ -297,50 +711,344 @@ def settings_view(request):
         return JsonResponse({'error': 'target_percentage must be 1..100'}, status=400)
 
     setting.target_percentage = target
-    setting.save(update_fields=['target_percentage'])
+    with transaction.atomic():
+        setting.save(update_fields=['target_percentage'])
+        changelog.log_changes(request.user.id, [('setting', setting.id, 'upsert', {'target_percentage': target})])
     return JsonResponse({'target_percentage': setting.target_percentage})
 
 
 @require_http_methods(['GET'])
 @login_required_api
-def dashboard_summary_view(request):
-    records = AttendanceRecord.objects.filter(user=request.user)
-    total = records.filter(Q(status='present') | Q(status='absent')).count()
-    attended = records.filter(status='present').count()
-    missed = records.filter(status='absent').count()
-    percentage = int(round((attended / total) * 100)) if total else 0
+@versioned_api
+def bootstrap_view(request):
+    """Everything the client needs at startup in one round trip.
+
+    Accepts the same record filters as ``records_view`` (e.g. ``?from=``) to
+    limit the records to a recent window.
+    """
+    try:
+        records = filter_records(request, AttendanceRecord.objects.filter(user=request.user))
+    except ValueError:
+        return JsonResponse({'error': RECORD_FILTER_ERROR}, status=400)
+
+    # versioned_api read the version before the data: a write that lands in
+    # between is then replayed by the next sync instead of being missed.
+    setting = get_setting(request.user)
+    return FastJsonResponse(
+        {
+            'user': {'name': request.user.first_name, 'email': request.user.email},
+            'target_percentage': setting.target_percentage,
+            'seq': request.data_version,
+            'subjects': serialize_subjects(Subject.objects.filter(user=request.user)),
+            'lectures': serialize_lectures(Lecture.objects.filter(user=request.user)),
+            'records': serialize_records(records),
+        }
+    )
+
 
-    by_subject = (
-        records.values('subject__id', 'subject__name')
-        .annotate(
-            present=Count('id', filter=Q(status='present')),
-            absent=Count('id', filter=Q(status='absent')),
+@require_http_methods(['GET'])
+@login_required_api
+@versioned_api
+def sync_view(request):
+    try:
+        since = int(request.GET.get('since') or 0)
+    except ValueError:
+        return JsonResponse({'error': 'since must be an integer'}, status=400)
+
+    # Read-only, like data_version(): a user without a setting row has no
+    # changes yet, so version and floor are both 0.
+    version, floor = (
+        UserSetting.objects.filter(user=request.user).values_list('data_version', 'sync_floor').first() or (0, 0)
+    )
+    if since < floor:
+        # Tombstones after ``since`` were compacted away; reload via bootstrap.
+        return JsonResponse({'reset': True, 'seq': version, 'changes': [], 'has_more': False})
+
+    entries, has_more = changelog.changes_since(request.user, since)
+    return FastJsonResponse(
+        {
+            'reset': False,
+            'seq': entries[-1].seq if has_more else max(since, version),
+            'changes': [
+                {'seq': e.seq, 'model': e.model, 'id': e.object_id, 'action': e.action, 'data': e.data} for e in entries
+            ],
+            'has_more': has_more,
+        }
+    )
+
+
+@require_http_methods(['GET'])
+@login_required_api
+@versioned_api
+def calendar_view(request):
+    month_value = (request.GET.get('month') or '').strip()
+    try:
+        month_start = datetime.strptime(month_value, '%Y-%m').date()
+    except ValueError:
+        return JsonResponse({'error': 'month must be YYYY-MM'}, status=400)
+    next_month = (month_start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+    # The data version is part of the key, so any write invalidates the entry.
+    cache_key = f'attendance:calendar:{request.user.id}:{month_value}:{request.data_version}'
+    subjects = cache.get(cache_key)
+    if subjects is None:
+        rows = (
+            AttendanceRecord.objects.filter(user=request.user, date__gte=month_start, date__lt=next_month)
+            .values('subject_id', 'subject__name', 'date', 'status')
+            .annotate(count=Count('id'))
+            .order_by('subject__name', 'date')
         )
+        by_subject = {}
+        for row in rows:
+            entry = by_subject.setdefault(
+                row['subject_id'],
+                {'subject_id': row['subject_id'], 'subject_name': row['subject__name'], 'present': 0, 'absent': 0, 'off': 0, 'dates': {}},
+            )
+            entry[row['status']] += row['count']
+            day = row['date'].isoformat()
+            current = entry['dates'].get(day)
+            if current is None or CALENDAR_STATUS_PRECEDENCE[row['status']] > CALENDAR_STATUS_PRECEDENCE[current]:
+                entry['dates'][day] = row['status']
+        subjects = list(by_subject.values())
+        cache.set(cache_key, subjects, CALENDAR_CACHE_SECONDS)
+
+    return FastJsonResponse({'month': month_value, 'subjects': subjects})
+
+
+def dashboard_rows(user, date_from=None, date_to=None):
+    """Per-subject ``subject_id``/``subject__name``/``present``/``absent`` rows for the dashboard."""
+    if date_from or date_to:
+        # Windowed summary: one grouped pass over the records in range
+        # (served by the covering index); the overall totals are folded from
+        # the per-subject rows below. 'off' records are not counted but keep
+        # their subject in the summary, with zeros if that is all it has.
+        records = AttendanceRecord.objects.filter(user=user)
+        if date_from:
+            records = records.filter(date__gte=date_from)
+        if date_to:
+            records = records.filter(date__lte=date_to)
+        # Archived months are added in the same statement, so a subject can
+        # appear more than once; dashboard_summary folds its rows together.
+        return (
+            records.values('subject_id', 'subject__name')
+            .annotate(
+                present=Count('id', filter=Q(status='present')),
+                absent=Count('id', filter=Q(status='absent')),
+            )
+            .order_by()
+            .union(*archived_dashboard_rows(user, date_from, date_to), all=True)
+            .order_by('subject__name')
+        )
+    # One row per subject from the incrementally maintained counters;
+    # subjects whose records have all been cleared are skipped like before.
+    return (
+        SubjectAttendanceSummary.objects.filter(user=user)
+        .exclude(present=0, absent=0, off=0)
+        .values('subject_id', 'subject__name', 'present', 'absent')
         .order_by('subject__name')
     )
 
-    subjects = []
-    for row in by_subject:
-        subject_total = row['present'] + row['absent']
-        subject_percentage = int(round((row['present'] / subject_total) * 100)) if subject_total else 0
-        subjects.append(
-            {
-                'subject_id': row['subject__id'],
-                'subject_name': row['subject__name'],
-                'present': row['present'],
-                'absent': row['absent'],
-                'percentage': subject_percentage,
-            }
+
+def dashboard_summary(rows):
+    attended = missed = 0
+    subjects = {}
+    for row in rows:
+        attended += row['present']
+        missed += row['absent']
+        subject = subjects.setdefault(
+            row['subject_id'],
+            {'subject_id': row['subject_id'], 'subject_name': row['subject__name'], 'present': 0, 'absent': 0},
         )
+        subject['present'] += row['present']
+        subject['absent'] += row['absent']
 
-    return JsonResponse(
+    for subject in subjects.values():
+        subject_total = subject['present'] + subject['absent']
+        subject['percentage'] = int(round((subject['present'] / subject_total) * 100)) if subject_total else 0
+
+    total = attended + missed
+    percentage = int(round((attended / total) * 100)) if total else 0
+
+    return {
+        'overall': {
+            'total': total,
+            'attended': attended,
+            'missed': missed,
+            'percentage': percentage,
+        },
+        'subjects': list(subjects.values()),
+    }
+
+
+@require_http_methods(['GET'])
+@login_required_api
+@versioned_api
+def dashboard_summary_view(request):
+    try:
+        date_from, date_to = parse_date_range(request)
+    except ValueError:
+        return JsonResponse({'error': 'from and to must be YYYY-MM-DD'}, status=400)
+    return FastJsonResponse(dashboard_summary(dashboard_rows(request.user, date_from, date_to)))
+
+
+def projection_row(present, absent, remaining, target_percentage):
+    held = present + absent
+    skippable, required = project(present, absent, remaining, target_percentage)
+    return {
+        'present': present,
+        'absent': absent,
+        'percentage': int(round((present / held) * 100)) if held else 0,
+        'remaining': remaining,
+        'skippable': skippable,
+        'required_to_recover': required,
+    }
+
+
+# Not versioned: ``from`` defaults to today, so the answer changes without a
+# write and an ETag on the data version alone would go stale overnight.
+@require_http_methods(['GET'])
+@login_required_api
+def projection_view(request):
+    try:
+        date_from, date_to = parse_date_range(request)
+    except ValueError:
+        return JsonResponse({'error': 'from and to must be YYYY-MM-DD'}, status=400)
+    if date_to is None:
+        return JsonResponse({'error': 'to (the last day of term) is required'}, status=400)
+    date_from = date_from or timezone.localdate()
+    if date_to < date_from:
+        return JsonResponse({'error': 'to must be on or after from (today when omitted)'}, status=400)
+    try:
+        holidays = parse_holidays(request.GET.get('holidays'), date_from, date_to)
+    except ValueError:
+        return JsonResponse({'error': 'holidays must be YYYY-MM-DD days or YYYY-MM-DD..YYYY-MM-DD ranges'}, status=400)
+
+    # Remaining = timetable occurrences left in the term, less the ones
+    # already marked (including lectures marked off in advance).
+    scheduled = count_occurrences(
+        Lecture.objects.filter(user=request.user).values_list('subject_id', 'day'), date_from, date_to, holidays
+    )
+    marked = dict(
+        AttendanceRecord.objects.filter(user=request.user, date__gte=date_from, date__lte=date_to)
+        .values('subject_id')
+        .annotate(count=Count('id'))
+        .values_list('subject_id', 'count')
+        .order_by()
+    )
+    target = get_setting(request.user).target_percentage
+    subjects = (
+        Subject.objects.filter(user=request.user)
+        .values_list('id', 'name', 'attendance_summary__present', 'attendance_summary__absent')
+        .order_by('name')
+    )
+
+    rows = []
+    totals = Counter()
+    for subject_id, name, present, absent in subjects:
+        present, absent = present or 0, absent or 0
+        remaining = max(scheduled[subject_id] - marked.get(subject_id, 0), 0)
+        rows.append({'subject_id': subject_id, 'subject_name': name, **projection_row(present, absent, remaining, target)})
+        totals.update(present=present, absent=absent, remaining=remaining)
+
+    return FastJsonResponse(
         {
-            'overall': {
-                'total': total,
-                'attended': attended,
-                'missed': missed,
-                'percentage': percentage,
-            },
-            'subjects': subjects,
+            'from': date_from.isoformat(),
+            'to': date_to.isoformat(),
+            'target_percentage': target,
+            'overall': projection_row(totals['present'], totals['absent'], totals['remaining'], target),
+            'subjects': rows,
         }
     )
+
+
+def job_params(request, kind):
+    """Validate an enqueue request; returns ``(params, data)`` or raises ValueError with the client message."""
+    if kind == 'export':
+        export_format = (request.GET.get('format') or 'csv').strip().lower()
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError('format must be csv or ndjson')
+        try:
+            filter_records(request, AttendanceRecord.objects.none())
+        except ValueError:
+            raise ValueError(RECORD_FILTER_ERROR) from None
+        query = request.GET.copy()
+        query.pop('format', None)
+        return {'format': export_format, 'query': query.urlencode()}, None
+
+    if kind == 'import':
+        import_kind = (request.GET.get('kind') or 'records').strip().lower()
+        if import_kind not in IMPORT_KINDS:
+            raise ValueError('kind must be records or lectures')
+        upload = request.FILES.get('file')
+        if upload is not None:
+            return {'kind': import_kind}, upload.read()
+        if request.content_type == 'text/csv':
+            return {'kind': import_kind}, request.body
+        raise ValueError('Upload a CSV as the file field or send it as text/csv')
+
+    if kind == 'delete_account':
+        payload = parse_json(request) or {}
+        if not isinstance(payload, dict):
+            raise ValueError('Send the password as a JSON object')
+        if not request.user.check_password(payload.get('password') or ''):
+            raise ValueError('Confirm the deletion with your password')
+        return {'user_id': request.user.id}, None
+
+    return {}, None
+
+
+@require_http_methods(['GET'])
+@login_required_api
+def jobs_view(request):
+    jobs_list = Job.objects.filter(user=request.user).defer('input', 'output').order_by('-id')[:JOB_LIST_SIZE]
+    return JsonResponse({'jobs': [job_to_dict(job) for job in jobs_list]})
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+@login_required_api
+def job_create_view(request, kind):
+    kind = kind.replace('-', '_')
+    if kind not in jobs.JOB_HANDLERS:
+        return JsonResponse({'error': f'Unknown job kind; use one of {", ".join(JOB_URL_KINDS)}'}, status=404)
+    try:
+        params, data = job_params(request, kind)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    job = jobs.enqueue(kind, user=request.user, params=params, data=data)
+    if kind == 'delete_account':
+        # The account stops working now; the worker removes its data later.
+        request.user.is_active = False
+        request.user.save(update_fields=['is_active'])
+        logout(request)
+    return JsonResponse({'job': job_to_dict(job)}, status=202)
+
+
+@require_http_methods(['GET'])
+@login_required_api
+def job_detail_view(request, job_id):
+    job = Job.objects.filter(id=job_id, user=request.user).defer('input', 'output').first()
+    if job is None:
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    return JsonResponse({'job': job_to_dict(job)})
+
+
+@require_http_methods(['GET'])
+@login_required_api
+def job_result_view(request, job_id):
+    job = Job.objects.filter(id=job_id, user=request.user, kind='export').defer('input').first()
+    if job is None:
+        return JsonResponse({'error': 'Export job not found'}, status=404)
+    if job.status != Job.DONE:
+        return JsonResponse({'error': f'Export is {job.status}'}, status=409)
+
+    export_format = job.params['format']
+    # Stored compressed; hand the bytes over as they are when the client accepts gzip.
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = HttpResponse(bytes(job.output), content_type=EXPORT_FORMATS[export_format])
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(job.output), content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="attendance.{export_format}"'
+    return response
@@ -2,5 +2,8 @@
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'attendance_backend.settings')
+os.environ.setdefault('ATTENDANCE_ASYNC_VIEWS', '1')
+# Persistent connections are per thread and leak under ASGI; use DB_POOL=1 instead.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
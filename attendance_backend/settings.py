@@ -1,4 +1,5 @@
 ﻿"""Django settings for attendance backend."""
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -19,6 +20,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'attendance.instrumentation.QueryTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -52,14 +54,59 @@ ASGI_APPLICATION = 'attendance_backend.asgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'attendance_manager',
-        'USER': 'postgres',
-        'PASSWORD': '87654321',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'NAME': os.environ.get('DB_NAME', 'attendance_manager'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', '87654321'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'OPTIONS': {'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', '5'))},
     }
 }
 
+# Connection reuse. Opening a PostgreSQL connection costs more than most API
+# calls, so connections are kept open by default:
+#   DB_POOL=1                  psycopg 3 connection pool (needs psycopg[pool]), sized by
+#                              DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE; DB_POOL_TIMEOUT is how
+#                              long a request waits for a free connection. Use this under ASGI.
+#   DB_CONN_MAX_AGE=60         otherwise, seconds each worker thread keeps its connection
+#                              (0 closes it after every request; asgi.py defaults to 0).
+#   DB_HEALTH_CHECKS=1         check a reused or pooled connection before handing it out.
+#   PGBOUNCER_TRANSACTION_MODE=1  behind PgBouncer in transaction mode: no server-side
+#                              cursors (iterator() then fetches client-side) and no
+#                              prepared statements.
+DB_POOL = os.environ.get('DB_POOL') == '1'
+DB_HEALTH_CHECKS = os.environ.get('DB_HEALTH_CHECKS', '1') == '1'
+PGBOUNCER_TRANSACTION_MODE = os.environ.get('PGBOUNCER_TRANSACTION_MODE') == '1'
+
+DATABASES['default']['CONN_HEALTH_CHECKS'] = DB_HEALTH_CHECKS
+if DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', '300')),
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', '60'))
+
+if PGBOUNCER_TRANSACTION_MODE:
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+    try:
+        import psycopg  # noqa: F401
+    except ImportError:
+        pass  # psycopg2 never prepares statements
+    else:
+        # psycopg 3 prepares a query after it has run a few times on a connection.
+        DATABASES['default']['OPTIONS']['prepare_threshold'] = None
+
+# CachedModelBackend serves request.user from the per-user cache in
+# attendance/usercache.py when the cache is shared (see below). ModelBackend
+# stays listed so that sessions logged in through it keep resolving.
+AUTHENTICATION_BACKENDS = [
+    'attendance.usercache.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -85,7 +132,35 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Requests slower than this, or issuing more queries, are logged by
+# attendance.instrumentation.QueryTimingMiddleware
+ATTENDANCE_SLOW_REQUEST_MS = 500
+ATTENDANCE_SLOW_REQUEST_QUERIES = 20
+
+# Route the read endpoints to attendance/async_views.py; asgi.py turns this on.
+ATTENDANCE_ASYNC_VIEWS = os.environ.get('ATTENDANCE_ASYNC_VIEWS') == '1'
+
+# Cache: Redis when REDIS_URL is set (needs the redis package), a shared
+# file cache when CACHE_DIR is set, otherwise an in-process cache (only used
+# for entries keyed by the data version, which are safe per process).
+REDIS_URL = os.environ.get('REDIS_URL')
+CACHE_DIR = os.environ.get('CACHE_DIR')
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+elif CACHE_DIR:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': CACHE_DIR}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'attendance'}}
+
+# Cached users, settings and sessions must be visible to every worker: an
+# in-process cache would keep serving a logged-out session or an old setting
+# in the other processes. Without a shared cache, sessions stay in the
+# database and nothing per-user is cached.
+SHARED_CACHE = bool(REDIS_URL or CACHE_DIR)
+ATTENDANCE_USER_CACHE = SHARED_CACHE
+
 # Session settings for API authentication
+SESSION_ENGINE = 'django.contrib.sessions.backends.cache' if SHARED_CACHE else 'django.contrib.sessions.backends.db'
 SESSION_COOKIE_SAMESITE = 'Lax'
 SESSION_COOKIE_HTTPONLY = True
 CSRF_COOKIE_SAMESITE = 'Lax'
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Compare WSGI and ASGI throughput of the read endpoints at high concurrency.
+
+Starts each server in turn (gunicorn with threads for WSGI, uvicorn for
+ASGI, one worker each), logs in users created by
+``manage.py generate_test_data`` and keeps --concurrency keep-alive
+connections busy with the read mix for --duration seconds.
+
+--slow-client-ms makes every client pause half-way through sending each
+request, like a phone on a poor connection. A WSGI thread is held for the
+whole pause; the ASGI worker keeps serving other connections meanwhile.
+
+Throughput and p50/p95/p99 latency per server are written as JSON. The load
+generator uses only the standard library.
+
+    pip install gunicorn uvicorn
+    python manage.py generate_test_data --users 50
+    python scripts/bench_asgi.py --concurrency 200 --duration 20 --slow-client-ms 200
+
+Use --wsgi-url / --asgi-url to benchmark servers you started yourself.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from loadtest import percentile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READ_PATHS = [
+    '/api/auth/me/',
+    '/api/subjects/',
+    '/api/lectures/',
+    '/api/records/?limit=100',
+    '/api/dashboard/summary/',
+]
+
+SERVERS = {
+    'wsgi': '{python} -m gunicorn attendance_backend.wsgi:application --bind 127.0.0.1:{port} --workers 1 --threads {threads}',
+    'asgi': '{python} -m uvicorn attendance_backend.asgi:application --host 127.0.0.1 --port {port} --workers 1 --no-access-log',
+}
+
+
+async def http(reader, writer, host, method, path, cookie='', body=b'', slow=0.0):
+    """Send one HTTP/1.1 request on a keep-alive connection; returns ``(status, headers, body)``."""
+    head = (
+        f'{method} {path} HTTP/1.1\r\nHost: {host}\r\nCookie: {cookie}\r\n'
+        f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n'
+    )
+    data = head.encode() + body
+    if slow:
+        writer.write(data[: len(data) // 2])
+        await writer.drain()
+        await asyncio.sleep(slow)
+        data = data[len(data) // 2 :]
+    writer.write(data)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, value = line.decode('latin-1').split(':', 1)
+        headers.setdefault(name.strip().lower(), []).append(value.strip())
+
+    if 'content-length' in headers:
+        content = await reader.readexactly(int(headers['content-length'][0]))
+    elif 'chunked' in headers.get('transfer-encoding', [''])[0]:
+        chunks = []
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            if not size:
+                await reader.readline()
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        content = b''.join(chunks)
+    else:
+        content = b''
+    return status, headers, content
+
+
+async def login(url, email, password):
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+    try:
+        body = json.dumps({'email': email, 'password': password}).encode()
+        status, headers, _ = await http(reader, writer, parts.netloc, 'POST', '/api/auth/login/', body=body)
+    finally:
+        writer.close()
+    if status != 200:
+        raise SystemExit(f'Login failed for {email} ({status}); run manage.py generate_test_data first')
+    return '; '.join(cookie.split(';', 1)[0] for cookie in headers.get('set-cookie', []))
+
+
+async def client(index, url, cookies, deadline, results, args):
+    parts = urlsplit(url)
+    rng = random.Random(args.seed + index)
+    cookie = cookies[index % len(cookies)]
+    connection = None
+    while time.perf_counter() < deadline:
+        path = rng.choice(READ_PATHS)
+        started = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(parts.hostname, parts.port)
+            status, headers, _ = await asyncio.wait_for(
+                http(*connection, parts.netloc, 'GET', path, cookie, slow=args.slow_client_ms / 1000),
+                args.timeout,
+            )
+            if 'close' in headers.get('connection', []):
+                connection[1].close()
+                connection = None
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError, IndexError):
+            status = 0
+            if connection is not None:
+                connection[1].close()
+            connection = None
+        results.append((path, time.perf_counter() - started, status))
+    if connection is not None:
+        connection[1].close()
+
+
+async def run_load(url, args):
+    emails = [f'{args.prefix}-{index:06d}@example.com' for index in range(args.users)]
+    cookies = await asyncio.gather(*(login(url, email, args.password) for email in emails))
+    results = []
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(client(i, url, cookies, deadline, results, args) for i in range(args.concurrency)))
+    return results, time.perf_counter() - started
+
+
+def summarize(results, elapsed):
+    latencies = sorted(seconds for _, seconds, _ in results)
+    errors = sum(1 for _, _, status in results if not 200 <= status < 400)
+    count = len(results)
+    return {
+        'requests': count,
+        'throughput_rps': round(count / elapsed, 2),
+        'error_rate': round(errors / count, 4) if count else 0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if count else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if count else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if count else None,
+    }
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f'Server on port {port} did not start')
+
+
+def start_server(kind, args):
+    command = SERVERS[kind].format(python=sys.executable, port=args.port, threads=args.threads)
+    env = dict(os.environ)
+    # asgi.py switches the async views on; make sure the WSGI run uses the sync ones.
+    env.pop('ATTENDANCE_ASYNC_VIEWS', None)
+    process = subprocess.Popen(shlex.split(command), cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL)
+    wait_for_port(args.port)
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare WSGI and ASGI throughput for the read endpoints')
+    parser.add_argument('--concurrency', type=int, default=200, help='Open client connections')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds of measured load per server')
+    parser.add_argument('--slow-client-ms', type=float, default=0, help='Pause in the middle of sending each request')
+    parser.add_argument('--threads', type=int, default=16, help='gunicorn threads for the WSGI worker')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--users', type=int, default=50, help='generate_test_data users to log in as')
+    parser.add_argument('--prefix', default='synthetic')
+    parser.add_argument('--password', default='test123')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--wsgi-url', help='Benchmark this running WSGI server instead of starting gunicorn')
+    parser.add_argument('--asgi-url', help='Benchmark this running ASGI server instead of starting uvicorn')
+    parser.add_argument('--output', help='Write the JSON report here as well as to stdout')
+    args = parser.parse_args()
+
+    report = {'config': {k: v for k, v in vars(args).items() if k not in ('output', 'password')}, 'servers': {}}
+    for kind in ('wsgi', 'asgi'):
+        url = getattr(args, f'{kind}_url')
+        process = None
+        if not url:
+            process = start_server(kind, args)
+            url = f'http://127.0.0.1:{args.port}'
+        try:
+            results, elapsed = asyncio.run(run_load(url, args))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+        report['servers'][kind] = summarize(results, elapsed)
+
+    wsgi, asgi = report['servers']['wsgi'], report['servers']['asgi']
+    if wsgi['throughput_rps']:
+        report['asgi_vs_wsgi_throughput'] = round(asgi['throughput_rps'] / wsgi['throughput_rps'], 2)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: per-row cost of the records list serialisation.
+
+"before" builds model instances (as the ORM does for a normal queryset),
+calls record_to_dict on each and encodes with JsonResponse. "after" uses
+the values_list tuples and the fast path from attendance.serializers.
+No database is needed; rows are generated in memory.
+
+    python scripts/bench_serialization.py [--rows 10000 100000] [--repeat 3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time as timer
+from datetime import date, time, timedelta
+
+import django
+
+# Setup Django environment
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'attendance_backend.settings')
+django.setup()
+
+from django.http import JsonResponse
+from attendance import serializers
+from attendance.models import AttendanceRecord
+from attendance.views import record_to_dict
+
+FIELDS = ['id', 'subject_id', 'date', 'lecture_time', 'status']
+
+
+def make_rows(count):
+    rng = random.Random(42)
+    start = date(2024, 1, 1)
+    times = [None, time(9, 0), time(10, 30), time(13, 0), time(15, 15)]
+    return [
+        (i, rng.randint(1, 8), start + timedelta(days=i // 6), rng.choice(times), rng.choice(['present', 'absent', 'off']))
+        for i in range(1, count + 1)
+    ]
+
+
+def before(rows):
+    records = [AttendanceRecord.from_db('default', FIELDS, row) for row in rows]
+    return JsonResponse({'records': [record_to_dict(r) for r in records]}).content
+
+
+def after(rows):
+    return serializers.FastJsonResponse({'records': serializers.serialize_record_rows(rows)}).content
+
+
+def best_of(func, rows, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = timer.perf_counter()
+        func(rows)
+        best = min(best, timer.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    assert before(make_rows(50)).replace(b' ', b'') == after(make_rows(50)).replace(b' ', b''), 'outputs differ'
+
+    print(f"JSON encoder: {'orjson' if serializers.orjson else 'stdlib json'}")
+    print(f"{'rows':>8} {'before us/row':>14} {'after us/row':>13} {'speed-up':>9}")
+    for count in args.rows:
+        rows = make_rows(count)
+        slow = best_of(before, rows, args.repeat)
+        fast = best_of(after, rows, args.repeat)
+        print(f"{count:>8} {slow / count * 1e6:>14.2f} {fast / count * 1e6:>13.2f} {slow / fast:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
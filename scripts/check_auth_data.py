@@ -11,6 +11,7 @@ django.setup()
 
 from django.contrib.auth.models import User
 from attendance.models import Subject, Lecture, AttendanceRecord, UserSetting
+from attendance.reports import user_report
 
 print("=" * 70)
 print("AUTHENTICATION & ATTENDANCE DATA")
@@ -35,16 +36,14 @@ for record in AttendanceRecord.objects.select_related('user', 'subject').all().o
 # Show subjects per user
 print("\n📚 SUBJECTS PER USER:")
 print("-" * 70)
-for user in User.objects.all():
-    subjects = Subject.objects.filter(user=user)
-    print(f"\n{user.username} ({user.first_name}):")
+# Two queries in all, from the per-subject counters (see attendance/reports.py).
+for user, subjects in user_report():
+    print(f"\n{user['username']} ({user['first_name']}):")
     for subject in subjects:
-        records = AttendanceRecord.objects.filter(subject=subject)
-        present = records.filter(status='present').count()
-        absent = records.filter(status='absent').count()
-        total = present + absent
+        present = subject['present']
+        total = present + subject['absent']
         percentage = (present / total * 100) if total > 0 else 0
-        print(f"  - {subject.name}: {present}/{total} ({percentage:.0f}%)")
+        print(f"  - {subject['name']}: {present}/{total} ({percentage:.0f}%)")
 
 # Show today's attendance
 from datetime import date
@@ -13,7 +13,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'attendance_backend.settings')
 django.setup()
 
 from django.contrib.auth.models import User
-from attendance.models import Subject, Lecture, AttendanceRecord, UserSetting
+from attendance.models import Subject, Lecture, AttendanceRecord
+from attendance.purge import purge_users
 
 
 def list_all_users():
@@ -62,10 +63,8 @@ def delete_user_data_only(user):
     confirm = input("\n⚠️  Delete all this data? (keep account) [yes/no]: ").strip().lower()
     
     if confirm == 'yes':
-        Subject.objects.filter(user=user).delete()
-        Lecture.objects.filter(user=user).delete()
-        AttendanceRecord.objects.filter(user=user).delete()
-        UserSetting.objects.filter(user=user).delete()
+        # Batched deletes; the settings row stays so that synced clients reload.
+        purge_users([user.id], keep_accounts=True)
         
         print(f"\n✅ Successfully deleted all data for user: {user.email}")
         print(f"   Account still exists - user can login with empty data")
@@ -94,7 +93,7 @@ def delete_user_completely(user):
     if confirm == 'DELETE':
         username = user.username
         email = user.email
-        user.delete()  # CASCADE will delete all related data
+        purge_users([user.id])  # Batched: never loads the user's rows into memory
         
         print(f"\n✅ Successfully deleted user account and all data:")
         print(f"   Username: {username}")
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Load test for the /api/ surface of a running server.
+
+Logs in N synthetic users (registering them and a small timetable on first
+use) and replays a realistic mix from one thread per user:
+
+  - bootstrap reads on "page load"
+  - frequent dashboard polling
+  - bursts of attendance POSTs from every user at each "lecture start"
+  - occasional subject / lecture edits
+
+Throughput, p50/p95/p99 latency and error rate per endpoint are written as
+JSON so runs can be compared. Uses only the standard library.
+
+    python manage.py runserver --noreload   # in another terminal
+    python scripts/loadtest.py --users 50 --duration 60 --output run.json
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from datetime import date, timedelta
+from http.cookiejar import CookieJar
+
+SUBJECTS = ['Mathematics', 'Physics', 'Chemistry', 'Computer Science']
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']
+
+# Relative weight of each background action between bursts.
+MIX = [
+    ('dashboard', 60),
+    ('bootstrap', 15),
+    ('records_page', 15),
+    ('edit', 5),
+    ('idle', 5),
+]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def add(self, endpoint, seconds, status, ok):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][status] += 1
+            if not ok:
+                self.errors[endpoint] += 1
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class VirtualUser:
+    def __init__(self, index, args, stats):
+        self.email = f'loadtest-{index}@example.com'
+        self.args = args
+        self.stats = stats
+        self.rng = random.Random(args.seed + index)
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+        self.subjects = []
+
+    def call(self, endpoint, path, method='GET', body=None, record=True):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(
+            self.args.base_url.rstrip('/') + path,
+            data=data,
+            method=method,
+            headers={'Content-Type': 'application/json'},
+        )
+        started = time.perf_counter()
+        status, payload = 0, None
+        try:
+            with self.opener.open(request, timeout=self.args.timeout) as response:
+                status = response.status
+                raw = response.read()
+                if response.headers.get_content_type() == 'application/json':
+                    payload = json.loads(raw or b'{}')
+        except urllib.error.HTTPError as exc:
+            status = exc.code
+            exc.read()
+        except (urllib.error.URLError, OSError):
+            status = 0
+        if record:
+            self.stats.add(endpoint, time.perf_counter() - started, status, 200 <= status < 400)
+        return status, payload
+
+    def setup(self):
+        status, _ = self.call('login', '/auth/login/', 'POST', {'email': self.email, 'password': self.args.password})
+        if status == 401:
+            self.call('register', '/auth/register/', 'POST', {'name': 'Load Test', 'email': self.email, 'password': self.args.password})
+
+        _, payload = self.call('subjects', '/subjects/', record=False)
+        self.subjects = [s['id'] for s in (payload or {}).get('subjects', [])]
+        if not self.subjects:
+            for day, name in zip(DAYS, SUBJECTS):
+                _, created = self.call('subjects_create', '/subjects/', 'POST', {'name': name})
+                if not created:
+                    continue
+                subject_id = created['subject']['id']
+                self.subjects.append(subject_id)
+                self.call('lectures_create', '/lectures/', 'POST', {'subject_id': subject_id, 'day': day, 'time': '09:00'})
+
+    def mark_burst(self, slot):
+        # Every user marks the lecture that just started, plus sometimes a missed one.
+        lecture_day = date.today() - timedelta(days=slot % 120)
+        for subject_id in self.rng.sample(self.subjects, k=min(len(self.subjects), self.rng.randint(1, 2))):
+            status = self.rng.choices(['present', 'absent', 'off'], weights=[80, 15, 5])[0]
+            self.call(
+                'records_post',
+                '/records/',
+                'POST',
+                {'subject_id': subject_id, 'date': lecture_day.isoformat(), 'status': status, 'lecture_time': '09:00'},
+            )
+
+    def background_action(self):
+        action = self.rng.choices([name for name, _ in MIX], weights=[weight for _, weight in MIX])[0]
+        if action == 'dashboard':
+            self.call('dashboard', '/dashboard/summary/')
+        elif action == 'bootstrap':
+            self.call('bootstrap', '/bootstrap/')
+        elif action == 'records_page':
+            self.call('records_page', '/records/?limit=100')
+        elif action == 'edit' and self.subjects:
+            subject_id = self.rng.choice(self.subjects)
+            if self.rng.random() < 0.5:
+                self.call('subject_put', f'/subjects/{subject_id}/', 'PUT', {'code': f'C{self.rng.randint(100, 999)}'})
+            else:
+                status, created = self.call(
+                    'lectures_create',
+                    '/lectures/',
+                    'POST',
+                    {'subject_id': subject_id, 'day': self.rng.choice(DAYS), 'time': f'{self.rng.randint(10, 17)}:30'},
+                )
+                if created and created.get('created'):
+                    self.call('lecture_delete', f"/lectures/{created['lecture']['id']}/", 'DELETE')
+
+    def run(self, started, deadline):
+        last_slot = -1
+        while time.time() < deadline:
+            slot = int((time.time() - started) // self.args.burst_interval)
+            if slot != last_slot:
+                last_slot = slot
+                self.mark_burst(slot)
+                continue
+            self.background_action()
+            time.sleep(self.rng.expovariate(1 / self.args.think_time))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the attendance /api/ surface')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000/api')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of measured load')
+    parser.add_argument('--burst-interval', type=float, default=10, help='Seconds between "lecture start" bursts')
+    parser.add_argument('--think-time', type=float, default=0.5, help='Mean pause between background actions')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--password', default='loadtest-password')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the JSON report here as well as to stdout')
+    args = parser.parse_args()
+
+    setup_stats = Stats()
+    users = [VirtualUser(i, args, setup_stats) for i in range(args.users)]
+    setup_threads = [threading.Thread(target=user.setup) for user in users]
+    for thread in setup_threads:
+        thread.start()
+    for thread in setup_threads:
+        thread.join()
+
+    stats = Stats()
+    for user in users:
+        user.stats = stats
+    started = time.time()
+    deadline = started + args.duration
+    threads = [threading.Thread(target=user.run, args=(started, deadline)) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started
+
+    endpoints = {}
+    for endpoint, values in sorted(stats.latencies.items()):
+        values.sort()
+        count = len(values)
+        endpoints[endpoint] = {
+            'requests': count,
+            'throughput_rps': round(count / elapsed, 2),
+            'errors': stats.errors[endpoint],
+            'error_rate': round(stats.errors[endpoint] / count, 4),
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'max_ms': round(values[-1] * 1000, 2),
+            'status_codes': dict(stats.statuses[endpoint]),
+        }
+
+    total = sum(e['requests'] for e in endpoints.values())
+    errors = sum(e['errors'] for e in endpoints.values())
+    report = {
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'password')},
+        'elapsed_s': round(elapsed, 2),
+        'total_requests': total,
+        'throughput_rps': round(total / elapsed, 2),
+        'error_rate': round(errors / total, 4) if total else 0,
+        'setup_errors': sum(setup_stats.errors.values()),
+        'endpoints': endpoints,
+    }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()